@@ -0,0 +1,303 @@
+"""
+テストケースを複数プロセスで並列に実行し、ケースごと・ラウンドごとの結果をJSONL/CSVに書き出すバッチ実行CLI
+
+使い方:
+    python batch_runner.py --manifest manifest.json --workers 8
+    python batch_runner.py --sweep data --sweep-offset 30 0 --budget 600   # Li & Lim全ファイルの一括実行
+    python batch_runner.py --test-cases                                    # main.pyのtest_casesを実行
+    python batch_runner.py --test-cases --checkpoint-dir cache/checkpoints # 中断したバッチを同じコマンドで再開できるようにする
+
+マニフェスト（JSON）の形式:
+    {
+      "config": {"num_pair_workers": 1, "gat_time_budget": 600},     # 全ケース共通の設定（main.default_run_config のキー）
+      "cases": [
+        {"name": "LC1_2_2+LC1_2_6", "files": ["data/LC1_2_2.txt", "data/LC1_2_6.txt"],
+         "offsets": [[0, 0], [42, -42]], "config": {...}}             # name, config は省略可
+      ]
+    }
+    ケースのリストだけを書いてもよい。
+    config の pair_cache_path（求解結果キャッシュ）と checkpoint_dir（チェックポイント）はケースごとに分ける
+    （<pair_cache_path の拡張子の前>-<ケースのラベル>.sqlite、<checkpoint_dir>/<ケースのラベル>/。ラベルはログと同じ）。
+    前処理済みインスタンスのキャッシュ（instance_cache_dir）は複数プロセスで共有してよい。
+
+出力（--output のディレクトリ）:
+    cases.jsonl / cases.csv : ケースごとの結果（初期コスト、最終コスト、ラウンド数、実行時間、終了状態）
+    rounds.jsonl            : ラウンドごとの結果（各ケースの実行中に逐次書き出す、case_index でケース結果と対応）
+    logs/<name>.log         : 各ケースの標準出力
+    profiles/<name>/        : --profile 指定時の各ケースの計測結果（profile.json, trace.json, stacks.folded）
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import re
+import resource
+import signal
+import sys
+import time
+
+from main import run_case, test_cases
+
+
+# cases.csv の列（JSONLにはこれに加えてエラー内容などが入る）
+CASE_FIELDS = [
+    'case_index', 'name', 'status', 'files', 'offsets', 'num_customers', 'num_vehicles', 'initial_cost', 'final_cost',
+    'improvement_percent', 'rounds', 'budget_exhausted', 'init_time', 'gat_time', 'total_time', 'wall_time',
+    'cache_hits', 'cache_misses', 'audit_violations',
+]
+
+# バッチ実行時の既定設定：ケース単位で並列化するため、ケース内の初期経路生成・ペア求解はシリアル、図の出力はなし
+BATCH_CONFIG_DEFAULTS = {
+    'init_workers': 1,
+    'num_pair_workers': 1,
+    'render_mode': 'off',
+}
+
+# ケースごとに分ける出力先の設定（同時に実行するケースが同じSQLiteファイル・チェックポイント・計測結果を共有しないようにする）
+PER_CASE_PATH_KEYS = ('pair_cache_path', 'checkpoint_dir', 'profile_dir')
+
+
+def load_manifest(path):
+    """マニフェストを読み込み、(共通設定, ケースのリスト) を返す"""
+    with open(path) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        return {}, manifest
+    return manifest.get('config', {}), manifest['cases']
+
+
+def build_sweep_cases(data_dir, offset):
+    """
+    data_dir内のLi & Limインスタンスを、同じクラス（LC1, LR2, ...）の番号順に2ファイルずつ組にしたケースを作る
+    - 2つ目のファイルに offset を与える（奇数個のクラスでは最後のファイルを先頭のファイルと組にする）
+    """
+    pattern = re.compile(r'^(L[A-Z]*\d)_(\d+)_(\d+)\.txt$')
+    groups = {}
+    for file_name in os.listdir(data_dir):
+        match = pattern.match(file_name)
+        if match:
+            groups.setdefault(match.group(1), []).append((int(match.group(3)), file_name))
+    cases = []
+    for group in sorted(groups):
+        files = [os.path.join(data_dir, file_name) for _, file_name in sorted(groups[group])]
+        if len(files) % 2 == 1 and len(files) > 1:
+            files.append(files[0])
+        for k in range(0, len(files) - 1, 2):
+            cases.append({'files': [files[k], files[k + 1]], 'offsets': [[0, 0], list(offset)]})
+    return cases
+
+
+def case_name(case):
+    if case.get('name'):
+        return case['name']
+    return '+'.join(os.path.splitext(os.path.basename(path))[0] for path in case['files'])
+
+
+def case_label(case_index, case):
+    """ログ・ケースごとの出力先に付けるラベル"""
+    return f"{case_index:03d}_{case_name(case)}"
+
+
+def isolate_case_paths(config, label):
+    """PER_CASE_PATH_KEYS の出力先にケースのラベルを付けた設定を返す"""
+    config = dict(config)
+    if config.get('pair_cache_path') is not None:
+        root, ext = os.path.splitext(config['pair_cache_path'])
+        config['pair_cache_path'] = f"{root}-{label}{ext}"
+    for key in ('checkpoint_dir', 'profile_dir'):
+        if config.get(key) is not None:
+            config[key] = os.path.join(config[key], label)
+    return config
+
+
+def _limit_resources(memory_limit_mb):
+    if memory_limit_mb is not None:
+        limit = int(memory_limit_mb * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_case_process(case_index, case, config, result_queue, log_path, memory_limit_mb):
+    # ケースごとにプロセスグループを分け、タイムアウト時にペア求解ワーカーごと停止できるようにする
+    os.setpgrp()
+    _limit_resources(memory_limit_mb)
+    name = case_name(case)
+    log_file = open(log_path, 'w', buffering=1)
+    sys.stdout = sys.stderr = log_file
+    start = time.time()
+    try:
+        result = run_case(case['files'], [tuple(offset) for offset in case['offsets']], case_index, config,
+                          on_round=lambda record: result_queue.put(('round', case_index, dict(record, name=name))))
+        result['status'] = 'ok'
+    except BaseException as e:  # MemoryError（メモリ上限超過）も結果として記録する
+        result = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+    result.update(name=name, files=case['files'], offsets=case['offsets'], wall_time=time.time() - start)
+    result_queue.put(('case', case_index, result))
+    log_file.flush()
+
+
+class ResultWriter:
+    """ケース結果（JSONL・CSV）とラウンド結果（JSONL）を逐次書き出す"""
+
+    def __init__(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        self.cases_jsonl = open(os.path.join(output_dir, 'cases.jsonl'), 'w', buffering=1)
+        self.rounds_jsonl = open(os.path.join(output_dir, 'rounds.jsonl'), 'w', buffering=1)
+        self.cases_csv_file = open(os.path.join(output_dir, 'cases.csv'), 'w', newline='', buffering=1)
+        self.cases_csv = csv.DictWriter(self.cases_csv_file, fieldnames=CASE_FIELDS, extrasaction='ignore')
+        self.cases_csv.writeheader()
+
+    def write_round(self, record):
+        self.rounds_jsonl.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def write_case(self, result):
+        self.cases_jsonl.write(json.dumps(result, ensure_ascii=False) + '\n')
+        row = dict(result)
+        row['files'] = ' '.join(result['files'])
+        row['offsets'] = json.dumps(result['offsets'])
+        self.cases_csv.writerow(row)
+
+    def close(self):
+        for f in (self.cases_jsonl, self.rounds_jsonl, self.cases_csv_file):
+            f.close()
+
+
+def run_batch(cases, output_dir, workers=None, config=None, case_timeout=None, memory_limit_mb=None):
+    """
+    ケースのリストを最大 workers 個のプロセスで並列実行し、結果を output_dir に書き出す
+    - config: 全ケース共通の設定（BATCH_CONFIG_DEFAULTS を上書きし、各ケースの 'config' でさらに上書きされる）
+              PER_CASE_PATH_KEYS の出力先はケースごとに分ける
+    - case_timeout: 1ケースの実行時間の上限[秒]（超えたらプロセスグループごと停止し 'timeout' として記録）
+    - memory_limit_mb: 1ケース（ペア求解ワーカーを含む各プロセス）のアドレス空間の上限[MB]
+    戻り値: ケース結果のリスト（マニフェスト順）
+    """
+    workers = workers or os.cpu_count() or 1
+    base_config = dict(BATCH_CONFIG_DEFAULTS)
+    base_config.update(config or {})
+    log_dir = os.path.join(output_dir, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    writer = ResultWriter(output_dir)
+    result_queue = multiprocessing.Queue()
+    pending = list(enumerate(cases, 1))
+    running = {}  # case_index -> (process, 開始時刻)
+    results = {}
+
+    def handle(message):
+        kind, case_index, payload = message
+        if kind == 'round':
+            writer.write_round(dict(payload, case_index=case_index))
+        else:
+            payload = dict(payload, case_index=case_index)
+            results[case_index] = payload
+            writer.write_case(payload)
+            print(f"[{len(results)}/{len(cases)}] {payload['name']}: {payload['status']}"
+                  + (f"（{payload['initial_cost']:.2f} → {payload['final_cost']:.2f}、{payload['rounds']}ラウンド、"
+                     f"{payload['total_time']:.1f} 秒）" if payload['status'] == 'ok' else f"（{payload.get('error', '')}）"))
+
+    def drain():
+        while True:
+            try:
+                handle(result_queue.get(timeout=0.05))
+            except queue.Empty:
+                return
+
+    def record_failure(case_index, status, error):
+        case = cases[case_index - 1]
+        handle(('case', case_index, {'name': case_name(case), 'status': status, 'error': error, 'files': case['files'],
+                                     'offsets': case['offsets'], 'wall_time': time.time() - running[case_index][1]}))
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                case_index, case = pending.pop(0)
+                case_config = dict(base_config)
+                case_config.update(case.get('config', {}))
+                label = case_label(case_index, case)
+                case_config = isolate_case_paths(case_config, label)
+                log_path = os.path.join(log_dir, f"{label}.log")
+                process = multiprocessing.Process(
+                    target=_run_case_process,
+                    args=(case_index, case, case_config, result_queue, log_path, memory_limit_mb))
+                process.start()
+                running[case_index] = (process, time.time())
+            try:
+                handle(result_queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            for case_index, (process, started) in list(running.items()):
+                if not process.is_alive():
+                    process.join()
+                    # 終了直前に送られた結果を読み切ってから、結果の有無を判定する
+                    drain()
+                    if case_index not in results:
+                        record_failure(case_index, 'crashed', f"exit code {process.exitcode}")
+                    del running[case_index]
+                elif case_timeout is not None and time.time() - started > case_timeout:
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.join()
+                    drain()
+                    if case_index not in results:
+                        record_failure(case_index, 'timeout', f"exceeded {case_timeout} s")
+                    del running[case_index]
+    finally:
+        for process, _ in running.values():
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        writer.close()
+    return [results[k] for k in sorted(results)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--manifest', help='ケースを列挙したJSONファイル')
+    source.add_argument('--sweep', metavar='DATA_DIR', help='ディレクトリ内の全Li & Limインスタンスを2ファイルずつ組にして実行')
+    source.add_argument('--test-cases', action='store_true', help='main.pyのtest_casesを実行')
+    parser.add_argument('--sweep-offset', nargs=2, type=float, default=[30, 0], help='--sweep時の2つ目のファイルの座標オフセット')
+    parser.add_argument('--output', default=None, help='出力ディレクトリ（既定: results/<日時>）')
+    parser.add_argument('--workers', type=int, default=None, help='同時に実行するケース数（既定: CPUコア数）')
+    parser.add_argument('--pair-workers', type=int, default=None, help='ケース内で2車両VRPを解くワーカー数（既定: 1）')
+    parser.add_argument('--budget', type=float, default=None, help='1ケースのGAT改善フェーズの時間予算[秒]')
+    parser.add_argument('--case-timeout', type=float, default=None, help='1ケースの実行時間の上限[秒]（超えたら強制終了）')
+    parser.add_argument('--memory-limit', type=float, default=None, help='1プロセスのメモリ上限[MB]')
+    parser.add_argument('--render', choices=['all', 'every', 'final', 'off'], default=None,
+                        help="経路図の描画（既定: 'off'、'every' の間隔はマニフェストの render_every で指定）")
+    parser.add_argument('--profile', action='store_true', help='各ケースのフェーズ・ラウンド・ペアごとの計測結果を書き出す')
+    parser.add_argument('--checkpoint-dir', default=None, help='チェックポイントの保存先（ケースごとのサブディレクトリに保存）')
+    parser.add_argument('--instance-cache', default=None, help='前処理済みインスタンスのキャッシュ（全ケースで共有）')
+    args = parser.parse_args()
+
+    config = {}
+    if args.manifest:
+        config, cases = load_manifest(args.manifest)
+    elif args.sweep:
+        cases = build_sweep_cases(args.sweep, args.sweep_offset)
+    else:
+        cases = [{'files': files, 'offsets': [list(offset) for offset in offsets]} for files, offsets in test_cases]
+    if args.pair_workers is not None:
+        config['num_pair_workers'] = args.pair_workers
+    if args.budget is not None:
+        config['gat_time_budget'] = args.budget
+    if args.render is not None:
+        config['render_mode'] = args.render
+    if args.checkpoint_dir is not None:
+        config['checkpoint_dir'] = args.checkpoint_dir
+    if args.instance_cache is not None:
+        config['instance_cache_dir'] = args.instance_cache
+    output_dir = args.output or os.path.join('results', time.strftime('%Y%m%d_%H%M%S'))
+    if args.profile:
+        config['profile'] = True
+        config['profile_dir'] = os.path.join(output_dir, 'profiles')
+
+    print(f"{len(cases)}ケースを実行します（出力: {output_dir}）")
+    start = time.time()
+    results = run_batch(cases, output_dir, args.workers, config, args.case_timeout, args.memory_limit)
+    num_ok = sum(1 for result in results if result['status'] == 'ok')
+    print(f"完了: {num_ok}/{len(results)}ケース成功、経過時間 {time.time() - start:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+初期経路生成（initialize_individual_vrps）で初期解の構築と局所探索の近傍をk近傍に制限した場合
+（INIT_SOLVER_OPTIONS の 'neighbors'）の実行時間と解の品質の比較
+
+Li & Lim の200顧客ファイル（1ファイル = 1LSP）と、instance_generator で生成した大きめのLSPについて、
+全アーク（dense）と各kで初期経路を生成し、実行時間・総距離（denseとの差）・使用車両数・監査での違反数を表示する。
+制限時間を与えた場合、同じ時間でどれだけ良い解に届くか（初期解の構築が速く、局所探索の近傍が小さくなる効果）を比べることになる。
+
+使い方:
+    python benchmarks/bench_neighbors.py
+    python benchmarks/bench_neighbors.py --k 10 20 40 --time-limit 30 --requests 400 800
+    python benchmarks/bench_neighbors.py --callback-mode python --requests 1500 --files   # 距離行列を作らない構成
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_scaling import merge_instances
+from feasibility import audit_routes
+from instance_generator import generate_instances
+from instance_store import InstanceStore
+from parser import load_instances
+from neighbor_lists import candidate_neighbors
+from gat import initialize_individual_vrps
+from profiler import profiler
+
+DEFAULT_FILES = ['data/LC1_2_2.txt', 'data/LR1_2_1.txt', 'data/LRC1_2_1.txt']
+
+
+def load_benchmark_instances(args):
+    """(名前, インスタンス) のリスト。ファイルは1つずつ、生成インスタンスは1LSPで作る"""
+    instances = []
+    for path in args.files:
+        instances.append((os.path.basename(path).split('.')[0], load_instances([path], [(0, 0)])))
+    for num_requests in args.requests:
+        generated = generate_instances(1, num_requests, max(10, num_requests // 8), clustering=args.clustering,
+                                       tightness=args.tightness, seed=args.seed)
+        instances.append((f"GEN_{num_requests}", merge_instances(generated)))
+    return instances
+
+
+def measure(instance, neighbors, args):
+    """1つのインスタンスを指定した近傍の制限で解き、実行時間・総距離などを返す"""
+    customers = instance['customers']
+    profiler.reset(enabled=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        # Pythonコールバックで近傍制限する場合は距離行列を作らない構成を測るため、InstanceStore も渡さない
+        store = None if neighbors is not None and args.callback_mode == 'python' else InstanceStore(customers)
+        routes = initialize_individual_vrps(
+            customers, instance['PD_pairs'], instance['num_lsps'], instance['vehicle_num_list'], instance['depot_id_list'],
+            instance['vehicle_capacity'], store=store,
+            solver_options={'time_limit': args.time_limit, 'solution_limit': args.solution_limit,
+                            'neighbors': neighbors, 'callback_mode': args.callback_mode})
+        elapsed = time.perf_counter() - start
+    counters = profiler.to_dict()['counters']
+    profiler.reset(enabled=False)
+    audit = audit_routes(routes, customers, instance['PD_pairs'], instance['vehicle_capacity'])
+    return {
+        'neighbors': neighbors,
+        'time': elapsed,
+        'cost': float(InstanceStore(customers).route_costs(routes).sum()),
+        'vehicles_used': sum(1 for route in routes if len(route) > 2),
+        'violations': audit['num_violations'],
+        'fallbacks': counters.get('init.neighbors_fallback', 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', nargs='*', default=DEFAULT_FILES, help='Li & Lim の200顧客ファイル（1ファイル = 1LSP）')
+    parser.add_argument('--requests', nargs='*', type=int, default=[400], help='生成インスタンスのリクエスト数の候補')
+    parser.add_argument('--k', nargs='+', type=int, default=[10, 20, 40], help='近傍の数kの候補（denseは常に計測する）')
+    parser.add_argument('--time-limit', type=float, default=10.0, help='初期経路生成（1社あたり）の制限時間[秒]')
+    parser.add_argument('--solution-limit', type=int, default=None,
+                        help='初期経路生成で見つける解の数の上限（1なら初期解の構築まで）')
+    parser.add_argument('--callback-mode', default='matrix', choices=['matrix', 'python'])
+    parser.add_argument('--clustering', type=float, default=0.5)
+    parser.add_argument('--tightness', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='結果を書き出すJSONファイル')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'インスタンス':<12}{'ノード数':>8}{'k':>7}{'時間[秒]':>10}{'総距離':>11}{'dense比':>9}{'車両':>6}{'違反':>6}{'再求解':>7}")
+    for name, instance in load_benchmark_instances(args):
+        # 時間窓の上で続けて訪問できるアークの割合（neighbors 指定時に NextVar の候補として残るアーク）
+        customers = instance['customers']
+        depot_rows = np.nonzero(np.isin(customers.id, instance['depot_id_list']))[0]
+        candidates = candidate_neighbors(customers, depot_indices=depot_rows)
+        num_customers = len(customers) - len(depot_rows)
+        compatible = sum(len(c) for c in candidates if c is not None) / (num_customers * (num_customers - 1))
+        print(f"{name}: 時間窓の上で続けて訪問できるアーク {compatible * 100:.1f}%")
+        dense_cost = None
+        for neighbors in [None] + args.k:
+            label = 'dense' if neighbors is None else str(neighbors)
+            try:
+                result = measure(instance, neighbors, args)
+            except RuntimeError:
+                # 制限時間内に初期解を構築できなかった（大規模インスタンスの全アークで起こりやすい）
+                profiler.reset(enabled=False)
+                results.append({'instance': name, 'neighbors': neighbors, 'cost': None})
+                print(f"{name:<12}{len(customers):>8}{label:>7}  制限時間内に解が見つかりませんでした", flush=True)
+                continue
+            if neighbors is None:
+                dense_cost = result['cost']
+            gap = (result['cost'] - dense_cost) / dense_cost * 100 if dense_cost is not None else None
+            result.update(instance=name, nodes=len(customers), gap_percent=gap, compatible_arcs=compatible)
+            results.append(result)
+            gap_label = f"{gap:>+8.1f}%" if gap is not None else f"{'-':>9}"
+            print(f"{name:<12}{result['nodes']:>8}{label:>7}{result['time']:>10.2f}{result['cost']:>11.1f}"
+                  f"{gap_label}{result['vehicles_used']:>6}{result['violations']:>6}{result['fallbacks']:>7}", flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == '__main__':
+    main()
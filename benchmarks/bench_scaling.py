@@ -0,0 +1,142 @@
+"""
+生成インスタンス（instance_generator）上での initialize_individual_vrps と perform_gat_exchange のスケーリング計測
+
+LSP数・1社あたりのリクエスト数・1社あたりの車両数の組み合わせごとにインスタンスを生成し、
+初期経路生成と GAT交換1ラウンドの実行時間（と profiler による内訳）を測る。
+最後に 時間 ∝ V^b × N^c を最小二乗で当てはめ、車両数 V・リクエスト数 N に対する増え方の指数を表示する。
+
+使い方:
+    python benchmarks/bench_scaling.py
+    python benchmarks/bench_scaling.py --lsps 2 5 10 --requests 25 50 --vehicles 5 10 --output scaling.json
+    python benchmarks/bench_scaling.py --engine local_search --pair-time-limit 0.05
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instance_generator import generate_instances
+from parser import build_lsp_data, load_instances
+from instance_store import InstanceStore
+from gat import initialize_individual_vrps, perform_gat_exchange
+from profiler import profiler
+
+# 内訳として表示する区間（profilerの区間名）
+BREAKDOWN_SPANS = ['init.lsp', 'gat.vehicle_PD_pairs', 'gat.evaluate_pairs', 'ortools.build_model', 'ortools.search',
+                   'gat.select_actions']
+
+
+def merge_instances(instances):
+    """生成したLSPごとのインスタンスを、ファイルを介さずに load_instances と同じ形式の1つのインスタンスに結合する"""
+    def parse(k, x_offset=0, y_offset=0, id_offset=0, time_offset=0):
+        return build_lsp_data(*instances[k], x_offset, y_offset, id_offset, time_offset)
+    return load_instances(range(len(instances)), [(0, 0)] * len(instances), parse=parse)
+
+
+def measure(num_lsps, requests_per_lsp, vehicles_per_lsp, args):
+    """1つの規模について、初期経路生成と GAT交換1ラウンドを計測する"""
+    instance = merge_instances(generate_instances(
+        num_lsps, requests_per_lsp, vehicles_per_lsp, clustering=args.clustering, tightness=args.tightness, seed=args.seed))
+    customers = instance['customers']
+    num_vehicles = sum(instance['vehicle_num_list'])
+    profiler.reset(enabled=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        store = InstanceStore(customers)
+        store_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        routes = initialize_individual_vrps(
+            customers, instance['PD_pairs'], num_lsps, instance['vehicle_num_list'], instance['depot_id_list'],
+            instance['vehicle_capacity'], store=store,
+            solver_options={'time_limit': args.init_time_limit, 'solution_limit': args.init_solution_limit})
+        init_time = time.perf_counter() - start
+        initial_cost = float(store.route_costs(routes).sum())
+
+        start = time.perf_counter()
+        stats = {}
+        routes = perform_gat_exchange(routes, customers, instance['PD_pairs'], instance['vehicle_capacity'], store=store,
+                                      stats=stats, solver_options={'engine': args.engine, 'time_limit': args.pair_time_limit})
+        round_time = time.perf_counter() - start
+    timers = profiler.to_dict()['timers']
+    profiler.reset(enabled=False)
+    return {
+        'lsps': num_lsps,
+        'requests_per_lsp': requests_per_lsp,
+        'vehicles_per_lsp': vehicles_per_lsp,
+        'N': num_lsps * requests_per_lsp,
+        'V': num_vehicles,
+        'nodes': len(customers),
+        'pairs': stats['pairs_total'],
+        'store_time': store_time,
+        'init_time': init_time,
+        'round_time': round_time,
+        'initial_cost': initial_cost,
+        'round_cost': float(store.route_costs(routes).sum()),
+        'breakdown': {name: timers[name]['total'] for name in BREAKDOWN_SPANS if name in timers},
+    }
+
+
+def fit_exponents(results, key):
+    """時間 ∝ V^b × N^c を両対数の最小二乗で当てはめ、(b, c) を返す（点が足りなければNone）"""
+    points = [(r['V'], r['N'], r[key]) for r in results if r[key] > 0]
+    if len({(v, n) for v, n, _ in points}) < 3:
+        return None
+    A = np.array([[1.0, np.log(v), np.log(n)] for v, n, _ in points])
+    y = np.log([t for _, _, t in points])
+    coefficients, *_ = np.linalg.lstsq(A, y, rcond=None)
+    return float(coefficients[1]), float(coefficients[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lsps', nargs='+', type=int, default=[2, 4], help='LSP数の候補')
+    parser.add_argument('--requests', nargs='+', type=int, default=[25, 50], help='1社あたりのリクエスト数の候補')
+    parser.add_argument('--vehicles', nargs='+', type=int, default=[10, 20], help='1社あたりの車両数の候補')
+    parser.add_argument('--clustering', type=float, default=0.5)
+    parser.add_argument('--tightness', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', default='ortools', choices=['ortools', 'local_search'], help='2車両VRPのエンジン')
+    parser.add_argument('--pair-time-limit', type=float, default=None, help='2車両VRPの制限時間[秒]（既定: 局所最適まで）')
+    parser.add_argument('--init-time-limit', type=float, default=60.0, help='初期経路生成（1社あたり）の制限時間[秒]')
+    parser.add_argument('--init-solution-limit', type=int, default=1,
+                        help='初期経路生成で見つける解の数の上限（既定: 1 = 初期解の構築まで）')
+    parser.add_argument('--output', default=None, help='結果を書き出すJSONファイル')
+    args = parser.parse_args()
+
+    results = []
+    header = f"{'LSP':>4}{'N':>7}{'V':>6}{'ペア数':>9}{'初期経路[秒]':>14}{'1ラウンド[秒]':>15}  内訳[秒]"
+    print(header)
+    for num_lsps, requests_per_lsp, vehicles_per_lsp in itertools.product(args.lsps, args.requests, args.vehicles):
+        try:
+            result = measure(num_lsps, requests_per_lsp, vehicles_per_lsp, args)
+        except RuntimeError as e:
+            # 車両数に対して時間窓・容量が厳しすぎると初期経路が見つからないため、その規模は飛ばす
+            profiler.reset(enabled=False)
+            print(f"{num_lsps:>4}{num_lsps * requests_per_lsp:>7}{num_lsps * vehicles_per_lsp:>6}  スキップ（{e}）")
+            continue
+        results.append(result)
+        breakdown = ', '.join(f"{name} {value:.2f}" for name, value in result['breakdown'].items())
+        print(f"{result['lsps']:>4}{result['N']:>7}{result['V']:>6}{result['pairs']:>9}"
+              f"{result['init_time']:>14.2f}{result['round_time']:>15.2f}  {breakdown}", flush=True)
+
+    for key, label in (('init_time', '初期経路生成'), ('round_time', 'GAT交換1ラウンド')):
+        exponents = fit_exponents(results, key)
+        if exponents is not None:
+            print(f"{label}: 時間 ∝ V^{exponents[0]:.2f} × N^{exponents[1]:.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == '__main__':
+    main()
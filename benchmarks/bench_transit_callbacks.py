@@ -0,0 +1,114 @@
+"""
+transit callbackの登録方式（Pythonクロージャ / 行列登録）による solve_vrp_flexible の求解時間比較
+
+使い方:
+    python benchmarks/bench_transit_callbacks.py --pairs 30
+    python benchmarks/bench_transit_callbacks.py --pairs 30 --init   # 200顧客規模の初期経路生成も比較
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import load_instances
+from instance_store import InstanceStore
+from node_arrays import select_nodes
+from flexible_vrp_solver import solve_vrp_flexible
+from gat import initialize_individual_vrps, build_vehicle_PD_pairs
+
+CALLBACK_MODES = ['python', 'matrix']
+
+
+def sample_pair_subproblems(routes, customers, PD_pairs, num_pairs, seed):
+    """初期経路からランダムに2車両ペアを選び、GATと同じ形の部分問題を作る"""
+    rng = random.Random(seed)
+    used = [v for v, route in enumerate(routes) if len(route) > 2]
+    all_pairs = [(i, j) for a, i in enumerate(used) for j in used[a + 1:]]
+    pairs = sorted(rng.sample(all_pairs, min(num_pairs, len(all_pairs))))
+    PD_pairs_of_each_vehicle = build_vehicle_PD_pairs(routes, PD_pairs)
+    subproblems = []
+    for i, j in pairs:
+        node_ids = set(routes[i] + routes[j])
+        subproblems.append({
+            'customers': select_nodes(customers, node_ids),
+            'initial_routes': [routes[i][1:-1], routes[j][1:-1]],
+            'PD_pairs': PD_pairs_of_each_vehicle[i] + PD_pairs_of_each_vehicle[j],
+            'depots': [routes[i][0], routes[j][0]],
+        })
+    return subproblems
+
+
+def time_pair_solves(subproblems, vehicle_capacity, store, callback_mode):
+    solutions = []
+    start = time.perf_counter()
+    for sub in subproblems:
+        solutions.append(solve_vrp_flexible(
+            sub['customers'], sub['initial_routes'], sub['PD_pairs'], 2, vehicle_capacity, sub['depots'], sub['depots'],
+            use_capacity=True, use_time=True, use_pickup_delivery=True, isInitPhase=False, store=store,
+            callback_mode=callback_mode))
+    return time.perf_counter() - start, solutions
+
+
+def time_init_solve(instance, store, callback_mode, time_limit):
+    # 最初のLSPだけを解き、1回あたりの初期経路生成時間を測る
+    depot_id_list = instance['depot_id_list']
+    id_max = depot_id_list[1] if len(depot_id_list) > 1 else float('inf')
+    customers = instance['customers']
+    sub_customers = customers.take((customers.id >= depot_id_list[0]) & (customers.id < id_max))
+    sub_ids = set(sub_customers.id.tolist())
+    sub_PD_pairs = [(p, d) for p, d in instance['PD_pairs'].items() if p in sub_ids or d in sub_ids]
+    num_vehicles = instance['vehicle_num_list'][0]
+    depots = [depot_id_list[0]] * num_vehicles
+    start = time.perf_counter()
+    routes = solve_vrp_flexible(sub_customers, None, sub_PD_pairs, num_vehicles, instance['vehicle_capacity'], depots, depots,
+                                use_capacity=True, use_time=True, use_pickup_delivery=True, isInitPhase=True, store=store,
+                                time_limit=time_limit, callback_mode=callback_mode)
+    return time.perf_counter() - start, routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', nargs=2, default=['data/LC1_2_2.txt', 'data/LC1_2_6.txt'])
+    parser.add_argument('--offset', nargs=2, type=float, default=[42, -42], help='2つ目のファイルの座標オフセット')
+    parser.add_argument('--pairs', type=int, default=30, help='計測する2車両部分問題の数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--init', action='store_true', help='初期経路生成（1LSP分）も比較する')
+    parser.add_argument('--init-time-limit', type=float, default=None, help='初期経路生成の制限時間[秒]')
+    args = parser.parse_args()
+
+    instance = load_instances(args.files, [(0, 0), tuple(args.offset)])
+    store = InstanceStore(instance['customers'])
+    vehicle_capacity = instance['vehicle_capacity']
+
+    print(">>> ペア部分問題用の初期経路を生成中・・・")
+    routes = initialize_individual_vrps(instance['customers'], instance['PD_pairs'], instance['num_lsps'],
+                                        instance['vehicle_num_list'], instance['depot_id_list'], vehicle_capacity,
+                                        store=store, solver_options={'time_limit': args.init_time_limit})
+    subproblems = sample_pair_subproblems(routes, instance['customers'], instance['PD_pairs'], args.pairs, args.seed)
+    sizes = [len(sub['customers']) for sub in subproblems]
+    print(f"ペア部分問題: {len(subproblems)}件（ノード数 平均 {sum(sizes) / len(sizes):.1f}, 最大 {max(sizes)}）")
+
+    pair_times = {}
+    pair_solutions = {}
+    for mode in CALLBACK_MODES:
+        pair_times[mode], pair_solutions[mode] = time_pair_solves(subproblems, vehicle_capacity, store, mode)
+        print(f"  {mode:>6}: 合計 {pair_times[mode]:.3f} 秒, 1件あたり {pair_times[mode] / len(subproblems) * 1000:.1f} ms")
+    print(f"  速度比 python/matrix = {pair_times['python'] / pair_times['matrix']:.2f}x, "
+          f"解の一致: {pair_solutions['python'] == pair_solutions['matrix']}")
+
+    if args.init:
+        print("初期経路生成（LSP 1）:")
+        init_times = {}
+        init_solutions = {}
+        for mode in CALLBACK_MODES:
+            init_times[mode], init_solutions[mode] = time_init_solve(instance, store, mode, args.init_time_limit)
+            print(f"  {mode:>6}: {init_times[mode]:.3f} 秒")
+        print(f"  速度比 python/matrix = {init_times['python'] / init_times['matrix']:.2f}x, "
+              f"解の一致: {init_solutions['python'] == init_solutions['matrix']}")
+
+
+if __name__ == '__main__':
+    main()
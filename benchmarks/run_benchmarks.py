@@ -0,0 +1,311 @@
+"""
+ソルバー経路のベンチマークスイート（実行時間・ピークメモリ・解の品質を記録し、ベースラインとの比較で性能劣化を検出する）
+
+使い方:
+    python benchmarks/run_benchmarks.py --save-baseline                 # ベースラインを保存（benchmarks/baseline.json）
+    python benchmarks/run_benchmarks.py                                 # ベースラインと比較し、劣化があれば終了コード1
+                                                                        # （ベースラインがない場合も終了コード1）
+    python benchmarks/run_benchmarks.py --allow-missing-baseline        # ベースラインがなければ計測だけして終了コード0
+    python benchmarks/run_benchmarks.py --skip end_to_end --time-threshold 0.3
+    python benchmarks/run_benchmarks.py --only parse distance_matrix pair_solve
+
+ベンチマーク:
+    parse                  : データファイル2つのパースと結合（load_instances）
+    distance_matrix        : 全体の距離行列の構築（InstanceStore）
+    pair_solve             : 固定シードで選んだ2車両部分問題1件の求解（solve_vrp_flexible）
+    gat_round              : 初期経路からのGAT交換1ラウンド（perform_gat_exchange、全ペア）
+    action_selection.*     : 1ラウンド分のアクション集合からの選択（matching / cpsat）
+    end_to_end             : 1テストケースの初期経路生成からGAT改善の収束まで（main.run_case）
+
+計測方法:
+    - 実行時間は tracemalloc なしで repeat 回実行した中央値[秒]
+    - ピークメモリは別に1回 tracemalloc 下で実行したPythonヒープのピーク[MB]（OR-Tools内部のC++の確保は含まない）
+    - 品質は結果の総距離（小さいほど良い）。探索は制限時間なし（局所最適で停止）で解くため、同じ環境では決定的になる
+    - 準備（インスタンス読み込み・初期経路生成など）は計測に含めない
+    - 実行時間・メモリは計測した環境に依存するため、ベースラインはリポジトリに含めず（.gitignore）、
+      比較する環境（開発機・CIのランナー）ごとに --save-baseline で作る
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import load_instances
+from instance_store import InstanceStore
+from flexible_vrp_solver import solve_vrp_flexible
+from gat import (initialize_individual_vrps, build_vehicle_PD_pairs, evaluate_pair_tasks, perform_gat_exchange,
+                 select_actions)
+from main import run_case
+from bench_transit_callbacks import sample_pair_subproblems
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# 探索制限（時間制限なし：局所最適で停止するため結果が実行環境の速度に依存しない）
+BENCH_INIT_SOLVER_OPTIONS = {'time_limit': None}
+BENCH_PAIR_SOLVER_OPTIONS = {'engine': 'ortools', 'time_limit': None}
+
+# 劣化とみなす既定の閾値（ベースラインに対する増加率）
+DEFAULT_THRESHOLDS = {'time': 0.2, 'memory': 0.2, 'quality': 1e-6}
+
+
+class Fixtures:
+    """ベンチマークの準備（計測対象外）を必要になった時に一度だけ行い、結果を共有する"""
+
+    def __init__(self, files, offsets, seed):
+        self.files = files
+        self.offsets = offsets
+        self.seed = seed
+        self._cache = {}
+
+    def _get(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def instance(self):
+        return self._get('instance', lambda: load_instances(self.files, self.offsets))
+
+    @property
+    def store(self):
+        return self._get('store', lambda: InstanceStore(self.instance['customers']))
+
+    @property
+    def initial_routes(self):
+        instance = self.instance
+        return self._get('initial_routes', lambda: initialize_individual_vrps(
+            instance['customers'], instance['PD_pairs'], instance['num_lsps'], instance['vehicle_num_list'],
+            instance['depot_id_list'], instance['vehicle_capacity'], store=self.store,
+            solver_options=BENCH_INIT_SOLVER_OPTIONS))
+
+    @property
+    def pair_subproblem(self):
+        return self._get('pair_subproblem', lambda: sample_pair_subproblems(
+            self.initial_routes, self.instance['customers'], self.instance['PD_pairs'], 1, self.seed)[0])
+
+    @property
+    def feasible_actions(self):
+        def build():
+            routes = self.initial_routes
+            PD_pairs_of_each_vehicle = build_vehicle_PD_pairs(routes, self.instance['PD_pairs'])
+            pair_tasks = [(i, j, routes[i], routes[j], PD_pairs_of_each_vehicle[i] + PD_pairs_of_each_vehicle[j])
+                          for i in range(len(routes)) for j in range(i + 1, len(routes))]
+            results = evaluate_pair_tasks(pair_tasks, self.instance['customers'], self.instance['vehicle_capacity'],
+                                          store=self.store, solver_options=BENCH_PAIR_SOLVER_OPTIONS)
+            return [action for result in results for action in result['actions']]
+        return self._get('feasible_actions', build)
+
+
+def bench_parse(fx):
+    instance = load_instances(fx.files, fx.offsets)
+    return {'nodes': len(instance['customers'])}
+
+
+def bench_distance_matrix(fx):
+    store = InstanceStore(fx.instance['customers'])
+    return {'nodes': len(store.distance_matrix)}
+
+
+def bench_pair_solve(fx):
+    sub = fx.pair_subproblem
+    routes = solve_vrp_flexible(
+        sub['customers'], sub['initial_routes'], sub['PD_pairs'], 2, fx.instance['vehicle_capacity'],
+        sub['depots'], sub['depots'], use_capacity=True, use_time=True, use_pickup_delivery=True, isInitPhase=False,
+        store=fx.store, time_limit=BENCH_PAIR_SOLVER_OPTIONS['time_limit'])
+    return {'quality': float(fx.store.route_costs(routes).sum()), 'nodes': len(sub['customers'])}
+
+
+def bench_gat_round(fx):
+    instance = fx.instance
+    stats = {}
+    routes = perform_gat_exchange(fx.initial_routes, instance['customers'], instance['PD_pairs'],
+                                  instance['vehicle_capacity'], store=fx.store, stats=stats,
+                                  solver_options=BENCH_PAIR_SOLVER_OPTIONS)
+    return {'quality': float(fx.store.route_costs(routes).sum()), 'pairs': stats['pairs_total']}
+
+
+def _bench_action_selection(method):
+    def bench(fx):
+        routes = select_actions(fx.initial_routes, fx.feasible_actions, method)
+        return {'quality': float(fx.store.route_costs(routes).sum()), 'actions': len(fx.feasible_actions)}
+    return bench
+
+
+def bench_end_to_end(fx):
+    config = {
+        'instance_cache_dir': None,
+        'init_workers': 1,
+        'num_pair_workers': 1,
+        'pair_screening': None,
+        'init_solver_options': BENCH_INIT_SOLVER_OPTIONS,
+        'pair_solver_options': BENCH_PAIR_SOLVER_OPTIONS,
+        'gat_time_budget': None,
+        'pair_cache_path': None,
+        'render_mode': 'off',
+        'profile': False,
+        'checkpoint_dir': None,
+    }
+    result = run_case(fx.files, fx.offsets, config=config)
+    return {'quality': result['final_cost'], 'rounds': result['rounds']}
+
+
+# ベンチマーク名 → (関数, 実行時間の計測回数, 計測前に準備するFixturesの属性)
+BENCHMARKS = {
+    'parse': (bench_parse, 5, ()),
+    'distance_matrix': (bench_distance_matrix, 5, ('instance',)),
+    'pair_solve': (bench_pair_solve, 5, ('store', 'pair_subproblem')),
+    'gat_round': (bench_gat_round, 1, ('store', 'initial_routes')),
+    'action_selection.matching': (_bench_action_selection('matching'), 5, ('store', 'feasible_actions')),
+    'action_selection.cpsat': (_bench_action_selection('cpsat'), 5, ('store', 'feasible_actions')),
+    'end_to_end': (bench_end_to_end, 1, ()),
+}
+
+
+def run_benchmark(function, fixtures, repeat, measure_memory=True, requires=()):
+    """1つのベンチマークを repeat 回計測し、実行時間の中央値・ピークメモリ・品質などを返す"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in requires:
+            getattr(fixtures, name)
+    times = []
+    info = {}
+    for _ in range(repeat):
+        # 標準出力への進捗表示は計測から外し、結果だけを表示する
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            info = function(fixtures)
+            times.append(time.perf_counter() - start)
+    result = {'time': statistics.median(times), 'times': times}
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                function(fixtures)
+            result['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    result.update(info)
+    return result
+
+
+def compare_to_baseline(results, baseline, thresholds):
+    """
+    ベースラインと比較し、(表示用の行のリスト, 劣化のリスト) を返す
+    - 実行時間・ピークメモリ・品質（総距離）のいずれかが閾値を超えて増えたら劣化とする
+    """
+    metrics = [('time', 'time', '秒'), ('peak_memory_mb', 'memory', 'MB'), ('quality', 'quality', '')]
+    lines = []
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None:
+            lines.append(f"{name:<28} ベースラインなし")
+            continue
+        for key, threshold_name, unit in metrics:
+            if key not in result or base.get(key) is None:
+                continue
+            old, new = base[key], result[key]
+            change = (new - old) / old if old else 0.0
+            regressed = change > thresholds[threshold_name]
+            lines.append(f"{name:<28} {key:<16} {old:>14.4f} → {new:>14.4f} {unit:<3}({change * 100:+7.2f}%)"
+                         + ("  ← 劣化" if regressed else ""))
+            if regressed:
+                regressions.append({'benchmark': name, 'metric': key, 'baseline': old, 'value': new, 'change': change})
+    return lines, regressions
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', nargs=2, default=['data/LC1_2_2.txt', 'data/LC1_2_6.txt'])
+    parser.add_argument('--offset', nargs=2, type=float, default=[42, -42], help='2つ目のファイルの座標オフセット')
+    parser.add_argument('--seed', type=int, default=0, help='pair_solve で使う2車両ペアの選択シード')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=None, help='実行するベンチマーク')
+    parser.add_argument('--skip', nargs='+', choices=list(BENCHMARKS), default=[], help='実行しないベンチマーク')
+    parser.add_argument('--repeat', type=int, default=None, help='実行時間の計測回数（既定: ベンチマークごとの値）')
+    parser.add_argument('--no-memory', action='store_true', help='ピークメモリを計測しない')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='ベースラインのJSONファイル')
+    parser.add_argument('--save-baseline', action='store_true', help='比較せずに結果をベースラインとして保存する')
+    parser.add_argument('--allow-missing-baseline', action='store_true',
+                        help='ベースラインがない場合は比較せずに終了コード0で終える（既定では終了コード1）')
+    parser.add_argument('--output', default=None, help='結果を書き出すJSONファイル')
+    parser.add_argument('--time-threshold', type=float, default=DEFAULT_THRESHOLDS['time'], help='実行時間の許容増加率')
+    parser.add_argument('--memory-threshold', type=float, default=DEFAULT_THRESHOLDS['memory'], help='ピークメモリの許容増加率')
+    parser.add_argument('--quality-threshold', type=float, default=DEFAULT_THRESHOLDS['quality'], help='総距離の許容増加率')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    fixtures = Fixtures(args.files, [(0, 0), tuple(args.offset)], args.seed)
+    names = [name for name in (args.only or BENCHMARKS) if name not in args.skip]
+
+    results = {}
+    for name in names:
+        function, repeat, requires = BENCHMARKS[name]
+        print(f">>> {name} ...", flush=True)
+        results[name] = run_benchmark(function, fixtures, args.repeat or repeat, not args.no_memory, requires)
+        summary = f"    {results[name]['time']:.4f} 秒"
+        if 'peak_memory_mb' in results[name]:
+            summary += f", ピークメモリ {results[name]['peak_memory_mb']:.2f} MB"
+        if 'quality' in results[name]:
+            summary += f", 総距離 {results[name]['quality']:.4f}"
+        print(summary)
+
+    report = {
+        'environment': environment_info(),
+        'case': {'files': args.files, 'offsets': [[0, 0], list(args.offset)], 'seed': args.seed},
+        'benchmarks': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        # 一部のベンチマークだけを実行した場合は、それ以外のベースラインを残す
+        baseline.setdefault('benchmarks', {}).update(results)
+        baseline.update(environment=report['environment'], case=report['case'])
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=1)
+        print(f"ベースラインを保存しました: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"ベースライン {args.baseline} がありません（--save-baseline で作成）")
+        # 比較できないまま成功扱いにすると、CIが劣化を見逃す
+        if args.allow_missing_baseline:
+            return
+        sys.exit(1)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('case') != report['case']:
+        print("警告: ベースラインと計測対象のケース（ファイル・オフセット・シード）が異なります")
+    thresholds = {'time': args.time_threshold, 'memory': args.memory_threshold, 'quality': args.quality_threshold}
+    lines, regressions = compare_to_baseline(results, baseline, thresholds)
+    print("--- ベースラインとの比較 ---")
+    print('\n'.join(lines))
+    if regressions:
+        print(f"{len(regressions)}件の劣化を検出しました")
+        sys.exit(1)
+    print("劣化は検出されませんでした")
+
+
+if __name__ == '__main__':
+    main()
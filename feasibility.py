@@ -0,0 +1,207 @@
+"""
+NumPyによる経路の一括実行可能性チェック（容量・時間窓・pickup→deliveryの同一車両と順序）
+
+使い方:
+    checker = FeasibilityChecker(customers, PD_pairs, vehicle_capacity)
+    report = checker.check(routes)              # report['feasible'][k] が経路kの可否、report['violations'] が違反の詳細
+    actions, rejected = checker.filter_actions(feasible_actions)
+    audit = audit_routes(final_routes, customers, PD_pairs, vehicle_capacity)   # 全顧客の訪問漏れ・重複も確認する
+
+判定は2車両VRP（solve_vrp_flexible）のモデルと同じ:
+    - 積載量: 経路に沿った需要の累積が各地点で 0 以上 vehicle_capacity 以下
+    - 時間: 移動時間は切り捨てた整数距離 + 出発地点のサービス時間。早着は待機し、最早サービス開始時刻が due 以下（終点のデポも含む）
+    - pickup→delivery: 同じ経路に含まれ、pickup が delivery より前
+複数の経路を (経路数, 最大経路長) の配列にそろえ、経路の位置ごとに全経路をまとめて計算する。
+"""
+import numpy as np
+
+from node_arrays import as_node_arrays
+
+# 違反の種類
+VIOLATION_TYPES = ('unknown_node', 'duplicate', 'capacity', 'time_window', 'pickup_delivery', 'precedence', 'distance')
+
+
+class FeasibilityChecker:
+    """
+    インスタンスごとに一度だけ作り、経路の集合を何度でも検査する
+    - max_distance: 経路の整数距離の合計の上限（Noneなら判定しない）
+    """
+
+    def __init__(self, customers, PD_pairs, vehicle_capacity, max_distance=None):
+        nodes = as_node_arrays(customers)
+        self.vehicle_capacity = vehicle_capacity
+        self.max_distance = max_distance
+        size = int(nodes.id.max()) + 1 if len(nodes) else 0
+        self.size = size
+        ids = nodes.id.astype(np.int64)
+        self.known = np.zeros(size, dtype=bool)
+        self.known[ids] = True
+        # ノードIDで直接引けるように、各列をIDの位置に並べ直す
+        for field in ('x', 'y', 'demand', 'ready', 'due', 'service'):
+            column = np.zeros(size, dtype=np.float64)
+            column[ids] = getattr(nodes, field)
+            setattr(self, field, column)
+        self.partner = np.full(size, -1, dtype=np.int64)
+        self.is_pickup = np.zeros(size, dtype=bool)
+        if PD_pairs:
+            pickups = np.fromiter(PD_pairs.keys(), dtype=np.int64, count=len(PD_pairs))
+            deliveries = np.fromiter(PD_pairs.values(), dtype=np.int64, count=len(PD_pairs))
+            self.partner[pickups] = deliveries
+            self.partner[deliveries] = pickups
+            self.is_pickup[pickups] = True
+
+    def check(self, routes, details=True):
+        """
+        経路（デポ込み）のリストを一括で検査する
+        戻り値: {'feasible': 経路ごとの可否（bool配列）, 'violations': 違反の辞書のリスト, 'counts': 種類ごとの違反数}
+            違反の辞書: 'route'（経路の番号）, 'type', 'node', 'position'（経路上の位置）と、種類に応じて 'value' / 'limit'
+            容量・時間窓は経路ごとに最初の違反だけを返す（以降の地点は連鎖して違反するため）
+        """
+        num_routes = len(routes)
+        lengths = np.fromiter((len(route) for route in routes), dtype=np.int64, count=num_routes)
+        infeasible = np.zeros(num_routes, dtype=bool)
+        violations = []
+        counts = dict.fromkeys(VIOLATION_TYPES, 0)
+        if num_routes == 0 or lengths.max() == 0:
+            return {'feasible': ~infeasible, 'violations': violations, 'counts': counts}
+
+        width = int(lengths.max())
+        mask = np.arange(width)[None, :] < lengths[:, None]
+        ids = np.zeros((num_routes, width), dtype=np.int64)
+        ids[mask] = np.concatenate([np.asarray(route, dtype=np.int64) for route in routes if len(route)])
+
+        def report(kind, route_index, positions, values=None, limit=None):
+            infeasible[route_index] = True
+            counts[kind] += len(route_index)
+            if details:
+                for k, (r, p) in enumerate(zip(route_index.tolist(), positions.tolist())):
+                    violation = {'route': r, 'type': kind, 'node': int(ids[r, p]), 'position': p}
+                    if values is not None:
+                        violation['value'] = float(values[k])
+                        violation['limit'] = float(limit[k] if np.ndim(limit) else limit)
+                    violations.append(violation)
+
+        # 未知のノードは以降の判定から外す（ID 0 のデポとして扱う）
+        in_range = (ids >= 0) & (ids < self.size)
+        unknown = mask & ~(in_range & self.known[np.where(in_range, ids, 0)])
+        if unknown.any():
+            route_index, positions = np.nonzero(unknown)
+            report('unknown_node', route_index, positions)
+            ids = np.where(unknown, 0, ids)
+            mask = mask & ~unknown
+
+        # 積載量：累積需要が [0, 容量] を外れた最初の地点
+        loads = np.cumsum(np.where(mask, self.demand[ids], 0.0), axis=1)
+        over = mask & ((loads > self.vehicle_capacity) | (loads < 0))
+        route_index, positions = _first_true(over)
+        if len(route_index):
+            values = loads[route_index, positions]
+            report('capacity', route_index, positions, values,
+                   np.where(values < 0, 0.0, float(self.vehicle_capacity)))
+
+        # 時間窓：位置ごとに全経路の最早サービス開始時刻を進める
+        travel = np.zeros((num_routes, width), dtype=np.float64)
+        if width > 1:
+            dx = np.diff(self.x[ids], axis=1)
+            dy = np.diff(self.y[ids], axis=1)
+            travel[:, 1:] = np.sqrt(dx ** 2 + dy ** 2).astype(np.int64)
+        travel[~mask] = 0.0
+        ready = self.ready[ids]
+        service = self.service[ids]
+        start = np.empty((num_routes, width), dtype=np.float64)
+        start[:, 0] = ready[:, 0]
+        for k in range(1, width):
+            start[:, k] = np.maximum(ready[:, k], start[:, k - 1] + service[:, k - 1] + travel[:, k])
+        due = self.due[ids]
+        late = mask & (start > due)
+        route_index, positions = _first_true(late)
+        if len(route_index):
+            report('time_window', route_index, positions, start[route_index, positions], due[route_index, positions])
+
+        if self.max_distance is not None:
+            distances = travel.sum(axis=1)
+            route_index = np.nonzero(distances > self.max_distance)[0]
+            if len(route_index):
+                report('distance', route_index, lengths[route_index] - 1, distances[route_index],
+                       np.full(len(route_index), float(self.max_distance)))
+
+        # 重複・pickup→delivery は始点と終点のデポを除いた地点で判定する
+        interior = mask.copy()
+        interior[:, 0] = False
+        interior[np.arange(num_routes), np.maximum(lengths - 1, 0)] = False
+        route_index, positions = np.nonzero(interior)
+        if len(route_index):
+            nodes = ids[route_index, positions]
+            keys = route_index * self.size + nodes
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            duplicated = np.zeros(len(keys), dtype=bool)
+            duplicated[order[1:]] = sorted_keys[1:] == sorted_keys[:-1]
+            if duplicated.any():
+                report('duplicate', route_index[duplicated], positions[duplicated])
+
+            partners = self.partner[nodes]
+            has_partner = partners >= 0
+            partner_keys = route_index * self.size + partners
+            found_at = np.minimum(np.searchsorted(sorted_keys, partner_keys), len(sorted_keys) - 1)
+            found = has_partner & (sorted_keys[found_at] == partner_keys)
+            missing = has_partner & ~found
+            if missing.any():
+                report('pickup_delivery', route_index[missing], positions[missing])
+            partner_positions = positions[order[found_at]]
+            wrong_order = found & self.is_pickup[nodes] & (partner_positions < positions)
+            if wrong_order.any():
+                report('precedence', route_index[wrong_order], positions[wrong_order])
+
+        return {'feasible': ~infeasible, 'violations': violations, 'counts': counts}
+
+    def feasible_mask(self, routes):
+        return self.check(routes, details=False)['feasible']
+
+    def action_mask(self, actions):
+        """アクション（'new_routes' を持つ辞書）の新しい経路をまとめて検査し、アクションごとの可否を返す"""
+        if not actions:
+            return np.zeros(0, dtype=bool)
+        routes = [route for action in actions for route in action['new_routes']]
+        feasible = self.feasible_mask(routes)
+        offsets = np.cumsum([0] + [len(action['new_routes']) for action in actions])
+        # アクションの全経路が実行可能なら可（reduceat は空の区間を扱えないため、違反数の累積和の差で数える）
+        violations = np.concatenate([[0], np.cumsum(~feasible)])
+        return violations[offsets[1:]] == violations[offsets[:-1]]
+
+    def filter_actions(self, actions):
+        """実行不可能なアクションを除き、(実行可能なアクションのリスト, 除外したアクション数) を返す"""
+        mask = self.action_mask(actions)
+        kept = [action for action, feasible in zip(actions, mask) if feasible]
+        return kept, len(actions) - len(kept)
+
+
+def _first_true(matrix):
+    """各行で最初にTrueになる位置を (行の配列, 列の配列) で返す（Trueのない行は含まない）"""
+    rows = np.nonzero(matrix.any(axis=1))[0]
+    return rows, matrix[rows].argmax(axis=1)
+
+
+def audit_routes(routes, customers, PD_pairs, vehicle_capacity, checker=None):
+    """
+    最終経路の監査：各経路の実行可能性に加えて、PDペアの全ノードがちょうど1回ずつ訪問されているかを確認する
+    戻り値: check() の戻り値に 'missing'（未訪問ノードのリスト）と 'visited_twice'（複数の経路で訪問されたノードのリスト）、
+            'num_violations'（違反の総数）を加えた辞書
+    """
+    if checker is None:
+        checker = FeasibilityChecker(customers, PD_pairs, vehicle_capacity)
+    report = checker.check(routes)
+    required = np.zeros(checker.size, dtype=bool)
+    required[checker.partner[checker.partner >= 0]] = True
+    visits = np.zeros(checker.size, dtype=np.int64)
+    interior = [node for route in routes for node in route[1:-1] if 0 <= node < checker.size]
+    np.add.at(visits, np.asarray(interior, dtype=np.int64), 1)
+    report['missing'] = np.nonzero(required & (visits == 0))[0].tolist()
+    # 同じ経路内の重複は 'duplicate' として数えるため、ここでは経路をまたぐ重複を数える
+    routes_per_node = np.zeros(checker.size, dtype=np.int64)
+    for route in routes:
+        nodes_on_route = np.unique(np.asarray([n for n in route[1:-1] if 0 <= n < checker.size], dtype=np.int64))
+        routes_per_node[nodes_on_route] += 1
+    report['visited_twice'] = np.nonzero(routes_per_node > 1)[0].tolist()
+    report['num_violations'] = len(report['violations']) + len(report['missing']) + len(report['visited_twice'])
+    return report
@@ -1,8 +1,15 @@
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
+from node_arrays import NodeArrays, node_column
+from neighbor_lists import candidate_neighbors
+from profiler import profiler
+import numpy as np
 import math
 
-def create_distance_matrix(customers):
+def create_distance_matrix(customers, store=None):
+    # インスタンスストアがあれば全体行列から部分行列を切り出す
+    if store is not None:
+        return store.sub_distance_matrix(node_column(customers, 'id')).tolist()
     size = len(customers)
     matrix = [[0] * size for _ in range(size)]
     for i in range(size):
@@ -12,100 +19,172 @@ def create_distance_matrix(customers):
 
 
 def solve_vrp_flexible(customers, initial_routes, PD_pairs, num_vehicles, vehicle_capacity, start_depots, end_depots,
-                       use_capacity:bool, use_time:bool, use_pickup_delivery:bool, isInitPhase:bool):
-    # 距離行列を作成
-    distance_matrix = create_distance_matrix(customers)
+                       use_capacity:bool, use_time:bool, use_pickup_delivery:bool, isInitPhase:bool, store=None,
+                       time_limit=None, solution_limit=None, callback_mode='matrix', neighbors=None):
+    """
+    OR-Toolsで(部分)VRPを解き、各車両のルート（顧客IDのリスト）を返す
+    - time_limit: 探索の制限時間[秒]（Noneなら無制限）
+    - solution_limit: 探索で見つける解の数の上限（Noneなら無制限）
+    - callback_mode: 'matrix'（距離・時間・需要を行列/ベクトルとして登録し、評価をネイティブ側で完結させる）
+                     / 'python'（Pythonクロージャのコールバックを登録する従来方式）
+    - neighbors: 挿入による初期解の構築と局所探索の近傍を、各ノードの距離の近い neighbors 個のノードに制限する
+                 （OR-Toolsの探索パラメータ。アーク自体は k 近傍に限らない）。あわせて時間窓の上で続けて訪問できない
+                 アークを候補から外す（Noneなら全アーク）。大規模な初期経路生成向けで、
+                 callback_mode='python' と組み合わせると距離行列を作らず座標から距離を計算する
+    """
+    if callback_mode not in ('matrix', 'python'):
+        raise ValueError(f"Unknown callback_mode: {callback_mode}")
+    if neighbors is not None and callback_mode == 'python':
+        # 候補アークに制限する場合は評価するアークが少ないため、距離行列（N×N）を作らない
+        xs = node_column(customers, 'x')
+        ys = node_column(customers, 'y')
+
+        def distance(from_node, to_node):
+            dx = xs[from_node] - xs[to_node]
+            dy = ys[from_node] - ys[to_node]
+            return int(math.sqrt(dx * dx + dy * dy))
+    else:
+        # 距離行列を作成
+        with profiler.span('ortools.distance_matrix', nodes=len(customers)):
+            distance_matrix = create_distance_matrix(customers, store)
+
+        def distance(from_node, to_node):
+            return distance_matrix[from_node][to_node]
     
-     # 顧客ID → インデックス変換辞書
-    id_to_index = {c['id']: i for i, c in enumerate(customers)}
+    # 顧客ID → インデックス変換辞書
+    node_ids = node_column(customers, 'id')
+    id_to_index = {node_id: i for i, node_id in enumerate(node_ids)}
     # 各車両のデポidをインデックスに変換（RoutingIndexManagerに渡す形式）
     starts = [id_to_index[depot_id] for depot_id in start_depots]
     ends = [id_to_index[depot_id] for depot_id in end_depots]
 
-    # routing index managerを作成
-    manager = pywrapcp.RoutingIndexManager(len(customers), num_vehicles, starts, ends)
-    # Routing Modelを作成
-    routing = pywrapcp.RoutingModel(manager)
-
-    # transit callbackを作成・登録
-    def distance_callback(from_idx, to_idx):
-        from_node = manager.IndexToNode(from_idx)
-        to_node = manager.IndexToNode(to_idx)
-        return distance_matrix[from_node][to_node]
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
-
-    #各アークのコストを定義（コスト＝距離）
-    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+    with profiler.span('ortools.build_model', nodes=len(customers), vehicles=num_vehicles):
+        # routing index managerを作成
+        manager = pywrapcp.RoutingIndexManager(len(customers), num_vehicles, starts, ends)
+        # Routing Modelを作成
+        routing = pywrapcp.RoutingModel(manager)
+
+        # transit callbackを作成・登録
+        if callback_mode == 'matrix':
+            transit_callback_index = routing.RegisterTransitMatrix(distance_matrix)
+        else:
+            def distance_callback(from_idx, to_idx):
+                from_node = manager.IndexToNode(from_idx)
+                to_node = manager.IndexToNode(to_idx)
+                return distance(from_node, to_node)
+            transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+
+        #各アークのコストを定義（コスト＝距離）
+        routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
     
-    # 容量制約
-    if use_capacity:
-        demands = [c['demand'] for c in customers]
-        def demand_callback(from_idx):
-            return demands[manager.IndexToNode(from_idx)]
-        demand_cb = routing.RegisterUnaryTransitCallback(demand_callback)
-        routing.AddDimensionWithVehicleCapacity(
-            demand_cb, 0, [vehicle_capacity] * num_vehicles, True, 'Capacity'
-        )
-
-    # 時間制約
-    if use_time:
-        time_windows = [(c['ready'], c['due']) for c in customers]
-        service_times = [c['service'] for c in customers]
-        def time_callback(from_idx, to_idx):
-            from_node = manager.IndexToNode(from_idx)
-            to_node = manager.IndexToNode(to_idx)
-            return distance_matrix[from_node][to_node] + service_times[from_node]
-        time_cb = routing.RegisterTransitCallback(time_callback)
-        routing.AddDimension(time_cb, 99999, 99999, False, "Time")
-        time_dim = routing.GetDimensionOrDie("Time")
-        for node_idx in range(len(customers)):
-            idx = manager.NodeToIndex(node_idx)
-            time_dim.CumulVar(idx).SetRange(*time_windows[node_idx])
-
-    # Pickup and Delivery 制約
-    if use_pickup_delivery:
-        routing.AddDimension(
-            transit_callback_index,
-            0,  # no slack
-            10000,  # vehicle maximum travel distance
-            True,  # start cumul to zero
-            "Distance",
-        )
-        distance_dimension = routing.GetDimensionOrDie("Distance")
-        distance_dimension.SetGlobalSpanCostCoefficient(100)
+        # 容量制約
+        if use_capacity:
+            demands = node_column(customers, 'demand')
+            if callback_mode == 'matrix':
+                demand_cb = routing.RegisterUnaryTransitVector(demands)
+            else:
+                def demand_callback(from_idx):
+                    return demands[manager.IndexToNode(from_idx)]
+                demand_cb = routing.RegisterUnaryTransitCallback(demand_callback)
+            routing.AddDimensionWithVehicleCapacity(
+                demand_cb, 0, [vehicle_capacity] * num_vehicles, True, 'Capacity'
+            )
+
+        # 時間制約
+        if use_time:
+            time_windows = list(zip(node_column(customers, 'ready'), node_column(customers, 'due')))
+            service_times = node_column(customers, 'service')
+            if callback_mode == 'matrix':
+                # 移動時間 = 距離 + 出発ノードのサービス時間
+                time_matrix = [[d + service_times[from_node] for d in row] for from_node, row in enumerate(distance_matrix)]
+                time_cb = routing.RegisterTransitMatrix(time_matrix)
+            else:
+                def time_callback(from_idx, to_idx):
+                    from_node = manager.IndexToNode(from_idx)
+                    to_node = manager.IndexToNode(to_idx)
+                    return distance(from_node, to_node) + service_times[from_node]
+                time_cb = routing.RegisterTransitCallback(time_callback)
+            routing.AddDimension(time_cb, 99999, 99999, False, "Time")
+            time_dim = routing.GetDimensionOrDie("Time")
+            for node_idx in range(len(customers)):
+                idx = manager.NodeToIndex(node_idx)
+                time_dim.CumulVar(idx).SetRange(*time_windows[node_idx])
+
+        # Pickup and Delivery 制約
+        if use_pickup_delivery:
+            routing.AddDimension(
+                transit_callback_index,
+                0,  # no slack
+                10000,  # vehicle maximum travel distance
+                True,  # start cumul to zero
+                "Distance",
+            )
+            distance_dimension = routing.GetDimensionOrDie("Distance")
+            distance_dimension.SetGlobalSpanCostCoefficient(100)
         
-        for pickup_id, delivery_id in PD_pairs:
-            if pickup_id not in id_to_index or delivery_id not in id_to_index:
-                print(f"Invalid ID pair: {pickup_id}, {delivery_id}")
-                continue
-            pickup_idx = manager.NodeToIndex(id_to_index[pickup_id])
-            delivery_idx = manager.NodeToIndex(id_to_index[delivery_id])
-
-            routing.AddPickupAndDelivery(pickup_idx, delivery_idx)
-            routing.solver().Add(routing.VehicleVar(pickup_idx)
-                                 == routing.VehicleVar(delivery_idx))
-            routing.solver().Add(distance_dimension.CumulVar(pickup_idx)
-                                 <= distance_dimension.CumulVar(delivery_idx))
-
-    search_params = pywrapcp.DefaultRoutingSearchParameters()
-    #search_params.log_search = True
-
-    if isInitPhase:
-        search_params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.AUTOMATIC
-        search_params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.AUTOMATIC
-        solution = routing.SolveWithParameters(search_params)
-    else:
-        #search_params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.AUTOMATIC
-        search_params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.AUTOMATIC
-
-        # idをローカルインデックスに変換
-        initial_routes_local = []
-        for route in initial_routes:
-            initial_routes_local.append([id_to_index[node_id] for node_id in route])
-
-        routing.CloseModelWithParameters(search_params)
-        initial_solution = routing.ReadAssignmentFromRoutes(initial_routes_local, True)
-        solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_params)
+            for pickup_id, delivery_id in PD_pairs:
+                if pickup_id not in id_to_index or delivery_id not in id_to_index:
+                    print(f"Invalid ID pair: {pickup_id}, {delivery_id}")
+                    continue
+                pickup_idx = manager.NodeToIndex(id_to_index[pickup_id])
+                delivery_idx = manager.NodeToIndex(id_to_index[delivery_id])
+
+                routing.AddPickupAndDelivery(pickup_idx, delivery_idx)
+                routing.solver().Add(routing.VehicleVar(pickup_idx)
+                                     == routing.VehicleVar(delivery_idx))
+                routing.solver().Add(distance_dimension.CumulVar(pickup_idx)
+                                     <= distance_dimension.CumulVar(delivery_idx))
+
+        # 候補アークの制限：時間窓の上で続けて訪問できないアークを顧客ノードの後続の候補から外す
+        # （どの実行可能解にも現れないアークなので解は失われない。終点デポへのアークは常に許可する）
+        if neighbors is not None and use_time:
+            with profiler.span('ortools.time_window_arcs', nodes=len(customers)):
+                candidates = candidate_neighbors(customers, depot_indices=set(starts + ends))
+                end_indices = [routing.End(vehicle_id) for vehicle_id in range(num_vehicles)]
+                for node_idx, successors in enumerate(candidates):
+                    if successors is None:
+                        continue
+                    allowed = [manager.NodeToIndex(successor) for successor in successors.tolist()] + end_indices
+                    routing.NextVar(manager.NodeToIndex(node_idx)).SetValues(allowed)
+
+        search_params = pywrapcp.DefaultRoutingSearchParameters()
+        #search_params.log_search = True
+        if time_limit is not None:
+            search_params.time_limit.FromMilliseconds(max(1, int(time_limit * 1000)))
+        if solution_limit is not None:
+            search_params.solution_limit = solution_limit
+        if neighbors is not None:
+            # 挿入による初期解の構築と局所探索の近傍を、各ノードの距離の近い neighbors 個のノードに限る
+            neighbors_ratio = min(1.0, neighbors / len(customers))
+            search_params.ls_operator_neighbors_ratio = neighbors_ratio
+            search_params.ls_operator_min_neighbors = neighbors
+            for insertion_params in (search_params.global_cheapest_insertion_first_solution_parameters,
+                                     search_params.global_cheapest_insertion_ls_operator_parameters):
+                insertion_params.neighbors_ratio = neighbors_ratio
+                insertion_params.min_neighbors = neighbors
+
+    with profiler.span('ortools.search', init_phase=isInitPhase):
+        if isInitPhase:
+            search_params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.AUTOMATIC
+            search_params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.AUTOMATIC
+            solution = routing.SolveWithParameters(search_params)
+        else:
+            #search_params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.AUTOMATIC
+            search_params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.AUTOMATIC
+
+            # idをローカルインデックスに変換
+            initial_routes_local = []
+            for route in initial_routes:
+                initial_routes_local.append([id_to_index[node_id] for node_id in route])
+
+            routing.CloseModelWithParameters(search_params)
+            initial_solution = routing.ReadAssignmentFromRoutes(initial_routes_local, True)
+            solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_params)
+    if profiler.enabled:
+        # 呼び出し元の区間（ペア評価・LSPごとの初期経路生成）に求解ステータスを付ける
+        status = routing_enums_pb2.RoutingSearchStatus.Value.Name(routing.status())
+        profiler.annotate(solver_status=status)
+        profiler.count(f'ortools.status.{status}')
     
     if not solution:
         print("No solution found.")
@@ -119,15 +198,21 @@ def solve_vrp_flexible(customers, initial_routes, PD_pairs, num_vehicles, vehicl
         idx = routing.Start(vehicle_id)
         route = []
         while not routing.IsEnd(idx):
-            route.append(customers[manager.IndexToNode(idx)]['id'])
+            route.append(node_ids[manager.IndexToNode(idx)])
             idx = solution.Value(routing.NextVar(idx))
-        route.append(customers[manager.IndexToNode(idx)]['id'])
+        route.append(node_ids[manager.IndexToNode(idx)])
         result.append(route)
 
     return result
 
-def route_cost(route, customers):
-    """ルートの総距離を計算する簡易関数"""
+def route_cost(route, customers, store=None):
+    """ルートの総距離を計算する簡易関数（storeがあればNumPyストアから計算）"""
+    profiler.count('route_cost.calls')
+    if store is not None:
+        return store.route_cost(route)
+    if isinstance(customers, NodeArrays):
+        rows = customers.rows(route)
+        return float(np.hypot(np.diff(customers.x[rows]), np.diff(customers.y[rows])).sum())
     id_to_coord = {c['id']: (c['x'], c['y']) for c in customers}
     cost = 0
     for i in range(len(route) - 1):
@@ -1,134 +1,723 @@
 from flexible_vrp_solver import solve_vrp_flexible, route_cost
+from pair_local_search import solve_pair_local_search
+from matching import max_weight_matching
+from node_arrays import as_node_arrays, select_nodes
+from instance_store import InstanceStore
+from route_state import RouteState, index_PD_pairs, vehicle_PD_pairs
+from feasibility import FeasibilityChecker
+from profiler import profiler, start_worker_profiling
 from ortools.sat.python import cp_model
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import time
+import os
 
 
-def initialize_individual_vrps(customers, pickup_to_delivery, num_lsps, vehicle_num_list, depot_id_list, vehicle_capacity, seed=42):
-    all_vehicle_routes = []
-    
-    for i in range(num_lsps):
-        depot_id = depot_id_list[i]
-        num_vehicles = vehicle_num_list[i]
-
-        # sub_customersの抽出（デポを含む）
-        if i < num_lsps - 1:
-            id_min = depot_id_list[i]
-            id_max = depot_id_list[i + 1]
-            sub_customers = [c for c in customers if id_min <= c['id'] < id_max]
-        else:
-            id_min = depot_id_list[i]
-            sub_customers = [c for c in customers if c['id'] >= id_min]
-        
-        # sub_PD_pairsの抽出
-        sub_customer_ids = {c['id'] for c in sub_customers}
-        sub_PD_pairs = [
-            (pickup, delivery)
-            for pickup, delivery in pickup_to_delivery.items()
-            if pickup in sub_customer_ids or delivery in sub_customer_ids
-        ]
+def split_lsp_subproblems(customers, pickup_to_delivery, depot_id_list):
+    """
+    全ノードと全PDペアを、デポIDの範囲（LSP iのノードは depot_id_list[i] <= id < depot_id_list[i+1]）でLSPごとに分割する
+    - ノードはID昇順に並んでいることを前提に、範囲の境界を一度だけ二分探索で求めて行範囲で切り出す
+    - PDペアはpickupまたはdeliveryが属するLSPに、元の順序のまま振り分ける
+    戻り値: [(sub_customers, sub_PD_pairs), ...]（LSP順）
+    """
+    with profiler.span('init.split', lsps=len(depot_id_list)):
+        return _split_lsp_subproblems(as_node_arrays(customers), pickup_to_delivery, depot_id_list)
+
+
+def _split_lsp_subproblems(nodes, pickup_to_delivery, depot_id_list):
+    depot_ids = np.asarray(depot_id_list, dtype=np.int64)
+    bounds = np.searchsorted(nodes.id, depot_ids, side='left').tolist() + [len(nodes)]
+    sub_customers = [nodes.take(np.arange(bounds[i], bounds[i + 1])) for i in range(len(depot_id_list))]
+
+    sub_PD_pairs = [[] for _ in depot_id_list]
+    if pickup_to_delivery:
+        pickups = np.fromiter(pickup_to_delivery.keys(), dtype=np.int64, count=len(pickup_to_delivery))
+        deliveries = np.fromiter(pickup_to_delivery.values(), dtype=np.int64, count=len(pickup_to_delivery))
+        pickup_lsp = (np.searchsorted(depot_ids, pickups, side='right') - 1).tolist()
+        delivery_lsp = (np.searchsorted(depot_ids, deliveries, side='right') - 1).tolist()
+        for pair, lsp_p, lsp_d in zip(pickup_to_delivery.items(), pickup_lsp, delivery_lsp):
+            if lsp_p >= 0:
+                sub_PD_pairs[lsp_p].append(pair)
+            if lsp_d >= 0 and lsp_d != lsp_p:
+                sub_PD_pairs[lsp_d].append(pair)
+    return list(zip(sub_customers, sub_PD_pairs))
+
 
-        # 各車両の出発／終了デポ設定
-        start_depot = [depot_id] * num_vehicles
-        end_depot = [depot_id] * num_vehicles
-        
-        initial_routes = None
-        # VRPを解く
+def _solve_lsp(task):
+    # LSP 1社分の個別PDPTWを解く（ワーカープロセスでは部分問題の距離行列だけを持つInstanceStoreを作る）
+    sub_customers, sub_PD_pairs, num_vehicles, vehicle_capacity, depot_id, store, solver_options = task
+    with profiler.span('init.lsp', depot_id=depot_id, nodes=len(sub_customers), vehicles=num_vehicles):
+        neighbors = solver_options.get('neighbors')
+        # 候補アークの制限とPythonコールバックを組み合わせる場合は、距離行列を作らずに解く
+        dense = neighbors is None or solver_options.get('callback_mode', 'matrix') == 'matrix'
+        if store is None and dense:
+            store = InstanceStore(sub_customers)
+
+        def solve(options, store):
+            return solve_vrp_flexible(
+                sub_customers,
+                None,
+                sub_PD_pairs,
+                num_vehicles=num_vehicles,
+                vehicle_capacity=vehicle_capacity,
+                start_depots=[depot_id] * num_vehicles,
+                end_depots=[depot_id] * num_vehicles,
+                use_capacity=True,
+                use_time=True,
+                use_pickup_delivery=True,
+                isInitPhase=True,
+                store=store,
+                **options
+            )
+
+        routes = solve(solver_options, store)
+        if routes is None and neighbors is not None:
+            # 候補アークを制限したせいで初期解が作れない場合は、全アークで解き直す
+            print(f"デポ {depot_id}: 近傍制限（k={neighbors}）で解が見つからないため、全アークで解き直します")
+            profiler.count('init.neighbors_fallback')
+            routes = solve(dict(solver_options, neighbors=None), store if store is not None else InstanceStore(sub_customers))
+        return routes
+
+
+def _solve_lsp_in_worker(task):
+    # ワーカープロセスでの計測結果は経路と一緒に親プロセスへ返す
+    routes = _solve_lsp(task)
+    return routes, profiler.drain() if profiler.enabled else None
+
+
+def initialize_individual_vrps(customers, pickup_to_delivery, num_lsps, vehicle_num_list, depot_id_list, vehicle_capacity, seed=42, store=None,
+                               solver_options=None, num_workers=1):
+    """
+    各LSPの個別PDPTWを解いて初期経路を生成する
+    - solver_options: solve_vrp_flexibleに渡す探索制限（'time_limit', 'solution_limit'）。LSPごとに適用される
+                      'time_limit' にリストを渡すと、LSPごとに異なる制限時間[秒]を与えられる
+                      'neighbors' に整数kを渡すと、初期解の構築と局所探索の近傍を各ノードのk近傍に制限して解く
+                      （解が見つからないLSPは全アークで解き直す。'callback_mode': 'python' と組み合わせると距離行列を作らない）
+    - num_workers: LSPを並列に解くワーカープロセス数（1ならシリアル実行）。各LSPの部分問題は互いに独立している
+    """
+    solver_options = dict(solver_options or {})
+    time_limits = solver_options.pop('time_limit', None)
+    if not isinstance(time_limits, (list, tuple)):
+        time_limits = [time_limits] * num_lsps
+
+    # ノードとPDペアをデポIDの範囲で一度に分割する
+    subproblems = split_lsp_subproblems(customers, pickup_to_delivery, depot_id_list[:num_lsps])
+    parallel = num_workers > 1 and num_lsps > 1
+    tasks = []
+    for i, (sub_customers, sub_PD_pairs) in enumerate(subproblems):
+        lsp_options = dict(solver_options, time_limit=time_limits[i])
+        # 並列実行時は全体の距離行列を転送せず、ワーカー側で部分問題の行列だけを作る
+        tasks.append((sub_customers, sub_PD_pairs, vehicle_num_list[i], vehicle_capacity, depot_id_list[i],
+                      None if parallel else store, lsp_options))
         print(f">>>LSP {i+1}の初期経路を生成中・・・")
-        lsp_routes = solve_vrp_flexible(
-            sub_customers,
-            initial_routes,
-            sub_PD_pairs,
-            num_vehicles=num_vehicles,
-            vehicle_capacity=vehicle_capacity,
-            start_depots=start_depot,
-            end_depots=end_depot,
-            use_capacity=True,
-            use_time=True,
-            use_pickup_delivery=True,
-            isInitPhase=True
-        )
 
+    if parallel:
+        with ProcessPoolExecutor(max_workers=min(num_workers, num_lsps), initializer=start_worker_profiling,
+                                 initargs=(profiler.enabled,)) as pool:
+            results = []
+            for lsp_routes, profile in pool.map(_solve_lsp_in_worker, tasks):
+                profiler.merge(profile)
+                results.append(lsp_routes)
+    else:
+        results = [_solve_lsp(task) for task in tasks]
+
+    all_vehicle_routes = []
+    for i, lsp_routes in enumerate(results):
+        if lsp_routes is None:
+            raise RuntimeError(f"LSP {i+1}の初期経路が見つかりませんでした（探索制限: {tasks[i][-1]}）")
         all_vehicle_routes.extend(lsp_routes)
 
     return all_vehicle_routes
 
 
-def perform_gat_exchange(original_routes, customers, PD_pairs, vehicle_capacity):
+# 2車両VRPを解くエンジン（いずれも solve_vrp_flexible と同じインターフェース）
+# solver_options['engine'] で選択し、'compare' を指定すると両方で解いてOR-Tools版との差を記録する
+PAIR_ENGINES = {
+    'ortools': solve_vrp_flexible,
+    'local_search': solve_pair_local_search,
+}
+
+
+def evaluate_vehicle_pair(i, j, route_i, route_j, PD_pairs_of_2vehicle, customers, vehicle_capacity, store=None,
+                          solver_options=None, deadline=None, cache=None, stop=None):
+    """
+    2車両ペア(i, j)に対して2車両VRPを解き、改善があればアクションのリストを返す
+    - route_i, route_j: 各車両の現在の経路（デポ込み）
+    - PD_pairs_of_2vehicle: 2車両が担当するpickup→deliveryタプルのリスト
+    - store: InstanceStore（指定時は距離行列の切り出しとルートコストの一括計算に使用）
+    - solver_options: 'engine'（PAIR_ENGINESのキーまたは'compare'、既定は'ortools'）と、
+                      エンジンに渡す探索制限（'time_limit', 'solution_limit'）
+    - deadline: ラウンド全体の締め切り（time.time()基準）。超過していれば解かずにスキップし、
+                残り時間がペアの制限時間より短ければ制限時間を残り時間に切り詰める
+    - cache: PairSolveCache（指定時は同一部分問題の求解結果を再利用し、新たに解いた結果を保存する）
+             キーには切り詰め前の探索制限を使い、締め切りで制限時間を切り詰めた結果は保存しない。engine='compare'では使わない
+    - stop: 打ち切りの合図（is_set() を持つ threading.Event / multiprocessing.Event）。セット済みなら締め切り超過と同じくスキップする
+    戻り値: ペア評価結果の辞書
+        - 'actions': 実行可能アクションのリスト（改善なしなら空リスト）
+        - 'solve_time': 2車両VRPの求解時間[秒]
+        - 'skipped': 締め切り超過（または打ち切り）で解かなかった場合にTrue
+        - 'comparison': engine='compare'の場合、両エンジンのコストと求解時間
+        - 'cache_hit': cacheを使った場合、キャッシュから結果を得たかどうか（使わなければNone）
+    計測が有効な場合は、部分問題の大きさ・求解時間・改善量・求解ステータスをペアごとに記録する
+    """
+    args = (i, j, route_i, route_j, PD_pairs_of_2vehicle, customers, vehicle_capacity, store, solver_options, deadline, cache,
+            stop)
+    if not profiler.enabled:
+        return _evaluate_vehicle_pair(*args)
+    with profiler.span('pair.evaluate', i=i, j=j) as span:
+        result = _evaluate_vehicle_pair(*args)
+    profiler.record('pair', **_pair_record(i, j, route_i, route_j, PD_pairs_of_2vehicle, solver_options, result, span.args))
+    return result
+
+
+def _pair_record(i, j, route_i, route_j, PD_pairs_of_2vehicle, solver_options, result, span_args):
+    if result.get('skipped'):
+        outcome = 'skipped'
+    elif span_args.get('no_solution'):
+        outcome = 'no_solution'
+    else:
+        outcome = 'improved' if result['actions'] else 'no_improvement'
+    return {
+        'i': i,
+        'j': j,
+        'nodes': len(set(route_i) | set(route_j)),
+        'pd_pairs': len(PD_pairs_of_2vehicle),
+        'engine': (solver_options or {}).get('engine', 'ortools'),
+        'solve_time': result['solve_time'],
+        'improvement': max((action['cost_improvement'] for action in result['actions']), default=0.0),
+        'outcome': outcome,
+        'cache_hit': result.get('cache_hit'),
+        'solver_status': span_args.get('solver_status'),
+    }
+
+
+def pair_subproblem(route_i, route_j, PD_pairs_of_2vehicle, customers, vehicle_capacity):
+    """ペア(i, j)の2車両VRPについて、solve_vrp_flexible の位置引数のタプルを作る"""
+    # 2車両分の訪問地点（空リストも考慮）を結合して集合に
+    combined_node_ids = set(route_i + route_j)
+
+    # 両車両のデポは必ず含める
+    combined_node_ids.add(route_i[0])
+    combined_node_ids.add(route_j[0])
+
+    # 該当する顧客情報を抽出（NodeArraysなら走査せずID→行の参照で取り出す）
+    with profiler.span('pair.subproblem', nodes=len(combined_node_ids)):
+        sub_customers = select_nodes(customers, combined_node_ids)
+
+    # デポ情報の抽出
+    start_depots = [route_i[0], route_j[0]]
+    end_depots = [route_i[0], route_j[0]]
+
+    # routing.ReadAssignmentFromRoutes用引数
+    initial_routes = [r[1:-1] for r in [route_i, route_j]]
+    return (sub_customers, initial_routes, PD_pairs_of_2vehicle, 2, vehicle_capacity, start_depots, end_depots)
+
+
+# ペアの2車両VRPで使う制約フラグ
+PAIR_SOLVE_FLAGS = dict(use_capacity=True, use_time=True, use_pickup_delivery=True, isInitPhase=False)
+
+
+def solve_pair_subproblem(solve_args, engine='ortools', store=None, **solver_options):
+    """
+    pair_subproblem() の引数で2車両VRPを解き、(新しい経路 or None, エンジン比較の辞書 or None) を返す
+    - engine='compare' ではOR-Tools版の結果を返し、軽量エンジンの結果は比較用に記録する
+    """
+    solve_kwargs = dict(PAIR_SOLVE_FLAGS, store=store, **solver_options)
+    if engine != 'compare':
+        return PAIR_ENGINES[engine](*solve_args, **solve_kwargs), None
+    sub_customers = solve_args[0]
+    start_time = time.perf_counter()
+    new_routes = PAIR_ENGINES['ortools'](*solve_args, **solve_kwargs)
+    ortools_time = time.perf_counter() - start_time
+    local_search_routes = PAIR_ENGINES['local_search'](*solve_args, **solve_kwargs)
+    local_search_time = time.perf_counter() - start_time - ortools_time
+    comparison = {
+        'ortools_cost': sum(route_cost(r, sub_customers, store) for r in new_routes) if new_routes else None,
+        'local_search_cost': sum(route_cost(r, sub_customers, store) for r in local_search_routes) if local_search_routes else None,
+        'ortools_time': ortools_time,
+        'local_search_time': local_search_time,
+    }
+    return new_routes, comparison
+
+
+def pair_actions(i, j, route_i, route_j, new_routes, customers, store=None):
+    """2車両VRPの解から、ペア(i, j)の実行可能アクションのリストを作る（改善がなければ空リスト）"""
+    actions = []
+    if store is not None:
+        old_cost_i, old_cost_j, new_cost_i, new_cost_j = store.route_costs([route_i, route_j] + new_routes)
+        old_cost = old_cost_i + old_cost_j
+        new_cost = new_cost_i + new_cost_j
+    else:
+        old_cost = route_cost(route_i, customers) + route_cost(route_j, customers)
+        new_cost = sum(route_cost(r, customers) for r in new_routes)
+    #経路が更新されていればアクション集合に追加
+    if new_cost < old_cost:
+        actions.append({
+            'vehicle_pair': (i, j),
+            'old_routes': [route_i, route_j],
+            'new_routes': new_routes,
+            'old_cost': old_cost,
+            'new_cost': new_cost,
+            'cost_improvement': old_cost - new_cost
+        })
+        # 非効率な経路交換：ルート本体だけを入れ替え、デポはそれぞれの元のデポを維持する
+        original_depot_i = new_routes[0][0]
+        original_depot_j = new_routes[1][0]
+        # 中間ノード（デポ除く）を抽出
+        mid_i = [n for n in new_routes[0] if n != original_depot_i]
+        mid_j = [n for n in new_routes[1] if n != original_depot_j]
+        # 丸ごと交換した新しい経路を作成（デポ固定）
+        exchanged_routes = [
+        [original_depot_i] + mid_j + [original_depot_i],
+        [original_depot_j] + mid_i + [original_depot_j]
+        ]
+        exchanged_cost = sum(route_cost(r, customers, store) for r in exchanged_routes)
+        #アクション集合に追加
+        actions.append({
+            'vehicle_pair': (i, j),
+            'old_routes': [route_i, route_j],
+            'new_routes': exchanged_routes,
+            'old_cost': old_cost,
+            'new_cost': exchanged_cost,
+            'cost_improvement': old_cost - exchanged_cost
+        })
+    return actions
+
+
+def _evaluate_vehicle_pair(i, j, route_i, route_j, PD_pairs_of_2vehicle, customers, vehicle_capacity, store,
+                           solver_options, deadline, cache, stop):
+    solver_options = dict(solver_options or {})
+    engine = solver_options.pop('engine', 'ortools')
+    start_time = time.perf_counter()
+
+    solve_args = pair_subproblem(route_i, route_j, PD_pairs_of_2vehicle, customers, vehicle_capacity)
+
+    #2車両VRP解決
+    cache_key = None
+    cache_hit = None
+    new_routes = None
+    if cache is not None and engine != 'compare':
+        with profiler.span('pair.cache_lookup'):
+            cache_key = cache.make_key(*solve_args, **PAIR_SOLVE_FLAGS, solver_options=dict(solver_options, engine=engine))
+            new_routes = cache.get(cache_key)
+        cache_hit = new_routes is not None
+        profiler.count('pair_cache.hits' if cache_hit else 'pair_cache.misses')
+    truncated = False
+    if stop is not None and stop.is_set() and not cache_hit:
+        return {'actions': [], 'solve_time': 0.0, 'skipped': True, 'cache_hit': cache_hit}
+    if deadline is not None and not cache_hit:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return {'actions': [], 'solve_time': 0.0, 'skipped': True, 'cache_hit': cache_hit}
+        if solver_options.get('time_limit') is None or solver_options['time_limit'] > remaining:
+            solver_options['time_limit'] = remaining
+            truncated = True
+    comparison = None
+    if not cache_hit:
+        new_routes, comparison = solve_pair_subproblem(solve_args, engine, store, **solver_options)
+        # 解なし（None）はキャッシュしない：制限時間を延ばした再実験で解ける可能性がある
+        if cache_key is not None and new_routes is not None and not truncated:
+            cache.put(cache_key, new_routes)
+    solve_time = time.perf_counter() - start_time
+    if new_routes is None:
+        profiler.annotate(no_solution=True)
+        return {'actions': [], 'solve_time': solve_time, 'comparison': comparison, 'cache_hit': cache_hit}
+    actions = pair_actions(i, j, route_i, route_j, new_routes, customers, store)
+    return {'actions': actions, 'solve_time': solve_time, 'comparison': comparison, 'cache_hit': cache_hit}
+
+
+# ワーカープロセス側で保持するインスタンスデータ（プール生成時に一度だけ受け取る）
+_worker_context = {}
+
+
+def _init_pair_worker(customers, vehicle_capacity, store, solver_options, cache=None, profile=False, stop=None):
+    _worker_context['customers'] = customers
+    _worker_context['vehicle_capacity'] = vehicle_capacity
+    _worker_context['store'] = store
+    _worker_context['solver_options'] = solver_options
+    # PairSolveCacheはSQLite接続を持たずに転送され、各ワーカーで最初の参照時に接続を開く
+    _worker_context['cache'] = cache
+    # 打ち切りの合図（multiprocessing.Event）はワーカー生成時に引き継ぎ、各ペアの求解前に確認する
+    _worker_context['stop'] = stop
+    start_worker_profiling(profile)
+
+
+def _evaluate_pair_task(task, deadline=None):
+    i, j, route_i, route_j, PD_pairs_of_2vehicle = task
+    result = evaluate_vehicle_pair(i, j, route_i, route_j, PD_pairs_of_2vehicle,
+                                   _worker_context['customers'], _worker_context['vehicle_capacity'],
+                                   _worker_context['store'], _worker_context['solver_options'], deadline,
+                                   _worker_context['cache'], _worker_context['stop'])
+    if profiler.enabled:
+        # ワーカー側の計測結果はペア評価結果に載せて親プロセスへ返す
+        result['profile'] = profiler.drain()
+    return result
+
+
+def _map_pair_tasks(pool, pair_tasks, num_workers, chunksize, deadline=None):
+    # executor.mapは投入順に結果を返すので、選択ステップへの入力順序は決定的になる
+    if chunksize is None:
+        chunksize = max(1, len(pair_tasks) // (num_workers * 4))
+    results = list(pool.map(partial(_evaluate_pair_task, deadline=deadline), pair_tasks, chunksize=chunksize))
+    for result in results:
+        profiler.merge(result.pop('profile', None))
+    return results
+
+
+def create_pair_pool(customers, vehicle_capacity, num_workers=None, store=None, solver_options=None, cache=None, stop=None):
+    """
+    2車両VRPを並列に解くためのプロセスプールを生成する
+    - 顧客データ（とInstanceStore・探索制限・求解結果キャッシュ）はワーカー初期化時に一度だけ転送され、以降のラウンドでも使い回される
+    - num_workers: ワーカー数（Noneの場合はCPUコア数）
+    - 計測（profiler）の有効/無効はプール生成時の状態がワーカーに引き継がれる
+    - stop: 打ち切りの合図（multiprocessing.Event）。セットされるとワーカーは未着手のペアを解かずにスキップする
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    return ProcessPoolExecutor(max_workers=num_workers, initializer=_init_pair_worker,
+                               initargs=(customers, vehicle_capacity, store, solver_options, cache, profiler.enabled, stop))
+
+
+def build_vehicle_PD_pairs(routes, PD_pairs):
+    """
+    各車両ごとの集荷->配達のペアをまとめたリストを作成する（各車両のペアは PD_pairs の辞書の順）
+    ノード → PDペアの索引を一度だけ作り、各車両は訪問ノードから引くので、車両数 × PDペア数 の走査はしない
+    """
+    with profiler.span('gat.vehicle_PD_pairs', routes=len(routes)):
+        pairs, pair_indices_of_node = index_PD_pairs(PD_pairs)
+        return [vehicle_PD_pairs(vehicle_route, pairs, pair_indices_of_node) for vehicle_route in routes]
+
+
+# 2車両ペア事前スクリーニングの既定設定
+# - mode: 'off'（スクリーニングなし）/ 'conservative'（改善し得ないことが証明できるペアのみ除外。
+#         現在の2ルートも解の1つなので下界は現在のコストを超えず、除外されるのは現在のコストが下界に一致するペアだけ）
+#         / 'heuristic'（conservativeに加えて下記の閾値で空間・時間的に離れたペアを除外）
+# - max_bbox_gap: 2ルートの顧客バウンディングボックス間距離の上限（Noneなら判定しない）
+# - max_depot_distance: 2車両のデポ間距離の上限（Noneなら判定しない）
+# - min_time_overlap: 2ルートの時間範囲 [最小ready, 最大due] の重なりの下限（Noneなら判定しない）
+PAIR_SCREENING_DEFAULTS = {
+    'mode': 'off',
+    'max_bbox_gap': 25.0,
+    'max_depot_distance': None,
+    'min_time_overlap': 0.0,
+}
+
+
+def summarize_routes(routes, customers, store=None, costs=None):
+    """
+    スクリーニング用に各ルートの座標・バウンディングボックス・時間範囲・コストをまとめる
+    - costs: 計算済みのルートコスト（RouteState.costs など。Noneなら計算する）
+    """
+    with profiler.span('gat.summarize_routes', routes=len(routes)):
+        return _summarize_routes(routes, customers, store, costs)
+
+
+def _summarize_routes(routes, customers, store, costs):
+    nodes = as_node_arrays(customers)
+    if costs is None:
+        costs = store.route_costs(routes) if store is not None else [route_cost(route, customers) for route in routes]
+    summaries = []
+    for route, cost in zip(routes, costs):
+        depot_row = nodes.rows([route[0]])[0]
+        depot_x, depot_y = float(nodes.x[depot_row]), float(nodes.y[depot_row])
+        rows = nodes.rows([n for n in route if n != route[0]])
+        coords = np.column_stack([nodes.x[rows], nodes.y[rows]])
+        summary = {
+            'depot_coord': (depot_x, depot_y),
+            'coords': coords,
+            'cost': float(cost),
+        }
+        if len(rows):
+            summary['bbox'] = (coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max())
+            summary['time_range'] = (int(nodes.ready[rows].min()), int(nodes.due[rows].max()))
+        else:
+            # 空車両はデポ位置を範囲とし、時間範囲は制約なしとして扱う
+            summary['bbox'] = (depot_x, depot_y, depot_x, depot_y)
+            summary['time_range'] = None
+        summaries.append(summary)
+    return summaries
+
+
+def pair_cost_lower_bound(summary_i, summary_j):
+    """
+    2車両で両ルートの顧客をすべて訪問する場合の総距離の下界（ルートコストと同じ切り捨て整数距離で計算する）
+    各顧客は解の中でちょうど2本の辺（直前・直後）に接続する。顧客間の辺は両端の顧客に半分ずつ、デポとの辺は
+    顧客側に全量を割り当てると総距離は顧客ごとの割り当ての和に等しいので、顧客ごとに「最も軽い接続辺2本」の和は総距離以下になる
+    （顧客1人だけのルートは同じデポと2回つながるため、各デポは2本分の候補とする）
+    """
+    coords = np.vstack([summary_i['coords'], summary_j['coords']])
+    if len(coords) == 0:
+        return 0.0
+    depots = np.array([summary_i['depot_coord'], summary_j['depot_coord']], dtype=float)
+    to_customers = 0.5 * np.sqrt(((coords[:, None, :] - coords[None, :, :]) ** 2).sum(axis=2)).astype(np.int64)
+    np.fill_diagonal(to_customers, np.inf)
+    to_depots = np.sqrt(((coords[:, None, :] - depots[None, :, :]) ** 2).sum(axis=2)).astype(np.int64)
+    candidates = np.hstack([to_customers, to_depots, to_depots])
+    two_shortest = np.partition(candidates, 1, axis=1)[:, :2]
+    return float(two_shortest.sum())
+
+
+def screen_vehicle_pair(summary_i, summary_j, screening):
+    """
+    2車両ペアを2車両VRPに渡す前に判定し、除外する場合はその理由、残す場合はNoneを返す
+    - screening: PAIR_SCREENING_DEFAULTS と同じキーを持つ設定辞書
+    """
+    mode = screening['mode']
+    if mode == 'off':
+        return None
+
+    # 保守的判定：下界が現在コスト以上なら、どの2車両解も改善にならない
+    old_cost = summary_i['cost'] + summary_j['cost']
+    if pair_cost_lower_bound(summary_i, summary_j) - 1e-6 >= old_cost:
+        return 'lower_bound'
+    if mode == 'conservative':
+        return None
+
+    # 発見的判定：空間的・時間的に離れたペアを除外
+    if screening['max_depot_distance'] is not None:
+        (dx_i, dy_i), (dx_j, dy_j) = summary_i['depot_coord'], summary_j['depot_coord']
+        if ((dx_i - dx_j) ** 2 + (dy_i - dy_j) ** 2) ** 0.5 > screening['max_depot_distance']:
+            return 'depot_distance'
+    if screening['max_bbox_gap'] is not None:
+        min_x_i, min_y_i, max_x_i, max_y_i = summary_i['bbox']
+        min_x_j, min_y_j, max_x_j, max_y_j = summary_j['bbox']
+        gap_x = max(0.0, max(min_x_i, min_x_j) - min(max_x_i, max_x_j))
+        gap_y = max(0.0, max(min_y_i, min_y_j) - min(max_y_i, max_y_j))
+        if (gap_x ** 2 + gap_y ** 2) ** 0.5 > screening['max_bbox_gap']:
+            return 'bbox_gap'
+    if screening['min_time_overlap'] is not None and summary_i['time_range'] and summary_j['time_range']:
+        overlap = min(summary_i['time_range'][1], summary_j['time_range'][1]) - max(summary_i['time_range'][0], summary_j['time_range'][0])
+        if overlap < screening['min_time_overlap']:
+            return 'time_overlap'
+    return None
+
+
+def screen_pair_tasks(pair_tasks, summaries, screening):
+    """ペアタスクを事前スクリーニングし、(残すタスク, {(i, j): 除外理由}) を返す"""
+    if screening is None or screening['mode'] == 'off':
+        return pair_tasks, {}
+    kept_tasks = []
+    pruned_pairs = {}
+    with profiler.span('gat.screening', pairs=len(pair_tasks), mode=screening['mode']):
+        for task in pair_tasks:
+            reason = screen_vehicle_pair(summaries[task[0]], summaries[task[1]], screening)
+            if reason is None:
+                kept_tasks.append(task)
+            else:
+                pruned_pairs[(task[0], task[1])] = reason
+    if profiler.enabled:
+        for (i, j), reason in pruned_pairs.items():
+            profiler.record('pair', i=i, j=j, outcome='pruned', reason=reason)
+    return kept_tasks, pruned_pairs
+
+
+def _screening_config(screening):
+    if screening is None:
+        return None
+    config = dict(PAIR_SCREENING_DEFAULTS)
+    config.update(screening)
+    return config
+
+
+def _round_stats(num_pairs, pruned_pairs, pair_results):
+    # 除外したペアの節約時間は、実際に解いたペアの平均求解時間から見積もる
+    solver_time = sum(result['solve_time'] for result in pair_results)
+    num_pruned = len(pruned_pairs)
+    num_skipped = sum(1 for result in pair_results if result.get('skipped'))
+    cache_hits = sum(1 for result in pair_results if result.get('cache_hit') is True)
+    cache_misses = sum(1 for result in pair_results if result.get('cache_hit') is False)
+    pruned_by = {}
+    for reason in pruned_pairs.values():
+        pruned_by[reason] = pruned_by.get(reason, 0) + 1
+    mean_solve_time = solver_time / len(pair_results) if pair_results else 0.0
+    return {
+        'pairs_total': num_pairs,
+        'pairs_pruned': num_pruned,
+        'pruned_by': pruned_by,
+        'solver_time': solver_time,
+        'estimated_time_saved': num_pruned * mean_solve_time,
+        'pairs_skipped': num_skipped,
+        'cache_hits': cache_hits,
+        'cache_misses': cache_misses,
+        'actions_rejected': sum(result.get('rejected_actions', 0) for result in pair_results),
+        'engine_comparison': _engine_comparison_stats(pair_results),
+    }
+
+
+def _engine_comparison_stats(pair_results):
+    # engine='compare' で解いたペアについて、軽量エンジンのOR-Tools版に対するギャップを集計する
+    comparisons = [result['comparison'] for result in pair_results
+                   if result.get('comparison') and result['comparison']['ortools_cost'] is not None]
+    if not comparisons:
+        return None
+    solved = [c for c in comparisons if c['local_search_cost'] is not None]
+    gaps = [(c['local_search_cost'] - c['ortools_cost']) / c['ortools_cost'] * 100
+            for c in solved if c['ortools_cost'] > 0]
+    return {
+        'pairs': len(comparisons),
+        'local_search_failed': len(comparisons) - len(solved),
+        'mean_gap_percent': sum(gaps) / len(gaps) if gaps else 0.0,
+        'max_gap_percent': max(gaps) if gaps else 0.0,
+        'local_search_better': sum(1 for c in solved if c['local_search_cost'] < c['ortools_cost'] - 1e-9),
+        'ortools_better': sum(1 for c in solved if c['ortools_cost'] < c['local_search_cost'] - 1e-9),
+        'ortools_time': sum(c['ortools_time'] for c in comparisons),
+        'local_search_time': sum(c['local_search_time'] for c in comparisons),
+    }
+
+
+def validate_pair_results(pair_results, checker):
+    """
+    ペア評価結果のアクションの新しい経路を FeasibilityChecker で一括検査し、実行不可能なアクションを結果から除く
+    （経路の丸ごと交換はデポの位置・時間窓が変わるため、2車両VRPの解でも実行不可能になり得る）
+    除いたアクション数は結果の 'rejected_actions' に記録する
+    """
+    actions = [action for result in pair_results for action in result['actions']]
+    if checker is None or not actions:
+        return
+    with profiler.span('gat.validate_actions', actions=len(actions)):
+        mask = checker.action_mask(actions)
+    k = 0
+    for result in pair_results:
+        num_actions = len(result['actions'])
+        kept = [action for action, feasible in zip(result['actions'], mask[k:k + num_actions]) if feasible]
+        k += num_actions
+        if len(kept) < num_actions:
+            result['actions'] = kept
+            result['rejected_actions'] = num_actions - len(kept)
+    profiler.count('actions.rejected', len(actions) - int(mask.sum()))
+
+
+def evaluate_pair_tasks(pair_tasks, customers, vehicle_capacity, num_workers=1, chunksize=None, pool=None, store=None,
+                        solver_options=None, deadline=None, cache=None, stop=None):
+    """
+    ペアタスク (i, j, route_i, route_j, PD_pairs_of_2vehicle) のリストを評価し、タスク順にペア評価結果のリストを返す
+    - poolを指定する場合、solver_options・cache・stopはプール生成時に渡したものが使われる
+      （pair_worker.SpoolPairPool のように evaluate_pair_tasks を持つpoolには、ここでの引数をそのまま渡す）
+    """
+    with profiler.span('gat.evaluate_pairs', pairs=len(pair_tasks), parallel=pool is not None or num_workers > 1):
+        if hasattr(pool, 'evaluate_pair_tasks'):
+            return pool.evaluate_pair_tasks(pair_tasks, customers, vehicle_capacity, store, solver_options, deadline, cache,
+                                            stop)
+        if pool is not None:
+            return _map_pair_tasks(pool, pair_tasks, num_workers, chunksize, deadline)
+        if num_workers > 1 and len(pair_tasks) > 1:
+            with create_pair_pool(customers, vehicle_capacity, num_workers, store, solver_options, cache, stop) as own_pool:
+                return _map_pair_tasks(own_pool, pair_tasks, num_workers, chunksize, deadline)
+        return [
+            evaluate_vehicle_pair(*task, customers, vehicle_capacity, store, solver_options, deadline, cache, stop)
+            for task in pair_tasks
+        ]
+
+
+def perform_gat_exchange(original_routes, customers, PD_pairs, vehicle_capacity, num_workers=1, chunksize=None, pool=None, store=None,
+                         screening=None, stats=None, selection='matching', solver_options=None, deadline=None, cache=None,
+                         validate=True):
+    """
+    全2車両ペアに対してGAT交換を試み、最適なアクションの組み合わせを適用した経路を返す
+    - num_workers: 2車両VRPを解くワーカープロセス数（1ならシリアル実行）
+    - chunksize: ワーカーへ一度に送るペア数（Noneなら自動決定）
+    - pool: create_pair_pool()で生成済みのプール（ラウンド間で使い回す場合に指定、num_workersはプールのワーカー数に合わせる）
+    - store: InstanceStore（距離行列・ルートコストの計算に使用）
+    - screening: ペア事前スクリーニング設定（PAIR_SCREENING_DEFAULTSを上書きする辞書、Noneならスクリーニングなし）
+    - stats: 辞書を渡すと、除外ペア数・求解時間・節約時間の見積もりを書き込む
+    - selection: アクション選択方法（'matching' または 'cpsat'）
+    - solver_options: 2車両VRPの探索制限（'time_limit', 'solution_limit'）
+    - deadline: ラウンドの締め切り（time.time()基準）。超過後のペアは解かずにスキップする
+    - cache: PairSolveCache（実行をまたいで2車両VRPの求解結果を再利用する）
+    - validate: Trueなら選択の前に全アクションの新しい経路を feasibility.FeasibilityChecker で検査し、実行不可能なものを除く
+    """
     feasible_actions = []#実行可能アクション集合
     num_vehicles = len(original_routes)
+    screening = _screening_config(screening)
     
     #各車両ごとの集荷->配達のペアをまとめたリストを作成
-    PD_pairs_of_each_vehicle = []
-    for vehicle_route in original_routes:
-        related_pairs = []
-        visited_set = set(vehicle_route)
-        for pickup, delivery in PD_pairs.items():
-            if pickup in visited_set or delivery in visited_set:
-                related_pairs.append((pickup, delivery))
-        PD_pairs_of_each_vehicle.append(related_pairs)
-        
+    PD_pairs_of_each_vehicle = build_vehicle_PD_pairs(original_routes, PD_pairs)
+
+    #全2車両ペアのタスクを列挙
+    pair_tasks = [
+        (i, j, original_routes[i], original_routes[j], PD_pairs_of_each_vehicle[i] + PD_pairs_of_each_vehicle[j])
+        for i in range(num_vehicles)
+        for j in range(i + 1, num_vehicles)
+    ]
+    num_pairs = len(pair_tasks)
+
+    #改善し得ないペアをOR-Toolsに渡す前に除外
+    if screening is not None and screening['mode'] != 'off':
+        summaries = summarize_routes(original_routes, customers, store)
+        pair_tasks, pruned_pairs = screen_pair_tasks(pair_tasks, summaries, screening)
+    else:
+        pruned_pairs = {}
+
     #全2車両ペアに対して2車両VRPを実行
-    for i in range(num_vehicles):
-        for j in range(i + 1, num_vehicles):
-            #print(f">車両No.{i+1:3}と車両No.{j+1:3}のGAT検証・・・")
-
-            # 2車両分の訪問地点（空リストも考慮）を結合して集合に
-            combined_node_ids = set(original_routes[i] + original_routes[j])
-            
-            # 両車両のデポは必ず含める
-            combined_node_ids.add(original_routes[i][0])
-            combined_node_ids.add(original_routes[j][0])
-
-            # 該当する顧客情報を抽出
-            sub_customers = [c for c in customers if c['id'] in combined_node_ids]
-
-            # 該当するpickup→deliveryタプルを結合
-            PD_pairs_of_2vehicle = PD_pairs_of_each_vehicle[i] + PD_pairs_of_each_vehicle[j]
-            
-            # デポ情報の抽出
-            start_depots = [original_routes[i][0], original_routes[j][0]]
-            end_depots = [original_routes[i][0], original_routes[j][0]]
-
-            # routing.ReadAssignmentFromRoutes用引数
-            initial_routes = [r[1:-1] for r in [original_routes[i], original_routes[j]]]
-
-            #2車両VRP解決
-            new_routes = solve_vrp_flexible(sub_customers, initial_routes, PD_pairs_of_2vehicle, 2, vehicle_capacity, start_depots, end_depots,
-                                            use_capacity=True, use_time=True, use_pickup_delivery=True, isInitPhase=False)
-            old_cost = route_cost(original_routes[i], customers) + route_cost(original_routes[j], customers)
-            new_cost = sum(route_cost(r, customers) for r in new_routes)
-            #経路が更新されていればアクション集合に追加
-            if new_cost < old_cost:
-                feasible_actions.append({
-                    'vehicle_pair': (i, j),
-                    'old_routes': [original_routes[i], original_routes[j]],
-                    'new_routes': new_routes,
-                    'old_cost': old_cost,
-                    'new_cost': new_cost,
-                    'cost_improvement': old_cost - new_cost
-                })
-                # 非効率な経路交換：ルート本体だけを入れ替え、デポはそれぞれの元のデポを維持する
-                original_depot_i = new_routes[0][0]
-                original_depot_j = new_routes[1][0]
-                # 中間ノード（デポ除く）を抽出
-                mid_i = [n for n in new_routes[0] if n != original_depot_i]
-                mid_j = [n for n in new_routes[1] if n != original_depot_j]
-                # 丸ごと交換した新しい経路を作成（デポ固定）
-                exchanged_routes = [
-                [original_depot_i] + mid_j + [original_depot_i],
-                [original_depot_j] + mid_i + [original_depot_j]
-                ]
-                exchanged_cost = sum(route_cost(r, customers) for r in exchanged_routes)
-                #アクション集合に追加
-                feasible_actions.append({
-                    'vehicle_pair': (i, j),
-                    'old_routes': [original_routes[i], original_routes[j]],
-                    'new_routes': exchanged_routes,
-                    'old_cost': old_cost,
-                    'new_cost': exchanged_cost,
-                    'cost_improvement': old_cost - exchanged_cost
-                })
+    pair_results = evaluate_pair_tasks(pair_tasks, customers, vehicle_capacity, num_workers, chunksize, pool, store,
+                                       solver_options, deadline, cache)
+    if validate:
+        validate_pair_results(pair_results, FeasibilityChecker(customers, PD_pairs, vehicle_capacity))
+
+    # タスク列挙順（i, j の辞書順）に結果を結合するため、並列実行時もシリアル実行と同じ順序になる
+    for result in pair_results:
+        feasible_actions.extend(result['actions'])
 
+    if stats is not None:
+        stats.update(_round_stats(num_pairs, pruned_pairs, pair_results))
+
+    return select_actions(original_routes, feasible_actions, selection)
+
+
+# マッチングで使う整数重みへの変換倍率（改善量を1e-6単位で丸めて整数演算で厳密に解く）
+MATCHING_WEIGHT_SCALE = 10 ** 6
+
+
+def select_actions(original_routes, feasible_actions, method='matching'):
+    """
+    アクション集合の中から、各車両高々1回の制約のもとで改善量の合計が最大となる組み合わせを適用する
+    - method: 'matching'（車両を頂点とする最大重みマッチング）/ 'cpsat'（OR-Tools CP-SATによる選択）
+    """
     #アクション集合の中からコストが最も改善する経路交換を決定する↓
+    with profiler.span('gat.select_actions', method=method, actions=len(feasible_actions)):
+        if method == 'matching':
+            chosen = _choose_actions_by_matching(feasible_actions)
+        elif method == 'cpsat':
+            chosen = _choose_actions_by_cpsat(feasible_actions)
+        else:
+            raise ValueError(f"Unknown action selection method: {method}")
+
+    # 最終ルートの更新
+    new_all_vehicles_routes = original_routes.copy()
+    if chosen is None:
+        print("最適なアクションの組み合わせが見つかりませんでした。")
+        return new_all_vehicles_routes
+    for i in chosen:
+        v1, v2 = feasible_actions[i]['vehicle_pair']
+        new_routes = feasible_actions[i]['new_routes']
+        new_all_vehicles_routes[v1] = new_routes[0]
+        new_all_vehicles_routes[v2] = new_routes[1]
+
+    return new_all_vehicles_routes
+
+
+def _choose_actions_by_matching(feasible_actions):
+    # 同じ車両ペアの並列辺は改善量が最大のもの（同値なら先に出現したもの）だけを残す
+    best_of_pair = {}
+    for i, action in enumerate(feasible_actions):
+        pair = action['vehicle_pair']
+        if pair not in best_of_pair or action['cost_improvement'] > feasible_actions[best_of_pair[pair]]['cost_improvement']:
+            best_of_pair[pair] = i
+
+    edges = []
+    edge_actions = []
+    for (v1, v2), i in best_of_pair.items():
+        weight = int(round(feasible_actions[i]['cost_improvement'] * MATCHING_WEIGHT_SCALE))
+        if weight > 0:
+            edges.append((v1, v2, weight))
+            edge_actions.append(i)
+
+    mate = max_weight_matching(edges)
+    return sorted(i for (v1, v2, _), i in zip(edges, edge_actions) if mate[v1] == v2)
+
+
+def _choose_actions_by_cpsat(feasible_actions):
     model = cp_model.CpModel()# OR-Tools CP-SAT Solver を使って最適なアクション集合を選択
     num_actions = len(feasible_actions)
     x = [model.NewBoolVar(f'action_{i}') for i in range(num_actions)]# アクションごとの選択変数
@@ -148,17 +737,129 @@ def perform_gat_exchange(original_routes, customers, PD_pairs, vehicle_capacity)
     # ソルバーで最適化
     solver = cp_model.CpSolver()
     status = solver.Solve(model)
-
-    # 最終ルートの更新
-    new_all_vehicles_routes = original_routes.copy()
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        for i in range(num_actions):
-            if solver.Value(x[i]) == 1:
-                v1, v2 = feasible_actions[i]['vehicle_pair']
-                new_routes = feasible_actions[i]['new_routes']
-                new_all_vehicles_routes[v1] = new_routes[0]
-                new_all_vehicles_routes[v2] = new_routes[1]
-    else:
-        print("最適なアクションの組み合わせが見つかりませんでした。")
+        return [i for i in range(num_actions) if solver.Value(x[i]) == 1]
+    return None
+
+
+class GATEngine:
+    """
+    ラウンドをまたいで2車両ペアの評価結果を保持するGATエンジン
+    - 前ラウンドから経路が変化した車両（dirty車両）を含むペアのみ2車両VRPを解き直す
+    - 両車両の経路が前ラウンドと同一のペアは前回のアクションをそのまま再利用する
+    - 再利用したペアも同じ (i, j) 順でアクション集合に並べるため、選択結果は perform_gat_exchange と同一になる
+    - 経路・車両ごとのPDペア・ルートコストは RouteState に保持し、交換を適用した車両の分だけ更新する
+    - validate=True なら新たに解いたペアのアクションを FeasibilityChecker で検査し、実行不可能なものは保持しない
+    - stop: 打ち切りの合図（is_set() を持つEvent）。セットされるとラウンド中の未着手のペアをスキップし、
+            求解中のペアが終わった時点でラウンドを終える（スキップしたペアは締め切り超過と同じく次ラウンドで再計算する）
+    """
+
+    def __init__(self, customers, PD_pairs, vehicle_capacity, num_workers=1, chunksize=None, pool=None, store=None,
+                 screening=None, selection='matching', solver_options=None, cache=None, validate=True, stop=None):
+        self.customers = customers
+        self.PD_pairs = PD_pairs
+        self.vehicle_capacity = vehicle_capacity
+        self.num_workers = num_workers
+        self.chunksize = chunksize
+        self.pool = pool
+        self.store = store
+        self.screening = _screening_config(screening)
+        self.selection = selection
+        self.solver_options = solver_options
+        self.cache = cache
+        self.stop = stop
+        self.checker = FeasibilityChecker(customers, PD_pairs, vehicle_capacity) if validate else None
+        self.route_state = None  # 直前のラウンドで適用した経路の RouteState
+        self.pending_dirty = set()  # 直前のラウンドの交換で経路が変化した車両
+        self.pair_results = {}  # (i, j) -> 前回評価時のペア評価結果
+        self.route_summaries = []
+        self.last_round_stats = {}
+
+    def dirty_vehicles(self, routes):
+        """前ラウンドから経路が変化した車両（前ラウンドの交換と、呼び出し側による書き換え）のインデックス集合を返す"""
+        if self.route_state is None or len(self.route_state) != len(routes):
+            return set(range(len(routes)))
+        return self.pending_dirty | set(self.route_state.changed_vehicles(routes))
+
+    def perform_round(self, original_routes, deadline=None):
+        """
+        1ラウンド分のGAT交換を行い、更新後の経路を返す
+        - deadline: ラウンドの締め切り（time.time()基準）。超過後のペアはスキップされ、次ラウンドで再計算される
+        """
+        num_vehicles = len(original_routes)
+        dirty = self.dirty_vehicles(original_routes)
+        # 変化した車両のPDペア・ルートコストだけを作り直す
+        if self.route_state is None:
+            self.route_state = RouteState(original_routes, self.customers, self.PD_pairs, self.store)
+        else:
+            self.route_state.update(original_routes)
+        use_screening = self.screening is not None and self.screening['mode'] != 'off'
+        if len(dirty) == num_vehicles:
+            self.pair_results = {}
+            if use_screening:
+                self.route_summaries = summarize_routes(original_routes, self.customers, self.store, self.route_state.costs)
+        elif use_screening:
+            # 変化した車両のルート要約だけを作り直す
+            dirty_list = sorted(dirty)
+            dirty_routes = [original_routes[v] for v in dirty_list]
+            for v, summary in zip(dirty_list, summarize_routes(dirty_routes, self.customers, self.store,
+                                                               self.route_state.costs[dirty_list])):
+                self.route_summaries[v] = summary
+
+        # dirty車両を含むペアと、前回締め切りでスキップしたペアのみ再計算する
+        PD_pairs_of_each_vehicle = self.route_state.PD_pairs_of_vehicle
+        pair_tasks = [
+            (i, j, original_routes[i], original_routes[j],
+             PD_pairs_of_each_vehicle[i] + PD_pairs_of_each_vehicle[j])
+            for i in range(num_vehicles)
+            for j in range(i + 1, num_vehicles)
+            if i in dirty or j in dirty or self.pair_results[(i, j)].get('skipped')
+        ]
+        num_candidates = len(pair_tasks)
+        pair_tasks, pruned_pairs = screen_pair_tasks(pair_tasks, self.route_summaries, self.screening)
+        for pair, reason in pruned_pairs.items():
+            # 除外したペアも「アクションなし」として保持し、経路が変わるまで再判定しない
+            self.pair_results[pair] = {'actions': [], 'solve_time': 0.0, 'pruned': reason}
+
+        solved = evaluate_pair_tasks(pair_tasks, self.customers, self.vehicle_capacity,
+                                     self.num_workers, self.chunksize, self.pool, self.store,
+                                     self.solver_options, deadline, self.cache, self.stop)
+        validate_pair_results(solved, self.checker)
+        for task, result in zip(pair_tasks, solved):
+            self.pair_results[(task[0], task[1])] = result
+
+        feasible_actions = []
+        for i in range(num_vehicles):
+            for j in range(i + 1, num_vehicles):
+                feasible_actions.extend(self.pair_results[(i, j)]['actions'])
+
+        num_pairs = num_vehicles * (num_vehicles - 1) // 2
+        profiler.count('pairs.reused', num_pairs - num_candidates)
+        self.last_round_stats = {
+            'dirty_vehicles': len(dirty),
+            'solved_pairs': len(pair_tasks),
+            'reused_pairs': num_pairs - num_candidates,
+        }
+        self.last_round_stats.update(_round_stats(num_candidates, pruned_pairs, solved))
+
+        new_routes = select_actions(original_routes, feasible_actions, self.selection)
+        # 交換を適用した車両だけ索引・コストを更新し、次ラウンドの dirty車両とする
+        self.pending_dirty = set(self.route_state.update(new_routes))
+        return new_routes
+
+    # ラウンドをまたいで保持する状態（チェックポイントに保存する対象。RouteState は経路から作り直す）
+    STATE_KEYS = ('pending_dirty', 'pair_results', 'route_summaries', 'last_round_stats')
+
+    def state_dict(self):
+        """ラウンドをまたいで保持する状態を辞書で返す（pickle可能。プール・キャッシュなどの実行資源は含まない）"""
+        state = {key: getattr(self, key) for key in self.STATE_KEYS}
+        state['routes'] = None if self.route_state is None else list(self.route_state.routes)
+        return state
 
-    return new_all_vehicles_routes
\ No newline at end of file
+    def load_state_dict(self, state):
+        """state_dict() で保存した状態を復元する（次の perform_round は保存時の続きとして dirty車両を判定する）"""
+        for key in self.STATE_KEYS:
+            setattr(self, key, state[key])
+        self.route_state = None
+        if state['routes'] is not None:
+            self.route_state = RouteState(state['routes'], self.customers, self.PD_pairs, self.store)
@@ -0,0 +1,173 @@
+"""
+GAT改善フェーズをラウンド単位で進めるジェネレータ API（チェックポイントからの再開つき）
+
+使い方:
+    engine = GATEngine(customers, PD_pairs, vehicle_capacity, store=store)
+    for state in run_gat(engine, lambda: initialize_individual_vrps(...), time_budget=3600.0,
+                         checkpoint_path='cache/checkpoints/LC1_2_2.pkl'):
+        print(state['round'], state['cost'])
+        if state['cost'] < target:
+            break   # 呼び出し側の打ち切り（最後に完了したラウンドまでをチェックポイントに保存する）
+
+- 最初に開始時点の状態（新規実行ならラウンド0 = 初期経路、再開時はチェックポイントのラウンド）を返し、
+  以降は1ラウンドごとに状態を返す。改善が止まるか時間予算に達したラウンドで終了する
+- engine.stop（打ち切りの合図）がセットされると、そのラウンドを途中で終えて状態を返し、終了する
+  （stopped=True。finished にはしないので、チェックポイントから続きのラウンドを再開できる）
+- checkpoint_path を指定すると、初期経路生成の直後と checkpoint_every ラウンドごと（と終了・打ち切り時）に
+  経路とエンジンの状態を保存する。同じパスで再実行すると、初期経路生成と完了済みのラウンドを飛ばして続きから再開する
+- チェックポイントには顧客データ・PDペア・車両容量のハッシュを記録し、別のインスタンスのものは使わない
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+
+from flexible_vrp_solver import route_cost
+from node_arrays import as_node_arrays, NODE_FIELDS
+from profiler import profiler
+
+# 保存形式を変更した場合はこの値を上げる（古いチェックポイントは使わない）
+CHECKPOINT_VERSION = 2
+
+
+def instance_fingerprint(customers, PD_pairs, vehicle_capacity):
+    """チェックポイントがどのインスタンスのものかを判定するためのハッシュ"""
+    nodes = as_node_arrays(customers)
+    digest = hashlib.sha256()
+    for field in NODE_FIELDS:
+        digest.update(np.ascontiguousarray(getattr(nodes, field), dtype=float).tobytes())
+    digest.update(repr(sorted((int(p), int(d)) for p, d in PD_pairs.items())).encode())
+    digest.update(repr(vehicle_capacity).encode())
+    return digest.hexdigest()
+
+
+def save_checkpoint(path, checkpoint):
+    """チェックポイントを一時ファイルに書き出してから名前を変更する（書き込み中に停止しても前回分は壊れない）"""
+    parent = os.path.dirname(path) or '.'
+    os.makedirs(parent, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(path, fingerprint=None):
+    """チェックポイントを読み込む（存在しない・壊れている・形式やインスタンスが異なる場合はNone）"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            checkpoint = pickle.load(f)
+    except Exception as e:
+        print(f"チェックポイント {path} を読み込めないため使いません（{type(e).__name__}: {e}）")
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        print(f"チェックポイント {path} は保存形式が異なるため使いません")
+        return None
+    if fingerprint is not None and checkpoint.get('fingerprint') != fingerprint:
+        print(f"チェックポイント {path} は別のインスタンスのものなので使いません")
+        return None
+    return checkpoint
+
+
+def total_cost(routes, customers, store=None):
+    if store is not None:
+        return float(store.route_costs(routes).sum())
+    return float(sum(route_cost(route, customers) for route in routes))
+
+
+def run_gat(engine, initial_routes, time_budget=None, checkpoint_path=None, checkpoint_every=1):
+    """
+    GAT改善フェーズを1ラウンドずつ進め、各ラウンドの状態の辞書を返すジェネレータ
+    - engine: GATEngine（プール・キャッシュなどは呼び出し側で用意し、終了後に片付ける）
+    - initial_routes: 初期経路、または初期経路を返す引数なしの関数（チェックポイントから再開する場合は呼ばれない）
+    - time_budget: 改善フェーズ全体の時間予算[秒]（再開前に使った時間も含める。Noneなら改善が止まるまで）
+    - checkpoint_path: チェックポイントのファイル（Noneなら保存・再開しない）
+    - checkpoint_every: 何ラウンドごとにチェックポイントを保存するか
+    状態の辞書:
+        round, routes, cost, initial_cost, improvement_from_initial, improvement_from_previous（%）,
+        round_time, round_times（これまでの全ラウンド）, elapsed（改善フェーズの累積時間）,
+        stats（engine.last_round_stats）, budget_exhausted, finished, stopped, resumed
+    """
+    fingerprint = None
+    checkpoint = None
+    if checkpoint_path is not None:
+        fingerprint = instance_fingerprint(engine.customers, engine.PD_pairs, engine.vehicle_capacity)
+        checkpoint = load_checkpoint(checkpoint_path, fingerprint)
+
+    def save(state):
+        save_checkpoint(checkpoint_path, {
+            'version': CHECKPOINT_VERSION,
+            'fingerprint': fingerprint,
+            'state': state,
+            'engine_state': engine.state_dict(),
+        })
+
+    if checkpoint is not None:
+        engine.load_state_dict(checkpoint['engine_state'])
+        state = dict(checkpoint['state'], stopped=False, resumed=True)
+        print(f"チェックポイント {checkpoint_path} のラウンド {state['round']} から再開します")
+    else:
+        routes = initial_routes() if callable(initial_routes) else initial_routes
+        routes = list(routes)
+        initial_cost = total_cost(routes, engine.customers, engine.store)
+        state = {
+            'round': 0, 'routes': routes, 'cost': initial_cost, 'initial_cost': initial_cost,
+            'improvement_from_initial': 0.0, 'improvement_from_previous': 0.0,
+            'round_time': 0.0, 'round_times': [], 'elapsed': 0.0, 'stats': {},
+            'budget_exhausted': False, 'finished': False, 'stopped': False, 'resumed': False,
+        }
+        if checkpoint_path is not None:
+            # 初期経路生成が最も重いので、最初のラウンドの前に保存しておく
+            save(state)
+    saved_round = state['round']
+    yield state
+    if state['finished']:
+        return
+
+    # 時間予算は再開前に使った時間を差し引いて数える
+    deadline = time.time() - state['elapsed'] + time_budget if time_budget is not None else None
+    try:
+        while True:
+            round_index = state['round'] + 1
+            round_start = time.time()
+            with profiler.span('gat.round', round=round_index):
+                routes = engine.perform_round(state['routes'], deadline)
+            # 適用した経路のコストはエンジンの RouteState が変化した車両の分だけ更新済み
+            current_cost = engine.route_state.total_cost
+            initial_cost = state['initial_cost']
+            previous_cost = state['cost']
+            from_initial = (initial_cost - current_cost) / initial_cost * 100
+            from_previous = (previous_cost - current_cost) / previous_cost * 100
+            round_time = time.time() - round_start
+            budget_exhausted = deadline is not None and time.time() >= deadline
+            # 打ち切ったラウンドは未着手のペアを解いていないので、改善が止まったとはみなさない
+            stopped = engine.stop is not None and engine.stop.is_set()
+            state = {
+                'round': round_index, 'routes': routes, 'cost': current_cost, 'initial_cost': initial_cost,
+                'improvement_from_initial': from_initial, 'improvement_from_previous': from_previous,
+                'round_time': round_time, 'round_times': state['round_times'] + [round_time],
+                'elapsed': state['elapsed'] + round_time, 'stats': engine.last_round_stats,
+                'budget_exhausted': budget_exhausted,
+                'finished': (round(from_previous, 1) == 0.0 and not stopped) or budget_exhausted,
+                'stopped': stopped,
+                'resumed': False,
+            }
+            if checkpoint_path is not None and (state['finished'] or round_index - saved_round >= checkpoint_every):
+                save(state)
+                saved_round = round_index
+            yield state
+            if state['finished'] or state['stopped']:
+                return
+    finally:
+        # 呼び出し側の打ち切り（close）や例外の場合も、最後に完了したラウンドまでを保存して再開できるようにする
+        if checkpoint_path is not None and saved_round != state['round']:
+            save(state)
@@ -0,0 +1,591 @@
+"""
+GATの実行ジョブを受け付け、ラウンドごとの進捗を配信するローカルサービス（asyncio、JSON Lines over Unixソケット/TCP）
+
+使い方:
+    python gat_service.py serve --socket cache/gat_service.sock --workers 4
+    python gat_service.py serve --port 8765                                    # TCP（127.0.0.1）で待ち受ける
+    python gat_service.py submit data/LC1_2_2.txt data/LC1_2_6.txt --offsets 0 0 42 -42 --config '{"gat_time_budget": 600}'
+    python gat_service.py submit ... --detach                                   # 受け付けだけして終了（job_id を表示）
+    python gat_service.py watch <job_id>
+    python gat_service.py cancel <job_id>
+    python gat_service.py jobs
+
+プロトコル（1行1つのJSON。1つの接続で複数の要求を送ってよい）:
+    {"op": "submit", "files": [...], "offsets": [[0, 0], [42, -42]], "config": {...}, "watch": true}
+        → {"event": "accepted", "job_id", "position"（待ち行列での順番。0なら実行を開始済み）}
+          （watch=true ならそのままジョブのイベントを配信する）
+    {"op": "watch", "job_id"}   → それまでのイベントを再送し、以降のイベントを配信する
+    {"op": "cancel", "job_id"}  → {"event": "cancel", "job_id", "status"}
+    {"op": "jobs"}              → {"event": "jobs", "jobs": [{"job_id", "status", "files", "round", "cost", "submitted"}, ...]}
+    {"op": "ping"}              → {"event": "pong", "workers", "queued", "running"}
+ジョブのイベント（"job_id" を含む）:
+    queued → started（worker, warm: インスタンスを読み込み済みだったか）→ initial（初期コスト）→ round（run_case のラウンド結果）...
+    → finished（result: run_case の戻り値）/ failed（error）/ cancelled のいずれかで終わる
+
+- ジョブは最大 --workers 個の常駐ワーカープロセスで実行する（超えた分は受付順に待つ）
+- 各ワーカーは読み込んだインスタンスと InstanceStore を保持し（WARM_INSTANCES 件まで）、同じファイル・オフセットの
+  ジョブはそのインスタンスを持つワーカーに優先して割り当てる（パースと距離行列の構築を省く）。
+  InstanceStore は run_case と同じく、初期経路生成で近傍を制限する設定では全体の距離行列を持たない
+- 終了したジョブは新しいものから RETAINED_JOBS 件だけ保持し、それより古いジョブはイベントごと捨てる
+  （捨てたジョブの watch / cancel は未知のジョブとして扱う）
+- クライアントが 'config' で上書きできるのは CLIENT_CONFIG_KEYS の探索設定だけ。ファイルの保存先
+  （checkpoint_dir, pair_cache_path, instance_cache_dir など）や並列数・図の出力はサービスの設定（serve --config）で決める
+- 実行中のジョブの取り消しはラウンドの途中でも反映する（未着手のペアは解かず、求解中のペアが終わった時点で止まる）。
+  CANCEL_GRACE 秒（とペアの制限時間）以内に止まらない場合（初期経路生成の途中など）はワーカーを停止して作り直す
+- サービスの設定でチェックポイント（checkpoint_dir）を有効にした場合は、取り消したジョブを同じ設定で再投入すると
+  続きのラウンドから再開する
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import traceback
+
+import numpy as np
+
+from instance_store import InstanceStore
+from main import load_case_instance, run_case, default_run_config, uses_dense_store
+
+# サービスで実行する既定設定：ジョブ単位で並列化するため、ジョブ内の初期経路生成・ペア求解はシリアル、図の出力はなし
+SERVICE_CONFIG_DEFAULTS = {
+    'init_workers': 1,
+    'num_pair_workers': 1,
+    'render_mode': 'off',
+}
+# クライアントがジョブごとに上書きできる設定（探索の制限・スクリーニング・アクション選択のみ。パスはサービス側で固定する）
+CLIENT_CONFIG_KEYS = (
+    'init_solver_options',
+    'pair_solver_options',
+    'gat_time_budget',
+    'pair_screening',
+    'action_selection',
+    'validate_actions',
+)
+# 既定の待ち受けソケット
+SERVICE_SOCKET = "cache/gat_service.sock"
+# 1ワーカーが保持する読み込み済みインスタンスの数（古いものから捨てる）
+WARM_INSTANCES = 4
+# 取り消し要求から、ワーカーを強制停止するまでの猶予[秒]（ペアの制限時間があればその分を加える）
+CANCEL_GRACE = 10.0
+# 終了したジョブ（イベントと結果）を保持する件数（古いものから捨てる）
+RETAINED_JOBS = 100
+# 停止したワーカープロセスの終了を待つ時間[秒]（過ぎたら kill する）
+WORKER_JOIN_TIMEOUT = 5.0
+# 1行の要求の最大長[バイト]
+MAX_REQUEST_BYTES = 1 << 20
+
+TERMINAL_EVENTS = ('finished', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _json_default(value):
+    # run_case の結果に含まれるNumPyの数値などをJSONの値にする
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def instance_key(files, offsets, config):
+    """
+    読み込み済みインスタンスを使い回すためのキー
+    （同じファイル・オフセット・キャッシュ設定で、InstanceStore が全体の距離行列を持つかどうかも同じなら同じインスタンス）
+    """
+    return json.dumps([[os.path.abspath(path) for path in files], [list(offset) for offset in offsets],
+                       config['instance_cache_dir'], uses_dense_store(config)])
+
+
+# ==============================
+# === ワーカープロセス ===
+# ==============================
+def _worker_main(conn, cancel_event, log_dir, warm_size):
+    # Ctrl-C はサービス本体が受け取り、ワーカーは本体からの終了指示か停止で終わる
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    warm = collections.OrderedDict()  # instance_key -> (instance, store)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == 'exit':
+            return
+        job = message[1]
+        _run_job(job, conn, cancel_event, warm, log_dir, warm_size)
+        conn.send(('idle', job['job_id'], list(warm)))
+
+
+def _run_job(job, conn, cancel_event, warm, log_dir, warm_size):
+    job_id = job['job_id']
+
+    def send(event, **payload):
+        conn.send(('event', job_id, {'event': event, 'job_id': job_id, **payload}))
+
+    def check_cancelled():
+        if cancel_event.is_set():
+            raise JobCancelled()
+
+    config = job['config']
+    key = instance_key(job['files'], job['offsets'], config)
+    warm_hit = key in warm
+    send('started', worker=os.getpid(), warm=warm_hit)
+    log_path = os.path.join(log_dir, f"{job_id}.log") if log_dir is not None else os.devnull
+    try:
+        with open(log_path, 'w', buffering=1) as log_file, contextlib.redirect_stdout(log_file):
+            offsets = [tuple(offset) for offset in job['offsets']]
+            if warm_hit:
+                warm.move_to_end(key)
+                instance, store = warm[key]
+            else:
+                instance = load_case_instance(job['files'], offsets, config['instance_cache_dir'])
+                store = InstanceStore(instance['customers'], dense=uses_dense_store(config))
+                warm[key] = (instance, store)
+                while len(warm) > warm_size:
+                    warm.popitem(last=False)
+
+            def on_init(record):
+                send('initial', **record)
+                check_cancelled()
+
+            def on_round(record):
+                send('round', **record)
+                check_cancelled()
+
+            # 取り消しの合図でラウンド中の未着手のペアを飛ばし、ラウンドの終わり（on_round）で JobCancelled にする
+            result = run_case(job['files'], offsets, config=config, on_round=on_round, on_init=on_init,
+                              instance=instance, store=store, stop=cancel_event)
+        send('finished', result=result)
+    except JobCancelled:
+        send('cancelled')
+    except Exception as e:
+        send('failed', error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+
+
+def _reap_process(process):
+    process.join(WORKER_JOIN_TIMEOUT)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+class _Worker:
+    def __init__(self, log_dir, warm_size):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.cancel_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_worker_main,
+                                               args=(child_conn, self.cancel_event, log_dir, warm_size))
+        self.process.start()
+        child_conn.close()
+        self.job = None
+        self.warm = set()  # 保持しているインスタンスのキー
+        self.cancel_timer = None
+
+
+class _Job:
+    def __init__(self, job_id, files, offsets, config):
+        self.job_id = job_id
+        self.files = files
+        self.offsets = offsets
+        self.config = config
+        self.status = 'queued'
+        self.events = []
+        self.subscribers = set()
+        self.round = None
+        self.cost = None
+        self.submitted = time.time()
+
+    def summary(self):
+        return {'job_id': self.job_id, 'status': self.status, 'files': self.files, 'round': self.round, 'cost': self.cost,
+                'submitted': self.submitted}
+
+
+# ==============================
+# === サービス本体 ===
+# ==============================
+class GATService:
+    """
+    ジョブの待ち行列・常駐ワーカープロセス・クライアントへのイベント配信を管理する
+    - workers: 同時に実行するジョブ数（常駐ワーカープロセス数）
+    - config: 全ジョブ共通の設定（SERVICE_CONFIG_DEFAULTS を上書きする。各ジョブの 'config' は CLIENT_CONFIG_KEYS のみ上書きできる）
+    - log_dir: 各ジョブの標準出力の保存先（Noneなら捨てる）
+    - retained_jobs: 保持する終了済みジョブの件数
+    """
+
+    def __init__(self, workers=None, config=None, log_dir=None, warm_instances=WARM_INSTANCES, cancel_grace=CANCEL_GRACE,
+                 retained_jobs=RETAINED_JOBS):
+        self.num_workers = workers or os.cpu_count() or 1
+        self.config = dict(SERVICE_CONFIG_DEFAULTS)
+        self.config.update(config or {})
+        self.log_dir = log_dir
+        if log_dir is not None:
+            os.makedirs(log_dir, exist_ok=True)
+        self.warm_instances = warm_instances
+        self.cancel_grace = cancel_grace
+        self.retained_jobs = retained_jobs
+        self.jobs = {}
+        self.finished_jobs = collections.deque()  # 終了した順のジョブID
+        self.queue = collections.deque()
+        self.workers = []
+        self.servers = []
+        self._job_ids = itertools.count(1)
+        self._loop = None
+
+    # --- ワーカーの管理 ---
+    def _start_worker(self):
+        worker = _Worker(self.log_dir, self.warm_instances)
+        self.workers.append(worker)
+        self._loop.add_reader(worker.conn.fileno(), self._on_worker_message, worker)
+        return worker
+
+    def _retire_worker(self, worker):
+        """ワーカーを外して停止し、プロセスの終了を待つ Future を返す（待つのはイベントループの外のスレッド）"""
+        self._loop.remove_reader(worker.conn.fileno())
+        self.workers.remove(worker)
+        if worker.cancel_timer is not None:
+            worker.cancel_timer.cancel()
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.conn.close()
+        return self._loop.run_in_executor(None, _reap_process, worker.process)
+
+    def _on_worker_message(self, worker):
+        try:
+            kind, job_id, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            self._on_worker_exit(worker)
+            return
+        if kind == 'event':
+            # 終了イベントを配信した時点で保持期間外として捨てたジョブの遅れたイベントは無視する
+            if job_id in self.jobs:
+                self._publish(self.jobs[job_id], payload)
+        else:  # 'idle'
+            worker.job = None
+            worker.warm = set(payload)
+            if worker.cancel_timer is not None:
+                worker.cancel_timer.cancel()
+                worker.cancel_timer = None
+            self._dispatch()
+
+    def _on_worker_exit(self, worker):
+        # 取り消しの猶予切れによる停止か、ワーカーの異常終了。ワーカーを作り直して次のジョブを割り当てる
+        job = worker.job
+        exitcode = worker.process.exitcode
+        self._retire_worker(worker)
+        if job is not None and job.status not in TERMINAL_EVENTS:
+            if job.status == 'cancelling':
+                self._publish(job, {'event': 'cancelled', 'job_id': job.job_id})
+            else:
+                self._publish(job, {'event': 'failed', 'job_id': job.job_id,
+                                    'error': f"worker exited with code {exitcode}"})
+        if len(self.workers) < self.num_workers:
+            self._start_worker()
+        self._dispatch()
+
+    def _dispatch(self):
+        """空いているワーカーに待ち行列のジョブを割り当てる（インスタンスを保持しているワーカーを優先する）"""
+        while self.queue:
+            idle = [worker for worker in self.workers if worker.job is None]
+            if not idle:
+                return
+            job = self.queue.popleft()
+            key = instance_key(job.files, job.offsets, job.config)
+            worker = next((w for w in idle if key in w.warm), idle[0])
+            worker.job = job
+            worker.cancel_event.clear()
+            job.status = 'running'
+            worker.conn.send(('run', {'job_id': job.job_id, 'files': job.files, 'offsets': job.offsets,
+                                      'config': job.config}))
+
+    # --- ジョブ ---
+    def submit(self, files, offsets, config=None):
+        """ジョブを待ち行列に加えて _Job を返す（ファイル・オフセットの不整合はここで ValueError にする）"""
+        if not files or len(files) != len(offsets):
+            raise ValueError("files and offsets must be non-empty lists of the same length")
+        missing = [path for path in files if not os.path.exists(path)]
+        if missing:
+            raise ValueError(f"Files not found: {missing}")
+        config = config or {}
+        if not isinstance(config, dict):
+            raise ValueError("config must be a JSON object")
+        rejected = set(config) - set(CLIENT_CONFIG_KEYS)
+        if rejected:
+            raise ValueError(f"Config keys not accepted from clients: {sorted(rejected)} (allowed: {list(CLIENT_CONFIG_KEYS)})")
+        for key in ('init_solver_options', 'pair_solver_options'):
+            if not isinstance(config.get(key, {}), dict):
+                raise ValueError(f"{key} must be a JSON object")
+        job_config = default_run_config()
+        job_config.update(self.config)
+        job_config.update(config)
+        job_id = f"{next(self._job_ids):05d}-{os.urandom(3).hex()}"
+        job = _Job(job_id, list(files), [list(offset) for offset in offsets], job_config)
+        self.jobs[job_id] = job
+        self.queue.append(job)
+        self._publish(job, {'event': 'queued', 'job_id': job_id})
+        self._dispatch()
+        return job
+
+    def cancel(self, job_id):
+        """ジョブを取り消し、取り消し時点の状態（'cancelled' / 'cancelling' / 終了済みの状態）を返す"""
+        job = self.jobs[job_id]
+        if job.status == 'queued':
+            self.queue.remove(job)
+            self._publish(job, {'event': 'cancelled', 'job_id': job_id})
+        elif job.status == 'running':
+            worker = next(w for w in self.workers if w.job is job)
+            job.status = 'cancelling'
+            worker.cancel_event.set()
+            # 求解中のペアが終わるまでは待つ。それでも止まらない場合（初期経路生成の途中など）はワーカーごと停止する
+            time_limit = job.config['pair_solver_options'].get('time_limit')
+            grace = self.cancel_grace + (time_limit if isinstance(time_limit, (int, float)) else 0)
+            worker.cancel_timer = self._loop.call_later(grace, self._force_cancel, worker, job)
+        return job.status
+
+    def _force_cancel(self, worker, job):
+        worker.cancel_timer = None
+        if worker.job is job and worker in self.workers:
+            worker.process.terminate()
+
+    def _retire_job(self, job):
+        # 終了したジョブは RETAINED_JOBS 件まで保持し、古いものからイベント（結果を含む）ごと捨てる
+        self.finished_jobs.append(job.job_id)
+        while len(self.finished_jobs) > self.retained_jobs:
+            self.jobs.pop(self.finished_jobs.popleft(), None)
+
+    def _publish(self, job, event):
+        kind = event['event']
+        if kind in TERMINAL_EVENTS:
+            job.status = kind
+            self._retire_job(job)
+        if kind in ('initial', 'round'):
+            job.round = event['round']
+            job.cost = event['cost']
+        job.events.append(event)
+        for subscriber in list(job.subscribers):
+            subscriber.put_nowait(event)
+
+    async def watch(self, job_id):
+        """ジョブのイベントを（それまでの分を含めて）順に返す非同期ジェネレータ。終了イベントで終わる"""
+        job = self.jobs[job_id]
+        subscriber = asyncio.Queue()
+        for event in job.events:
+            subscriber.put_nowait(event)
+        job.subscribers.add(subscriber)
+        try:
+            while True:
+                event = await subscriber.get()
+                yield event
+                if event['event'] in TERMINAL_EVENTS:
+                    return
+        finally:
+            job.subscribers.discard(subscriber)
+
+    # --- クライアント接続 ---
+    async def _handle_client(self, reader, writer):
+        streams = set()
+
+        async def send(message):
+            writer.write(json.dumps(message, ensure_ascii=False, default=_json_default).encode() + b'\n')
+            await writer.drain()
+
+        async def stream(job_id):
+            async for event in self.watch(job_id):
+                await send(event)
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op = request.get('op')
+                    if op == 'submit':
+                        job = self.submit(request['files'], request['offsets'], request.get('config'))
+                        await send({'event': 'accepted', 'job_id': job.job_id, 'position': len(self.queue)})
+                        if request.get('watch', True):
+                            streams.add(asyncio.ensure_future(stream(job.job_id)))
+                    elif op == 'watch':
+                        if request['job_id'] not in self.jobs:
+                            raise KeyError(request['job_id'])
+                        streams.add(asyncio.ensure_future(stream(request['job_id'])))
+                    elif op == 'cancel':
+                        status = self.cancel(request['job_id'])
+                        await send({'event': 'cancel', 'job_id': request['job_id'], 'status': status})
+                    elif op == 'jobs':
+                        await send({'event': 'jobs', 'jobs': [job.summary() for job in self.jobs.values()]})
+                    elif op == 'ping':
+                        await send({'event': 'pong', 'workers': len(self.workers), 'queued': len(self.queue),
+                                    'running': sum(1 for w in self.workers if w.job is not None)})
+                    else:
+                        raise ValueError(f"Unknown op: {op}")
+                except KeyError as e:
+                    await send({'event': 'error', 'error': f"Unknown job or missing field: {e}"})
+                except (ValueError, TypeError) as e:
+                    await send({'event': 'error', 'error': str(e)})
+                streams = {task for task in streams if not task.done()}
+            # 要求の送信を終えた（書き込み側を閉じた）クライアントにも、配信中のイベントは最後まで送る
+            if streams:
+                await asyncio.gather(*streams)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            for task in streams:
+                task.cancel()
+            writer.close()
+
+    async def start(self, socket_path=None, host='127.0.0.1', port=None):
+        """ワーカーを起動し、Unixソケット（socket_path）またはTCP（host, port）で待ち受ける"""
+        self._loop = asyncio.get_running_loop()
+        for _ in range(self.num_workers):
+            self._start_worker()
+        if socket_path is not None:
+            os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.servers.append(await asyncio.start_unix_server(self._handle_client, socket_path,
+                                                                limit=MAX_REQUEST_BYTES))
+        if port is not None:
+            self.servers.append(await asyncio.start_server(self._handle_client, host, port, limit=MAX_REQUEST_BYTES))
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        retired = []
+        for worker in list(self.workers):
+            if worker.job is None and worker.process.is_alive():
+                worker.conn.send(('exit',))
+            retired.append(self._retire_worker(worker))
+        await asyncio.gather(*retired)
+
+
+async def serve(socket_path=None, host='127.0.0.1', port=None, **service_options):
+    service = GATService(**service_options)
+    await service.start(socket_path, host, port)
+    addresses = ([socket_path] if socket_path is not None else []) + ([f"{host}:{port}"] if port is not None else [])
+    print(f"GATサービスを開始しました（{', '.join(addresses)}、ワーカー {service.num_workers}）", flush=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await service.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+        print("GATサービスを終了しました", flush=True)
+
+
+# ==============================
+# === クライアント ===
+# ==============================
+async def open_connection(socket_path=SERVICE_SOCKET, host='127.0.0.1', port=None):
+    if port is not None:
+        return await asyncio.open_connection(host, port, limit=MAX_REQUEST_BYTES)
+    return await asyncio.open_unix_connection(socket_path, limit=MAX_REQUEST_BYTES)
+
+
+async def request(message, socket_path=SERVICE_SOCKET, host='127.0.0.1', port=None, until=None):
+    """
+    要求を1つ送り、応答のイベントを順に返す非同期ジェネレータ
+    - until: 受信を終えるイベントの種類（Noneなら最初の応答1つで終える）
+    """
+    reader, writer = await open_connection(socket_path, host, port)
+    try:
+        writer.write(json.dumps(message).encode() + b'\n')
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            event = json.loads(line)
+            yield event
+            if until is None or event['event'] in until or event['event'] == 'error':
+                return
+    finally:
+        writer.close()
+
+
+def _print_event(event):
+    kind = event['event']
+    if kind == 'round':
+        print(f"[{event['job_id']}] ラウンド {event['round']}: コスト {event['cost']:.3f}"
+              f"（初期から {event['improvement_from_initial']:.2f}%、{event['round_time']:.2f} 秒）", flush=True)
+    elif kind == 'initial':
+        print(f"[{event['job_id']}] 初期経路コスト {event['initial_cost']:.3f}"
+              + ("（チェックポイントから再開）" if event['resumed'] else f"（{event['init_time']:.2f} 秒）"), flush=True)
+    elif kind == 'finished':
+        result = event['result']
+        print(f"[{event['job_id']}] 完了: {result['initial_cost']:.3f} → {result['final_cost']:.3f}"
+              f"（{result['rounds']}ラウンド、{result['total_time']:.1f} 秒）", flush=True)
+    else:
+        print(json.dumps(event, ensure_ascii=False), flush=True)
+
+
+async def _client_main(args):
+    address = {'socket_path': args.socket, 'host': args.host, 'port': args.port}
+    if args.command == 'submit':
+        offsets = args.offsets or [0, 0] * len(args.files)
+        if len(offsets) != 2 * len(args.files):
+            raise SystemExit("--offsets には各ファイルの x y を順に指定してください")
+        # サービスの作業ディレクトリに依らないよう、ファイルは絶対パスで渡す
+        files = [os.path.abspath(path) for path in args.files]
+        message = {'op': 'submit', 'files': files, 'offsets': [offsets[k:k + 2] for k in range(0, len(offsets), 2)],
+                   'config': json.loads(args.config) if args.config else {}, 'watch': not args.detach}
+        until = ('accepted',) if args.detach else TERMINAL_EVENTS
+    elif args.command == 'watch':
+        message, until = {'op': 'watch', 'job_id': args.job_id}, TERMINAL_EVENTS
+    elif args.command == 'cancel':
+        message, until = {'op': 'cancel', 'job_id': args.job_id}, None
+    else:
+        message, until = {'op': args.command}, None
+    async for event in request(message, until=until, **address):
+        _print_event(event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=SERVICE_SOCKET, help='Unixソケットのパス')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help='TCPで接続・待ち受けする場合のポート')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='サービスを起動する')
+    serve_parser.add_argument('--workers', type=int, default=None, help='同時に実行するジョブ数（既定: CPUコア数）')
+    serve_parser.add_argument('--config', default=None,
+                              help='全ジョブ共通の設定（JSON、main.default_run_config のキー。ファイルの保存先はここでだけ指定できる）')
+    serve_parser.add_argument('--log-dir', default=None, help='各ジョブの標準出力を <job_id>.log として保存するディレクトリ')
+    serve_parser.add_argument('--retain-jobs', type=int, default=RETAINED_JOBS, help='保持する終了済みジョブの件数')
+    serve_parser.add_argument('--tcp-only', action='store_true', help='Unixソケットでは待ち受けない（--port と併用）')
+    submit_parser = commands.add_parser('submit', help='ジョブを投入し、終了まで進捗を表示する')
+    submit_parser.add_argument('files', nargs='+')
+    submit_parser.add_argument('--offsets', nargs='+', type=float, default=None, help='各ファイルの座標オフセット x y（既定: 0 0）')
+    submit_parser.add_argument('--config', default=None, help='このジョブの設定（JSON、CLIENT_CONFIG_KEYS のキーのみ）')
+    submit_parser.add_argument('--detach', action='store_true', help='受け付けられたら終了する')
+    for name in ('watch', 'cancel'):
+        commands.add_parser(name).add_argument('job_id')
+    commands.add_parser('jobs')
+    commands.add_parser('ping')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        config = json.loads(args.config) if args.config else None
+        asyncio.run(serve(None if args.tcp_only else args.socket, args.host, args.port, workers=args.workers,
+                          config=config, log_dir=args.log_dir, retained_jobs=args.retain_jobs))
+    else:
+        try:
+            asyncio.run(_client_main(args))
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            sys.exit(f"GATサービスに接続できません: {e}")
+
+
+if __name__ == '__main__':
+    main()
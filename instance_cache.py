@@ -0,0 +1,280 @@
+"""
+Li & Lim形式のインスタンスを前処理し、列ごとの .npy（メモリマップで読み込み可能）として保存するキャッシュ
+
+使い方:
+    python instance_cache.py data                 # data/ 内の全ファイルを前処理
+    python instance_cache.py data --test-cases    # main.py の test_cases の結合済みインスタンスも前処理
+    python instance_cache.py data --prune         # 元ファイルが変わった・なくなったエントリを削除
+
+キャッシュの構成（cache_dir 以下）:
+    files/<ファイル名>-<パスのハッシュ>/   : 1ファイル分のオフセットなしのノード列と meta.json
+    merged/<組み合わせのハッシュ>/          : ファイルとオフセットの組み合わせごとの結合済みノード列と meta.json
+meta.json には元ファイルのパス・サイズ・更新時刻（mtime）・SHA-256を記録し、読み込み時に検証する。
+サイズと更新時刻が一致すればそのまま使い、異なる場合は内容のハッシュを比べて、変わっていれば作り直す。
+エントリは一時ディレクトリに書き出してから名前の変更で公開し、古いエントリも別名に移してから削除するため、
+並行実行中の別プロセスに書きかけ・削除しかけのエントリは見えない。元ファイルが変わって使われなくなった
+結合済みエントリは、新しい結合済みエントリを作るとき（と --prune）に削除する。
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from node_arrays import NodeArrays, NODE_FIELDS
+from parser import read_lilim200, build_lsp_data, load_instances, pickup_delivery_pairs
+
+# 保存形式を変更した場合はこの値を上げる（古いエントリは作り直される）
+INSTANCE_CACHE_VERSION = 1
+# 同じエントリを別プロセスと同時に作り直す場合に、置き換えを試みる回数
+SAVE_ATTEMPTS = 3
+# prune で削除する、中断された書き出しの一時ディレクトリの経過時間[秒]（書き出し中のものは消さない）
+STALE_TMP_AGE = 3600.0
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_meta(path, sha256=None):
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256 or file_sha256(path),
+    }
+
+
+def _discard_dir(path):
+    """エントリを一意な名前に変えてから削除する（元の名前で削除しかけの状態を見せない）"""
+    trash = os.path.join(os.path.dirname(path), f'.stale-{os.getpid()}-{os.urandom(4).hex()}')
+    try:
+        os.rename(path, trash)
+    except OSError:
+        return  # 別プロセスが先に移した
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def _save_entry(entry_dir, nodes, meta, is_valid):
+    """
+    一時ディレクトリに書き出してから名前を変更し、並行実行中の別プロセスに書きかけのエントリを見せない
+    - 同じ名前のエントリが既にあり、is_valid(entry_dir) が真なら（別プロセスが先に作った）そちらを使う
+    - 古いエントリ（元ファイルが変わった）は別名に移して削除してから置き換える
+    """
+    parent = os.path.dirname(entry_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        for field in NODE_FIELDS:
+            np.save(os.path.join(tmp_dir, f'{field}.npy'), getattr(nodes, field))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+        for _ in range(SAVE_ATTEMPTS):
+            try:
+                # 空でないディレクトリへの名前の変更は失敗するため、既存のエントリを上書きすることはない
+                os.rename(tmp_dir, entry_dir)
+                return
+            except OSError:
+                if is_valid(entry_dir):
+                    break
+                _discard_dir(entry_dir)
+        # 別プロセスのエントリを使う（置き換えの競合が続いた場合も、呼び出し元はパース済みの配列を使う）
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _load_nodes(entry_dir, mmap=True):
+    mode = 'r' if mmap else None
+    return NodeArrays(**{field: np.load(os.path.join(entry_dir, f'{field}.npy'), mmap_mode=mode) for field in NODE_FIELDS})
+
+
+class InstanceCache:
+    """
+    前処理済みインスタンスのキャッシュ
+    - parse_lilim200 / load_instances と同じ戻り値を、テキストのパースなしで（.npyのメモリマップから）返す
+    - エントリがない・元ファイルが変わっている場合はパースして保存する
+    """
+
+    def __init__(self, cache_dir='cache/instances', mmap=True):
+        self.cache_dir = cache_dir
+        self.mmap = mmap
+        self.hits = 0
+        self.misses = 0
+
+    def _read_meta(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('version') == INSTANCE_CACHE_VERSION else None
+
+    def _sources_valid(self, entry_dir, meta):
+        """元ファイルがキャッシュ作成時から変わっていないかを更新時刻、必要ならハッシュで確認する"""
+        refreshed = False
+        for source in meta['sources']:
+            try:
+                stat = os.stat(source['path'])
+            except OSError:
+                return False
+            if stat.st_size == source['size'] and stat.st_mtime_ns == source['mtime_ns']:
+                continue
+            if file_sha256(source['path']) != source['sha256']:
+                return False
+            # 内容は同じで更新時刻だけが変わった場合（checkoutやコピー）は記録を更新し、次回はハッシュ計算を省く
+            source['size'], source['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+            refreshed = True
+        if refreshed:
+            tmp_path = os.path.join(entry_dir, f'meta.json.tmp-{os.getpid()}-{os.urandom(4).hex()}')
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(meta, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, os.path.join(entry_dir, 'meta.json'))
+            except OSError:
+                # 記録の更新は次回のハッシュ計算を省くためだけのもの（エントリが置き換えられた場合などは諦める）
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+        return True
+
+    def _load_entry(self, entry_dir):
+        """有効なエントリの (meta, ノード配列) を返す（ない・古い・読み込み中に置き換えられた場合はNone）"""
+        meta = self._read_meta(entry_dir)
+        if meta is None or not self._sources_valid(entry_dir, meta):
+            return None
+        try:
+            return meta, _load_nodes(entry_dir, self.mmap)
+        except (OSError, ValueError):
+            return None
+
+    def _is_valid(self, entry_dir):
+        meta = self._read_meta(entry_dir)
+        return meta is not None and self._sources_valid(entry_dir, meta)
+
+    def _file_entry_dir(self, path):
+        path_hash = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.cache_dir, 'files', f"{os.path.splitext(os.path.basename(path))[0]}-{path_hash}")
+
+    def read_file(self, path):
+        """1ファイル分のオフセットなしのノード配列を返す（read_lilim200と同じ戻り値）"""
+        entry_dir = self._file_entry_dir(path)
+        entry = self._load_entry(entry_dir)
+        if entry is not None:
+            self.hits += 1
+            meta, nodes = entry
+            return nodes, meta['num_vehicles'], meta['vehicle_capacity']
+        self.misses += 1
+        source = _source_meta(path)
+        nodes, num_vehicles, vehicle_capacity = read_lilim200(path)
+        _save_entry(entry_dir, nodes, {
+            'version': INSTANCE_CACHE_VERSION,
+            'sources': [source],
+            'num_vehicles': num_vehicles,
+            'vehicle_capacity': vehicle_capacity,
+        }, self._is_valid)
+        return nodes, num_vehicles, vehicle_capacity
+
+    def parse_lilim200(self, filepath, x_offset=0, y_offset=0, id_offset=0, time_offset=0):
+        """parser.parse_lilim200 と同じ戻り値を、キャッシュ済みの配列から作る"""
+        nodes, num_vehicles, vehicle_capacity = self.read_file(filepath)
+        return build_lsp_data(nodes, num_vehicles, vehicle_capacity, x_offset, y_offset, id_offset, time_offset)
+
+    def load_instances(self, file_paths, offsets):
+        """parser.load_instances と同じ戻り値を、結合済みインスタンスのキャッシュから返す"""
+        sources = [_source_meta(path, self._known_sha256(path)) for path in file_paths]
+        combination = json.dumps([[source['sha256'], list(offset)] for source, offset in zip(sources, offsets)])
+        entry_dir = os.path.join(self.cache_dir, 'merged', hashlib.sha256(combination.encode('utf-8')).hexdigest()[:16])
+        entry = self._load_entry(entry_dir)
+        if entry is not None:
+            self.hits += 1
+            meta, customers = entry
+            instance = dict(meta['instance'])
+            instance['depot_coords'] = [tuple(coord) for coord in instance['depot_coords']]
+            instance['customers'] = customers
+            instance['PD_pairs'] = pickup_delivery_pairs(customers)
+            return instance
+        self.misses += 1
+        instance = load_instances(file_paths, offsets, parse=self.parse_lilim200)
+        _save_entry(entry_dir, instance['customers'], {
+            'version': INSTANCE_CACHE_VERSION,
+            'sources': sources,
+            'offsets': [list(offset) for offset in offsets],
+            'instance': {k: v for k, v in instance.items() if k not in ('customers', 'PD_pairs')},
+        }, self._is_valid)
+        # 元ファイルが変わったことで使われなくなった結合済みエントリを片付ける
+        self.prune(kinds=('merged',))
+        return instance
+
+    def _known_sha256(self, path):
+        # ファイル単位のエントリが有効なら、そこに記録済みのハッシュを使って再計算を省く
+        entry_dir = self._file_entry_dir(path)
+        meta = self._read_meta(entry_dir)
+        if meta is not None and self._sources_valid(entry_dir, meta):
+            return meta['sources'][0]['sha256']
+        return None
+
+    def prune(self, kinds=('files', 'merged'), tmp_age=STALE_TMP_AGE):
+        """元ファイルが変わった・なくなったエントリと、中断された書き出しの一時ディレクトリを削除し、削除した数を返す"""
+        removed = 0
+        now = time.time()
+        for kind in kinds:
+            parent = os.path.join(self.cache_dir, kind)
+            if not os.path.isdir(parent):
+                continue
+            for name in os.listdir(parent):
+                path = os.path.join(parent, name)
+                if name.startswith('.'):
+                    # 一時ディレクトリ（.tmp-・.stale-）は、書き出し中のものを消さないよう古いものだけを消す
+                    try:
+                        age = now - os.stat(path).st_mtime
+                    except OSError:
+                        continue
+                    if age > tmp_age:
+                        shutil.rmtree(path, ignore_errors=True)
+                        removed += 1
+                elif not self._is_valid(path):
+                    _discard_dir(path)
+                    removed += 1
+        return removed
+
+    def preprocess(self, data_dir):
+        """data_dir内の全データファイルを前処理し、処理したファイル数を返す"""
+        paths = sorted(os.path.join(data_dir, name) for name in os.listdir(data_dir) if name.endswith('.txt'))
+        for path in paths:
+            self.read_file(path)
+        return len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data_dir', help='Li & Lim形式のデータファイルを置いたディレクトリ')
+    parser.add_argument('--cache-dir', default='cache/instances')
+    parser.add_argument('--test-cases', action='store_true', help='main.pyのtest_casesの結合済みインスタンスも作る')
+    parser.add_argument('--prune', action='store_true', help='元ファイルが変わった・なくなったエントリを削除する')
+    args = parser.parse_args()
+
+    cache = InstanceCache(args.cache_dir)
+    if args.prune:
+        print(f"{cache.prune()}件の古いエントリを削除しました")
+    num_files = cache.preprocess(args.data_dir)
+    print(f"{num_files}ファイルを前処理しました（新規 {cache.misses} / 既存 {cache.hits}）")
+    if args.test_cases:
+        from main import test_cases
+        for file_paths, offsets in test_cases:
+            cache.load_instances(file_paths, offsets)
+        print(f"test_cases の {len(test_cases)} 組み合わせを前処理しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+大規模・多LSPのスケーリング試験用に、Li & Lim形式（parse_lilim200で読める形式）のPDPTWインスタンスを生成する
+
+使い方:
+    python instance_generator.py generated/L10_N500 --lsps 10 --requests 500 --clustering 0.5 --tightness 0.8
+    python batch_runner.py --manifest generated/L10_N500/manifest.json
+
+生成されるファイル（出力ディレクトリ）:
+    <prefix>_<k>.txt : LSP k（1始まり）のインスタンス。座標は全LSP共通の平面上の値なので、オフセットは (0, 0)
+    manifest.json    : 全LSPを1ケースとする batch_runner 用のマニフェスト
+
+生成方法:
+    - 全LSPが同じ area×area の領域で集荷・配達を行い、デポは領域の中心を囲む円周上に等間隔に置く
+    - 地点は割合 clustering で全LSP共通のクラスタ（正規分布）から、残りは一様分布から選ぶ（1: LC相当、0: LR相当）
+    - 時間窓は、デポから出発して集荷 → 配達 → デポ帰着が計画期間内に収まる時刻を中心に、幅 (1 - tightness) × 計画期間 で与える
+      （各リクエストは単独の車両で必ず実行可能）
+"""
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+from node_arrays import NodeArrays
+
+
+def _sample_locations(rng, count, area, clustering, cluster_centers, cluster_std):
+    # 割合 clustering の地点はクラスタ中心の周りの正規分布、残りは領域内の一様分布から選ぶ
+    clustered = rng.random(count) < clustering
+    points = rng.uniform(0, area, size=(count, 2))
+    if clustered.any() and len(cluster_centers):
+        centers = cluster_centers[rng.integers(len(cluster_centers), size=int(clustered.sum()))]
+        points[clustered] = centers + rng.normal(0, cluster_std, size=centers.shape)
+    return np.clip(np.rint(points), 0, area)
+
+
+def generate_lsp(rng, depot, num_requests, num_vehicles, vehicle_capacity, area=100.0, clustering=0.5,
+                 cluster_centers=None, cluster_std=5.0, tightness=0.8, horizon=1000, service_time=10, max_demand=30):
+    """
+    LSP 1社分のインスタンスを生成し、(NodeArrays, 車両数, 車両容量) を返す（read_lilim200と同じ形式）
+    - depot: デポの座標 (x, y)
+    - cluster_centers: クラスタ中心の配列 (K, 2)（Noneならクラスタなし）
+    """
+    if cluster_centers is None:
+        cluster_centers = np.empty((0, 2))
+    pickups = _sample_locations(rng, num_requests, area, clustering, cluster_centers, cluster_std)
+    deliveries = _sample_locations(rng, num_requests, area, clustering, cluster_centers, cluster_std)
+    depot = np.asarray(depot, dtype=float)
+
+    # 距離は切り上げて見積もり、ソルバー側の整数距離（切り捨て）でも必ず実行可能にする
+    to_pickup = np.ceil(np.hypot(*(pickups - depot).T))
+    pickup_to_delivery = np.ceil(np.hypot(*(deliveries - pickups).T))
+    delivery_to_depot = np.ceil(np.hypot(*(depot - deliveries).T))
+    latest_start = horizon - (service_time + pickup_to_delivery + service_time + delivery_to_depot)
+    if (latest_start < to_pickup).any():
+        raise ValueError("horizon is too short for the area: some requests cannot be served from the depot")
+
+    # 集荷の時刻を実行可能な範囲から選び、配達はそこから直行した時刻とする
+    pickup_time = np.floor(to_pickup + rng.random(num_requests) * (latest_start - to_pickup))
+    delivery_time = pickup_time + service_time + pickup_to_delivery
+    half_width = (1 - tightness) * horizon / 2
+    pickup_ready = np.maximum(0, np.floor(pickup_time - half_width))
+    pickup_due = np.minimum(latest_start, np.ceil(pickup_time + half_width))
+    delivery_ready = np.maximum(0, np.floor(delivery_time - half_width))
+    delivery_due = np.minimum(horizon - service_time - delivery_to_depot, np.ceil(delivery_time + half_width))
+
+    demand = rng.integers(1, min(max_demand, vehicle_capacity) + 1, size=num_requests)
+
+    # ID 1..2n を集荷・配達にランダムに割り当てる（デポはID 0）
+    ids = rng.permutation(np.arange(1, 2 * num_requests + 1))
+    pickup_ids, delivery_ids = ids[:num_requests], ids[num_requests:]
+    size = 2 * num_requests + 1
+    columns = {field: np.zeros(size) for field in ('x', 'y', 'demand', 'ready', 'due', 'service', 'pickup_index', 'delivery_index')}
+    columns['x'][0], columns['y'][0] = depot
+    columns['due'][0] = horizon
+    for node_ids, points, sign, ready, due, partner, partner_field in (
+            (pickup_ids, pickups, 1, pickup_ready, pickup_due, delivery_ids, 'delivery_index'),
+            (delivery_ids, deliveries, -1, delivery_ready, delivery_due, pickup_ids, 'pickup_index')):
+        columns['x'][node_ids], columns['y'][node_ids] = points[:, 0], points[:, 1]
+        columns['demand'][node_ids] = sign * demand
+        columns['ready'][node_ids] = ready
+        columns['due'][node_ids] = due
+        columns['service'][node_ids] = service_time
+        columns[partner_field][node_ids] = partner
+    nodes = NodeArrays(id=np.arange(size), **columns)
+    return nodes, num_vehicles, vehicle_capacity
+
+
+def generate_instances(num_lsps, requests_per_lsp, vehicles_per_lsp=None, vehicle_capacity=200, area=100.0,
+                       clustering=0.5, num_clusters=8, cluster_std=5.0, tightness=0.8, horizon=1000, service_time=10,
+                       max_demand=30, depot_spread=0.5, seed=0):
+    """
+    多LSPインスタンスを生成し、LSPごとの (NodeArrays, 車両数, 車両容量) のリストを返す
+    - requests_per_lsp: 1社あたりのPDリクエスト数（ノード数は 2 × requests_per_lsp + 1）
+    - vehicles_per_lsp: 1社あたりの車両数（Noneなら Li & Lim と同じくリクエスト数の半分）
+    - clustering: 共通クラスタから選ぶ地点の割合（0〜1）
+    - tightness: 時間窓の厳しさ（0: 計画期間全体、1: 幅0）
+    - depot_spread: デポを置く円の半径（領域の半幅に対する割合）
+    """
+    rng = np.random.default_rng(seed)
+    if vehicles_per_lsp is None:
+        vehicles_per_lsp = max(1, requests_per_lsp // 2)
+    cluster_centers = rng.uniform(0.1 * area, 0.9 * area, size=(num_clusters, 2))
+    radius = depot_spread * area / 2
+    instances = []
+    for k in range(num_lsps):
+        angle = 2 * math.pi * k / num_lsps
+        depot = (round(area / 2 + radius * math.cos(angle)), round(area / 2 + radius * math.sin(angle)))
+        instances.append(generate_lsp(rng, depot, requests_per_lsp, vehicles_per_lsp, vehicle_capacity, area, clustering,
+                                      cluster_centers, cluster_std, tightness, horizon, service_time, max_demand))
+    return instances
+
+
+def write_lilim200(path, nodes, num_vehicles, vehicle_capacity):
+    """ノード配列をLi & Lim形式のファイルに書き出す（1行目: 車両数 容量 速度、以降: ノードごとに9列）"""
+    with open(path, 'w') as f:
+        f.write(f"{num_vehicles}\t{vehicle_capacity}\t1\n")
+        for row in zip(nodes.id.tolist(), nodes.x.tolist(), nodes.y.tolist(), nodes.demand.tolist(), nodes.ready.tolist(),
+                       nodes.due.tolist(), nodes.service.tolist(), nodes.pickup_index.tolist(), nodes.delivery_index.tolist()):
+            f.write('\t'.join(str(int(value)) for value in row) + '\n')
+
+
+def write_instances(output_dir, instances, prefix='GEN'):
+    """生成したLSPごとのインスタンスを書き出し、(ファイルパスのリスト, オフセットのリスト) を返す"""
+    os.makedirs(output_dir, exist_ok=True)
+    file_paths = []
+    for k, (nodes, num_vehicles, vehicle_capacity) in enumerate(instances, 1):
+        path = os.path.join(output_dir, f"{prefix}_{k}.txt")
+        write_lilim200(path, nodes, num_vehicles, vehicle_capacity)
+        file_paths.append(path)
+    return file_paths, [(0, 0)] * len(file_paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir')
+    parser.add_argument('--lsps', type=int, default=5, help='LSP数')
+    parser.add_argument('--requests', type=int, default=100, help='1社あたりのPDリクエスト数')
+    parser.add_argument('--vehicles', type=int, default=None, help='1社あたりの車両数（既定: リクエスト数の半分）')
+    parser.add_argument('--capacity', type=int, default=200, help='車両容量')
+    parser.add_argument('--area', type=float, default=100.0, help='領域の一辺の長さ')
+    parser.add_argument('--clustering', type=float, default=0.5, help='共通クラスタから選ぶ地点の割合（0〜1）')
+    parser.add_argument('--clusters', type=int, default=8, help='クラスタ数')
+    parser.add_argument('--tightness', type=float, default=0.8, help='時間窓の厳しさ（0: 計画期間全体、1: 幅0）')
+    parser.add_argument('--horizon', type=int, default=1000, help='計画期間（デポの閉店時刻）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prefix', default=None, help='ファイル名の接頭辞（既定: GEN_L<LSP数>_N<リクエスト数>_S<シード>）')
+    args = parser.parse_args()
+
+    instances = generate_instances(args.lsps, args.requests, args.vehicles, args.capacity, args.area, args.clustering,
+                                   args.clusters, tightness=args.tightness, horizon=args.horizon, seed=args.seed)
+    prefix = args.prefix or f"GEN_L{args.lsps}_N{args.requests}_S{args.seed}"
+    file_paths, offsets = write_instances(args.output_dir, instances, prefix)
+    with open(os.path.join(args.output_dir, 'manifest.json'), 'w') as f:
+        json.dump({'cases': [{'name': prefix, 'files': file_paths, 'offsets': [list(offset) for offset in offsets]}]},
+                  f, ensure_ascii=False, indent=1)
+    print(f"{len(file_paths)}社分のインスタンスを {args.output_dir} に書き出しました"
+          f"（1社あたり {args.requests} リクエスト、{instances[0][1]} 台）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+
+from node_arrays import NodeArrays, node_column
+
+
+class InstanceStore:
+    """
+    パース後に一度だけ構築する、座標・距離のNumPyストア
+    - ids: 顧客IDの配列 (N,)
+    - coords: 座標配列 (N, 2)
+    - row_of_id: 顧客ID → 行インデックスの参照配列（未使用のIDは-1）
+    - distance_matrix: OR-Tools用の整数距離行列 (N, N)（create_distance_matrixと同じく切り捨て）
+    - dense=False の場合は全体行列を持たず、部分問題の行列を座標から都度計算する
+    """
+
+    def __init__(self, customers, dense=True):
+        if isinstance(customers, NodeArrays):
+            self.ids = customers.id.astype(np.int64)
+            self.coords = customers.coords
+        else:
+            self.ids = np.array(node_column(customers, 'id'), dtype=np.int64)
+            self.coords = np.array([(c['x'], c['y']) for c in customers], dtype=np.float64)
+        self.row_of_id = np.full(int(self.ids.max()) + 1 if len(self.ids) else 0, -1, dtype=np.int64)
+        self.row_of_id[self.ids] = np.arange(len(self.ids), dtype=np.int64)
+        self.distance_matrix = self._pairwise_int_distance(self.coords, self.coords) if dense else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _pairwise_int_distance(coords_a, coords_b):
+        diff = coords_a[:, None, :] - coords_b[None, :, :]
+        return np.sqrt((diff ** 2).sum(axis=2)).astype(np.int32)
+
+    def rows(self, node_ids):
+        """顧客IDのリストを行インデックス配列に変換する"""
+        rows = self.row_of_id[np.fromiter(node_ids, dtype=np.int64, count=len(node_ids))]
+        if (rows < 0).any():
+            raise KeyError(f"Unknown node ids in {list(node_ids)}")
+        return rows
+
+    def sub_distance_matrix(self, node_ids):
+        """部分問題（node_idsの並び順）の整数距離行列を返す"""
+        rows = self.rows(node_ids)
+        if self.distance_matrix is not None:
+            return self.distance_matrix[np.ix_(rows, rows)]
+        sub_coords = self.coords[rows]
+        return self._pairwise_int_distance(sub_coords, sub_coords)
+
+    def route_cost(self, route):
+        """ルートの総距離（ユークリッド距離の和）を計算する"""
+        if len(route) < 2:
+            return 0.0
+        points = self.coords[self.rows(route)]
+        diff = points[1:] - points[:-1]
+        return float(np.sqrt((diff ** 2).sum(axis=1)).sum())
+
+    def route_costs(self, routes):
+        """複数ルートの総距離をまとめて計算し、ルートごとのコスト配列を返す"""
+        num_routes = len(routes)
+        edge_from = []
+        edge_to = []
+        edge_route = []
+        for k, route in enumerate(routes):
+            if len(route) < 2:
+                continue
+            edge_from.extend(route[:-1])
+            edge_to.extend(route[1:])
+            edge_route.extend([k] * (len(route) - 1))
+        if not edge_route:
+            return np.zeros(num_routes)
+        diff = self.coords[self.rows(edge_to)] - self.coords[self.rows(edge_from)]
+        lengths = np.sqrt((diff ** 2).sum(axis=1))
+        return np.bincount(np.array(edge_route), weights=lengths, minlength=num_routes)
@@ -1,7 +1,15 @@
-from parser import parse_lilim200
-from flexible_vrp_solver import route_cost
-from gat import initialize_individual_vrps, perform_gat_exchange
-from visualizer import plot_routes
+from parser import load_instances
+from instance_store import InstanceStore
+from instance_cache import InstanceCache
+from gat import initialize_individual_vrps, create_pair_pool, GATEngine
+from gat_runner import run_gat
+from feasibility import audit_routes
+from pair_cache import PairSolveCache
+from pair_worker import SpoolPairPool
+from visualizer import RouteRenderer
+from profiler import profiler
+import hashlib
+import json
 import time
 import os
 
@@ -22,119 +30,352 @@ test_cases = [
     (["data/LR1_2_10.txt", "data/LR1_2_8.txt"], [(0, 0), (0, 30)])
 ]
 
+# 前処理済みインスタンス（.npy）のキャッシュ（Noneならテキストファイルを毎回パースする。例: "cache/instances"）
+INSTANCE_CACHE_DIR = None
+# 2車両VRPを並列に解くワーカープロセス数（1ならシリアル実行）
+NUM_PAIR_WORKERS = os.cpu_count() or 1
+# ワーカーへ一度に送るペア数（Noneなら自動決定）
+PAIR_CHUNKSIZE = None
+# 2車両VRPを共有ディレクトリ（スプール）経由で pair_worker.py のワーカーに配る場合のスプール（Noneなら使わない）と、
+# このマシンで起動するワーカー数（0なら別マシンで起動したワーカーだけを使う）。指定時は NUM_PAIR_WORKERS は使わない
+PAIR_SPOOL_DIR = None
+PAIR_SPOOL_LOCAL_WORKERS = os.cpu_count() or 1
+# 2車両ペアの事前スクリーニング設定（gat.PAIR_SCREENING_DEFAULTS を上書き）
+# 'conservative' の下界は現在の経路のコスト以下にしかならず、除外できるのは下界と等しいペアだけなので既定では使わない
+PAIR_SCREENING = {'mode': 'off'}
+# アクション選択方法（'matching': 最大重みマッチング / 'cpsat': OR-Tools CP-SAT）
+ACTION_SELECTION = 'matching'
+# 選択の前に全アクションの新しい経路を検査し、実行不可能なもの（丸ごと交換で時間窓を守れない経路など）を除くか
+VALIDATE_ACTIONS = True
+# LSPごとの初期経路を並列に解くワーカープロセス数（1ならシリアル実行、LSP数を上限とする）
+INIT_WORKERS = os.cpu_count() or 1
+# 初期経路生成（LSPごと）の探索制限（time_limit[秒]はLSPごとのリストでもよい, solution_limit。Noneなら無制限）と
+# 近傍の制限（neighbors: 初期解の構築と局所探索で各ノードのk近傍だけを調べる。Noneなら全アーク。数百リクエスト以上のLSP向け）
+INIT_SOLVER_OPTIONS = {'time_limit': None, 'solution_limit': None, 'neighbors': None}
+# 2車両VRP（ペアごと）のエンジンと探索制限（Noneなら無制限）
+# engine: 'ortools'（OR-Tools）/ 'local_search'（軽量PD局所探索）/ 'compare'（両方で解きOR-Tools版とのギャップを表示）
+PAIR_SOLVER_OPTIONS = {'engine': 'ortools', 'time_limit': None, 'solution_limit': None}
+# GAT改善フェーズ全体の時間予算[秒]（Noneなら改善が止まるまで実行）
+GAT_TIME_BUDGET = None
+# 2車両VRPの求解結果を実行をまたいで再利用するキャッシュ（Noneなら使わない。例: "cache/pair_cache.sqlite"）と、
+# 保持するエントリ数の上限
+PAIR_CACHE_PATH = None
+PAIR_CACHE_MAX_ENTRIES = 200000
+# 経路図の描画（'all': 毎ラウンド / 'every': RENDER_EVERYラウンドごと / 'final': 最終経路のみ / 'off': 描画しない）
+# RENDER_IN_BACKGROUND=True なら描画専用プロセスで描画し、GAT改善フェーズは描画を待たない
+RENDER_MODE = 'all'
+RENDER_EVERY = 1
+RENDER_IN_BACKGROUND = True
+# 計測（フェーズ・ラウンド・ペアごとの時間とカウンタ）を有効にするか。有効時は PROFILE_DIR/<インスタンス名>-<ハッシュ>/ に
+# （ハッシュはチェックポイントと同じく、ファイル・オフセットと結果に影響する設定から作る）
+# profile.json（集計とラウンド・ペアごとの記録）、trace.json（Chromeトレース形式）、stacks.folded（フレームグラフ用）を書き出す
+PROFILE = False
+PROFILE_DIR = "profiles"
+# GAT改善フェーズのチェックポイント（経路とエンジンの状態）の保存先（Noneなら保存しない。例: "cache/checkpoints"）と
+# 保存間隔[ラウンド]
+# 途中で停止したケースを同じ設定で再実行すると、初期経路生成と完了済みのラウンドを飛ばして続きから再開する
+# （最後まで終了したケースのチェックポイントは削除する）
+CHECKPOINT_DIR = None
+CHECKPOINT_EVERY = 1
+# チェックポイントのファイル名に含める設定（これらが異なる実行のチェックポイントは使わない）
+CHECKPOINT_CONFIG_KEYS = ('init_solver_options', 'pair_solver_options', 'pair_screening', 'action_selection',
+                          'validate_actions')
+
+
+def print_budget_report(round_times, time_budget):
+    """GAT改善フェーズの各ラウンドが時間予算をどう消費したかを表示する"""
+    total = sum(round_times)
+    base = time_budget if time_budget is not None else total
+    print(f"--- GAT時間配分（合計 {total:.2f} 秒" + (f" / 予算 {time_budget:.2f} 秒）---" if time_budget is not None else "）---"))
+    for round_index, round_time in enumerate(round_times, 1):
+        share = round_time / base * 100 if base > 0 else 0.0
+        print(f"  ラウンド {round_index:3}: {round_time:8.2f} 秒 ({share:5.1f}%)")
+
+def print_routes_with_lsp_separator(routes, vehicle_num_list):
+    vehicle_index = 0
+    for lsp_index, num_vehicles in enumerate(vehicle_num_list):
+        print(f"--- LSP {lsp_index + 1} ---")
+        for _ in range(num_vehicles):
+            route = routes[vehicle_index]
+            print(f"  Vehicle {vehicle_index + 1}: {' -> '.join(map(str, route))}")
+            vehicle_index += 1
+
+
+def default_run_config():
+    """run_caseの既定設定（上記のモジュール定数から作る）"""
+    return {
+        'instance_cache_dir': INSTANCE_CACHE_DIR,
+        'num_pair_workers': NUM_PAIR_WORKERS,
+        'pair_chunksize': PAIR_CHUNKSIZE,
+        'pair_spool_dir': PAIR_SPOOL_DIR,
+        'pair_spool_local_workers': PAIR_SPOOL_LOCAL_WORKERS,
+        'pair_screening': PAIR_SCREENING,
+        'action_selection': ACTION_SELECTION,
+        'validate_actions': VALIDATE_ACTIONS,
+        'init_workers': INIT_WORKERS,
+        'init_solver_options': INIT_SOLVER_OPTIONS,
+        'pair_solver_options': PAIR_SOLVER_OPTIONS,
+        'gat_time_budget': GAT_TIME_BUDGET,
+        'pair_cache_path': PAIR_CACHE_PATH,
+        'pair_cache_max_entries': PAIR_CACHE_MAX_ENTRIES,
+        'render_mode': RENDER_MODE,
+        'render_every': RENDER_EVERY,
+        'render_in_background': RENDER_IN_BACKGROUND,
+        'profile': PROFILE,
+        'profile_dir': PROFILE_DIR,
+        'checkpoint_dir': CHECKPOINT_DIR,
+        'checkpoint_every': CHECKPOINT_EVERY,
+    }
+
+
+def checkpoint_key(file_paths, offsets, run_config):
+    """ファイル・オフセットと結果に影響する設定から、チェックポイントのファイル名に付けるハッシュを作る"""
+    key = {'files': [os.path.abspath(path) for path in file_paths], 'offsets': [list(offset) for offset in offsets]}
+    key.update({name: run_config[name] for name in CHECKPOINT_CONFIG_KEYS})
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def uses_dense_store(run_config):
+    """全体の距離行列（N×N）を持つ InstanceStore を使うか（初期経路生成で近傍を制限する場合は持たない）"""
+    return run_config['init_solver_options'].get('neighbors') is None
+
+
+def load_case_instance(file_paths, offsets, instance_cache_dir=None):
+    """テストケースのデータファイルを読み込む（instance_cache_dir の前処理済みキャッシュがあればそれを読み込む）"""
+    if instance_cache_dir is not None:
+        return InstanceCache(instance_cache_dir).load_instances(file_paths, offsets)
+    return load_instances(file_paths, offsets)
+
+
 # ==============================
 # === テストケースの実行部 ===
 # ==============================
-for case_index, (file_paths, offsets) in enumerate(test_cases, 1):
+def run_case(file_paths, offsets, case_index=1, config=None, on_round=None, on_init=None, instance=None, store=None,
+             stop=None):
+    """
+    1テストケース（初期経路生成 → GAT改善）を実行し、結果の辞書を返す
+    - config: default_run_config() のキーを上書きする辞書
+    - on_round: GAT改善の各ラウンド終了時にラウンド結果の辞書を受け取るコールバック
+    - on_init: 初期経路の生成後（チェックポイントから再開した場合は再開時）に初期コストなどの辞書を受け取るコールバック
+    - instance, store: 読み込み済みのインスタンス（load_case_instance の戻り値）と InstanceStore
+                       （同じインスタンスを繰り返し解く場合に渡すと、パースと距離行列の構築を省く）
+    - stop: 打ち切りの合図（multiprocessing.Event）。セットされるとGAT改善のラウンド中でも未着手のペアを解かずにラウンドを終える
+            （打ち切るかどうかは on_round で判断する。初期経路生成中の求解は打ち切らない）
+    戻り値: 初期コスト・最終コスト・ラウンド数・各フェーズの実行時間などをまとめた辞書
+    """
+    run_config = default_run_config()
+    run_config.update(config or {})
+
     print("\n" + "="*50)
-    print(f"テストケース {case_index}: {file_paths[0]} + {file_paths[1]}")
-    print(f"オフセット: {offsets[0]} , {offsets[1]}")
+    print(f"テストケース {case_index}: {' + '.join(file_paths)}")
+    print(f"オフセット: {' , '.join(str(offset) for offset in offsets)}")
     print("="*50)
-    
-    instance_name = f"{os.path.basename(file_paths[0]).split('.')[0]}_{os.path.basename(file_paths[1]).split('.')[0]}"
-    
+
+    # 3社以上のケース（instance_generatorの生成インスタンスなど）も全ファイル名をつなげて名前にする
+    instance_name = '_'.join(os.path.basename(path).split('.')[0] for path in file_paths)
+
+    if run_config['profile']:
+        profiler.reset(enabled=True)
     start_time = time.time()
-    """
-    # 入力データセット
-    file_paths = [
-        "data/LC1_2_2.txt",
-        "data/LC1_2_7.txt"
-    ]
-
-    # 元論文の手法に則り片方のデータセットをオフセット
-    offsets = [
-        (0, 0),
-        (-32, -32)
-    ]
-    """
 
+    # === データファイルをパース（前処理済みのキャッシュがあればそれを読み込む） ===
+    if instance is None:
+        with profiler.span('phase.parse', cached=run_config['instance_cache_dir'] is not None):
+            instance = load_case_instance(file_paths, offsets, run_config['instance_cache_dir'])
+    all_customers = instance['customers']
+    all_PD_pairs = instance['PD_pairs']
+    num_lsps = instance['num_lsps']
+    depot_id_list = instance['depot_id_list']
+    vehicle_num_list = instance['vehicle_num_list']
+    vehicle_capacity = instance['vehicle_capacity']
+
+    # 座標・距離行列はパース後に一度だけ構築し、全フェーズで共有する
+    # （初期経路生成で近傍を制限する大規模インスタンスでは全体の距離行列を持たず、部分問題の行列を都度計算する）
+    if store is None:
+        dense = uses_dense_store(run_config)
+        with profiler.span('phase.instance_store', nodes=len(all_customers), dense=dense):
+            store = InstanceStore(all_customers, dense=dense)
+    # 経路図の静的レイヤー（デポ・等距離線）はインスタンスごとに一度だけ計算する
+    renderer = RouteRenderer(all_customers, depot_id_list, vehicle_num_list, instance_name=instance_name,
+                             mode=run_config['render_mode'], every=run_config['render_every'],
+                             background=run_config['render_in_background'])
+    pair_cache = None
+    pair_pool = None
+    # 例外（呼び出し側のコールバックによる打ち切りなど）で終わる場合も、ペア求解のワーカー・描画プロセス・キャッシュの接続を残さない
+    try:
+        #       ==========================
+        #       ===== GAT改善フェーズ =====
+        #       ==========================
+        num_pair_workers = run_config['num_pair_workers']
+        pair_solver_options = run_config['pair_solver_options']
+        time_budget = run_config['gat_time_budget']
+        if run_config['pair_cache_path'] is not None:
+            pair_cache = PairSolveCache(run_config['pair_cache_path'], run_config['pair_cache_max_entries'])
+        if run_config['pair_spool_dir'] is not None:
+            # ペアごとの部分問題を自己完結したタスクとしてスプールに置き、(別マシンの)ワーカーに解かせる
+            pair_pool = SpoolPairPool(run_config['pair_spool_dir'], local_workers=run_config['pair_spool_local_workers'])
+        elif num_pair_workers > 1:
+            # 顧客データはプール生成時に一度だけワーカーへ転送し、全ラウンドで使い回す
+            pair_pool = create_pair_pool(all_customers, vehicle_capacity, num_pair_workers, store, pair_solver_options, pair_cache,
+                                         stop)
+        # 経路が変化した車両を含むペアのみ再計算するGATエンジン
+        gat_engine = GATEngine(all_customers, all_PD_pairs, vehicle_capacity,
+                               num_workers=num_pair_workers, chunksize=run_config['pair_chunksize'], pool=pair_pool, store=store,
+                               screening=run_config['pair_screening'], selection=run_config['action_selection'],
+                               solver_options=pair_solver_options, cache=pair_cache, validate=run_config['validate_actions'],
+                               stop=stop)
+        checkpoint_path = None
+        if run_config['checkpoint_dir'] is not None:
+            checkpoint_path = os.path.join(run_config['checkpoint_dir'],
+                                           f"{instance_name}-{checkpoint_key(file_paths, offsets, run_config)}.pkl")
+
+        #      =============================
+        #      === LSP個別経路生成フェーズ ===
+        #      =============================
+        # チェックポイントから再開する場合は呼ばれない
+        def initialize():
+            with profiler.span('phase.init', lsps=num_lsps):
+                return initialize_individual_vrps(
+                    all_customers, all_PD_pairs, num_lsps, vehicle_num_list, depot_id_list, vehicle_capacity=vehicle_capacity,
+                    store=store, solver_options=run_config['init_solver_options'], num_workers=run_config['init_workers']
+                )
+
+        # 時間予算を超えたら、その時点までに得られた最良の経路で打ち切る（各ラウンドは改善する交換のみ適用する）
+        cache_hits = cache_misses = 0
+        for state in run_gat(gat_engine, initialize, time_budget, checkpoint_path, run_config['checkpoint_every']):
+            i = state['round']
+            routes = state['routes']
+            current_cost = state['cost']
+            if i == 0 or state['resumed']:
+                initial_cost = state['initial_cost']
+                init_time = time.time() - start_time
+                gat_start = time.time()
+                renderer.submit(routes, i)
+                print(f"初期経路コスト＝{initial_cost}")
+                if on_init is not None:
+                    on_init({'round': i, 'initial_cost': initial_cost, 'cost': current_cost, 'init_time': init_time,
+                             'resumed': state['resumed']})
+                #print("=== 初期経路 ===")
+                #print_routes_with_lsp_separator(routes, vehicle_num_list)
+            else:
+                print(f"=== gat改善：{i}回目 ===")
+                round_stats = state['stats']
+                print(f"再計算ペア数：{round_stats['solved_pairs']}（再利用：{round_stats['reused_pairs']}、"
+                      f"事前除外：{round_stats['pairs_pruned']}、節約時間見積もり：{round_stats['estimated_time_saved']:.2f} 秒）")
+                if round_stats['actions_rejected']:
+                    print(f"実行不可能なため除外したアクション数：{round_stats['actions_rejected']}")
+                cache_hits += round_stats['cache_hits']
+                cache_misses += round_stats['cache_misses']
+                comparison = round_stats['engine_comparison']
+                if comparison is not None:
+                    print(f"エンジン比較：{comparison['pairs']}ペア、OR-Toolsとの平均ギャップ {comparison['mean_gap_percent']:.2f}%"
+                          f"（最大 {comparison['max_gap_percent']:.2f}%）、"
+                          f"求解時間 OR-Tools {comparison['ortools_time']:.2f} 秒 / 局所探索 {comparison['local_search_time']:.2f} 秒")
+                renderer.submit(routes, i)
+
+                #print_routes_with_lsp_separator(routes, vehicle_num_list)
 
-    num_lsps = len(file_paths)
-    num_vehicles = 0
-    all_customers = []
-    all_PD_pairs = {}
-    depot_id_list = []
-    depot_coords = []
-    vehicle_num_list = []
-    vehicle_capacity = None
-
-    # === データファイルをパース ===
-    id_offset = 0  # 初期IDオフセット
-    for path, offset in zip(file_paths, offsets):
-        data = parse_lilim200(path, x_offset=offset[0], y_offset=offset[1], id_offset=id_offset)
-
-        # データ蓄積
-        all_customers.extend(data['customers'])
-        all_PD_pairs.update(data['PD_pairs'])
-        depot_id_list.append(data['depot_id'])
-        depot_coords.append(data['depot_coord'])
-        vehicle_num_list.append(data['num_vehicles'])
-        num_vehicles += data['num_vehicles']
-        
-        # IDオフセットを次に備えて更新
-        max_id = max(c['id'] for c in data['customers'])
-        id_offset = max_id + 1
-
-        # 車両容量の情報を保存（全ファイルで同じ前提）
-        if vehicle_capacity is None:
-            vehicle_capacity = data['vehicle_capacity']
-
-
-    #      =============================
-    #      === LSP個別経路生成フェーズ ===
-    #      =============================
-    routes = initialize_individual_vrps(
-        all_customers, all_PD_pairs, num_lsps, vehicle_num_list, depot_id_list, vehicle_capacity=vehicle_capacity
-    )
-    plot_routes(all_customers, routes, depot_id_list, vehicle_num_list, iteration=0, instance_name=instance_name)
-    
-    initial_cost = sum(route_cost(route, all_customers) for route in routes)
-    print(f"初期経路コスト＝{initial_cost}")
-    previous_cost = initial_cost
-    
-
-    def print_routes_with_lsp_separator(routes, vehicle_num_list):
-        vehicle_index = 0
-        for lsp_index, num_vehicles in enumerate(vehicle_num_list):
-            print(f"--- LSP {lsp_index + 1} ---")
-            for _ in range(num_vehicles):
-                route = routes[vehicle_index]
-                print(f"  Vehicle {vehicle_index + 1}: {' -> '.join(map(str, route))}")
-                vehicle_index += 1
-
-    #print("=== 初期経路 ===")  
-    #print_routes_with_lsp_separator(routes, vehicle_num_list)
-
-
-    #       ==========================
-    #       ===== GAT改善フェーズ =====
-    #       ==========================
-    i=1
-    while True:
-        print(f"=== gat改善：{i}回目 ===")
-        
-        routes = perform_gat_exchange(
-            routes, all_customers, all_PD_pairs, vehicle_capacity=vehicle_capacity
-        )
-        plot_routes(all_customers, routes, depot_id_list, vehicle_num_list, iteration=i, instance_name=instance_name)
-
-        #print_routes_with_lsp_separator(routes, vehicle_num_list)
-        
-        # コスト改善率計算
-        current_cost = sum(route_cost(route, all_customers) for route in routes)
-        from_initial = (initial_cost - current_cost) / initial_cost * 100
-        from_previous = (previous_cost - current_cost) / previous_cost * 100
-        #print(f"[初期ルートからのコスト改善率] {from_initial:.2f}%")
-        #print(f"[前回経路からのコスト改善率] {from_previous:.2f}%")
-        if round(from_previous, 1) == 0.0:
-            print(f"最終コスト＝{current_cost}")
-            print(f"初期ルートからのコスト改善率＝ {from_initial:.2f}%")
-            break
+                round_record = {
+                    'round': i,
+                    'cost': current_cost,
+                    'improvement_from_initial': state['improvement_from_initial'],
+                    'improvement_from_previous': state['improvement_from_previous'],
+                    'round_time': state['round_time'],
+                    'dirty_vehicles': round_stats['dirty_vehicles'],
+                    'solved_pairs': round_stats['solved_pairs'],
+                    'reused_pairs': round_stats['reused_pairs'],
+                    'pairs_pruned': round_stats['pairs_pruned'],
+                    'pairs_skipped': round_stats['pairs_skipped'],
+                    'solver_time': round_stats['solver_time'],
+                    'cache_hits': round_stats['cache_hits'],
+                    'cache_misses': round_stats['cache_misses'],
+                    'actions_rejected': round_stats['actions_rejected'],
+                }
+                profiler.record('round', **round_record)
+                if on_round is not None:
+                    on_round(round_record)
+            if state['finished'] or state['stopped']:
+                if state['budget_exhausted']:
+                    print("GAT改善フェーズの時間予算に達したため打ち切ります")
+                elif state['stopped']:
+                    print("打ち切りの合図を受けたため、ラウンドの途中で打ち切ります")
+                print(f"最終コスト＝{current_cost}")
+                print(f"初期ルートからのコスト改善率＝ {state['improvement_from_initial']:.2f}%")
+        from_initial = state['improvement_from_initial']
+        budget_exhausted = state['budget_exhausted']
+        round_times = state['round_times']
+        # 正常に終了したケースのチェックポイントは消し、次の実行は最初からやり直す（打ち切った場合は続きから再開できるよう残す）
+        if checkpoint_path is not None and not state['stopped'] and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        if pair_cache is not None:
+            # ヒット/ミスはワーカー側で発生するため、ラウンド統計から集計する
+            print(f"求解結果キャッシュ：ヒット {cache_hits} / ミス {cache_misses}（保存件数 {pair_cache.stats()['entries']}）")
+        print_budget_report(round_times, time_budget)
+        # 最終経路の監査（各経路の容量・時間窓・PD制約と、全顧客をちょうど1回ずつ訪問していること）
+        with profiler.span('phase.audit', routes=len(routes)):
+            audit = audit_routes(routes, all_customers, all_PD_pairs, vehicle_capacity, gat_engine.checker)
+        if audit['num_violations'] == 0:
+            print("最終経路の検証：違反なし")
         else:
-            previous_cost = current_cost
-            i=i+1
+            counts = ', '.join(f"{kind} {n}" for kind, n in audit['counts'].items() if n)
+            print(f"最終経路の検証：違反 {audit['num_violations']} 件（{counts or '-'}、"
+                  f"未訪問 {len(audit['missing'])}、重複訪問 {len(audit['visited_twice'])}）")
+        renderer.finish(routes, i)
+    finally:
+        if pair_pool is not None:
+            pair_pool.shutdown()
+        # 正常終了時は finish() で終了済み
+        renderer.close(wait=False)
+        if pair_cache is not None:
+            pair_cache.close()
 
     # 経路改善終了, 実行時間表示
     end_time = time.time()
     elapsed = end_time - start_time
     print(f"=== テストケース {case_index} の実行時間: {elapsed:.2f} 秒 ===")
+    profile_path = None
+    if run_config['profile']:
+        # 同じファイルでオフセットが異なるケースが互いの計測結果を上書きしないよう、チェックポイントと同じキーを付ける
+        profile_path = export_profile(os.path.join(run_config['profile_dir'],
+                                                   f"{instance_name}-{checkpoint_key(file_paths, offsets, run_config)}"))
+
+    return {
+        'instance_name': instance_name,
+        'files': list(file_paths),
+        'offsets': [list(offset) for offset in offsets],
+        'num_customers': len(all_customers),
+        'num_vehicles': len(routes),
+        'initial_cost': initial_cost,
+        'final_cost': current_cost,
+        'improvement_percent': from_initial,
+        'rounds': i,
+        'budget_exhausted': budget_exhausted,
+        'init_time': init_time,
+        'gat_time': end_time - gat_start,
+        'total_time': elapsed,
+        'cache_hits': cache_hits,
+        'cache_misses': cache_misses,
+        'audit_violations': audit['num_violations'],
+        'profile_path': profile_path,
+    }
+
+
+def export_profile(profile_dir):
+    """計測結果を表示・保存して計測を無効に戻し、保存先のディレクトリを返す"""
+    print(profiler.report())
+    profiler.export_json(os.path.join(profile_dir, 'profile.json'))
+    profiler.export_chrome_trace(os.path.join(profile_dir, 'trace.json'))
+    profiler.export_folded(os.path.join(profile_dir, 'stacks.folded'))
+    profiler.reset(enabled=False)
+    print(f"計測結果を保存しました: {profile_dir}")
+    return profile_dir
+
+
+def main():
+    for case_index, (file_paths, offsets) in enumerate(test_cases, 1):
+        run_case(file_paths, offsets, case_index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""
+一般グラフの最大重みマッチング（Edmondsのblossomアルゴリズム, O(n^3)）
+
+GATのアクション選択は「各車両は高々1つのアクションにしか使えない」という制約のもとで
+改善量の合計を最大化する問題であり、車両を頂点・アクションを辺とする最大重みマッチングと等価になる。
+実装は Galil (1986) の主双対法に基づく。重みが整数であれば整数演算のみで計算される。
+"""
+
+
+def max_weight_matching(edges, maxcardinality=False):
+    """
+    最大重みマッチングを求める
+    - edges: (i, j, weight) のリスト（i, j は0以上の頂点番号、i != j）
+    - maxcardinality: Trueの場合、最大カーディナリティのマッチングの中で重み最大のものを求める
+    戻り値: mate リスト（mate[v] は v とマッチした頂点、マッチしていなければ -1）
+    """
+    if not edges:
+        return []
+
+    num_edges = len(edges)
+    num_vertices = 0
+    for (i, j, _) in edges:
+        assert i >= 0 and j >= 0 and i != j
+        num_vertices = max(num_vertices, i + 1, j + 1)
+
+    max_weight = max(0, max(w for (_, _, w) in edges))
+
+    # 辺kの端点は endpoint[2k], endpoint[2k+1]
+    endpoint = [edges[p // 2][p % 2] for p in range(2 * num_edges)]
+    # 各頂点に接続する「相手側端点」のリスト
+    neighbend = [[] for _ in range(num_vertices)]
+    for k, (i, j, _) in enumerate(edges):
+        neighbend[i].append(2 * k + 1)
+        neighbend[j].append(2 * k)
+
+    # mate[v]: vがマッチしている相手側端点（未マッチなら-1）
+    mate = num_vertices * [-1]
+    # label[b]: 0=ラベルなし, 1=S, 2=T（トップレベルblossomおよび頂点）
+    label = (2 * num_vertices) * [0]
+    # labelend[b]: ラベルを与えた辺の端点
+    labelend = (2 * num_vertices) * [-1]
+    # inblossom[v]: 頂点vを含むトップレベルblossom
+    inblossom = list(range(num_vertices))
+    blossomparent = (2 * num_vertices) * [-1]
+    blossomchilds = (2 * num_vertices) * [None]
+    blossombase = list(range(num_vertices)) + num_vertices * [-1]
+    blossomendps = (2 * num_vertices) * [None]
+    # bestedge[b]: Sブロッサム/自由頂点から他のSブロッサムへのslack最小の辺
+    bestedge = (2 * num_vertices) * [-1]
+    blossombestedges = (2 * num_vertices) * [None]
+    unusedblossoms = list(range(num_vertices, 2 * num_vertices))
+    # 双対変数（頂点: max_weightで初期化, blossom: 0）
+    dualvar = num_vertices * [max_weight] + num_vertices * [0]
+    allowedge = num_edges * [False]
+    queue = []
+
+    def slack(k):
+        (i, j, w) = edges[k]
+        return dualvar[i] + dualvar[j] - 2 * w
+
+    def blossom_leaves(b):
+        if b < num_vertices:
+            yield b
+        else:
+            for t in blossomchilds[b]:
+                if t < num_vertices:
+                    yield t
+                else:
+                    yield from blossom_leaves(t)
+
+    def assign_label(w, t, p):
+        b = inblossom[w]
+        assert label[w] == 0 and label[b] == 0
+        label[w] = label[b] = t
+        labelend[w] = labelend[b] = p
+        bestedge[w] = bestedge[b] = -1
+        if t == 1:
+            queue.extend(blossom_leaves(b))
+        elif t == 2:
+            # Tブロッサムのベースの相手はSラベルになる
+            base = blossombase[b]
+            assert mate[base] >= 0
+            assign_label(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+    def scan_blossom(v, w):
+        # v, w から交互木を遡り、新しいblossomのベース（なければ-1=増加路）を返す
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = inblossom[v]
+            if label[b] & 4:
+                base = blossombase[b]
+                break
+            assert label[b] == 1
+            path.append(b)
+            label[b] = 5
+            assert labelend[b] == mate[blossombase[b]]
+            if labelend[b] == -1:
+                v = -1
+            else:
+                v = endpoint[labelend[b]]
+                b = inblossom[v]
+                assert label[b] == 2
+                assert labelend[b] >= 0
+                v = endpoint[labelend[b]]
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            label[b] = 1
+        return base
+
+    def add_blossom(base, k):
+        (v, w, _) = edges[k]
+        bb = inblossom[base]
+        bv = inblossom[v]
+        bw = inblossom[w]
+        b = unusedblossoms.pop()
+        blossombase[b] = base
+        blossomparent[b] = -1
+        blossomparent[bb] = b
+        blossomchilds[b] = path = []
+        blossomendps[b] = endps = []
+        # vからベースまでを辿る
+        while bv != bb:
+            blossomparent[bv] = b
+            path.append(bv)
+            endps.append(labelend[bv])
+            assert labelend[bv] >= 0
+            v = endpoint[labelend[bv]]
+            bv = inblossom[v]
+        path.append(bb)
+        path.reverse()
+        endps.reverse()
+        endps.append(2 * k)
+        # wからベースまでを辿る
+        while bw != bb:
+            blossomparent[bw] = b
+            path.append(bw)
+            endps.append(labelend[bw] ^ 1)
+            assert labelend[bw] >= 0
+            w = endpoint[labelend[bw]]
+            bw = inblossom[w]
+        assert label[bb] == 1
+        label[b] = 1
+        labelend[b] = labelend[bb]
+        dualvar[b] = 0
+        for leaf in blossom_leaves(b):
+            if label[inblossom[leaf]] == 2:
+                # もとTだった頂点は新たにSとして探索対象になる
+                queue.append(leaf)
+            inblossom[leaf] = b
+        # 新blossomから他のSブロッサムへの最良辺を集約
+        bestedgeto = (2 * num_vertices) * [-1]
+        for child in path:
+            if blossombestedges[child] is None:
+                nblists = [[p // 2 for p in neighbend[leaf]] for leaf in blossom_leaves(child)]
+            else:
+                nblists = [blossombestedges[child]]
+            for nblist in nblists:
+                for kk in nblist:
+                    (i, j, _) = edges[kk]
+                    if inblossom[j] == b:
+                        i, j = j, i
+                    bj = inblossom[j]
+                    if bj != b and label[bj] == 1 and (bestedgeto[bj] == -1 or slack(kk) < slack(bestedgeto[bj])):
+                        bestedgeto[bj] = kk
+            blossombestedges[child] = None
+            bestedge[child] = -1
+        blossombestedges[b] = [kk for kk in bestedgeto if kk != -1]
+        bestedge[b] = -1
+        for kk in blossombestedges[b]:
+            if bestedge[b] == -1 or slack(kk) < slack(bestedge[b]):
+                bestedge[b] = kk
+
+    def expand_blossom(b, endstage):
+        for s in blossomchilds[b]:
+            blossomparent[s] = -1
+            if s < num_vertices:
+                inblossom[s] = s
+            elif endstage and dualvar[s] == 0:
+                expand_blossom(s, endstage)
+            else:
+                for leaf in blossom_leaves(s):
+                    inblossom[leaf] = s
+        if not endstage and label[b] == 2:
+            # Tブロッサムを展開する場合、入口からベースまでの偶数長パスにラベルを付け直す
+            assert labelend[b] >= 0
+            entrychild = inblossom[endpoint[labelend[b] ^ 1]]
+            j = blossomchilds[b].index(entrychild)
+            if j & 1:
+                j -= len(blossomchilds[b])
+                jstep = 1
+                endptrick = 0
+            else:
+                jstep = -1
+                endptrick = 1
+            p = labelend[b]
+            while j != 0:
+                label[endpoint[p ^ 1]] = 0
+                label[endpoint[blossomendps[b][j - endptrick] ^ endptrick ^ 1]] = 0
+                assign_label(endpoint[p ^ 1], 2, p)
+                allowedge[blossomendps[b][j - endptrick] // 2] = True
+                j += jstep
+                p = blossomendps[b][j - endptrick] ^ endptrick
+                allowedge[p // 2] = True
+                j += jstep
+            bv = blossomchilds[b][j]
+            label[endpoint[p ^ 1]] = label[bv] = 2
+            labelend[endpoint[p ^ 1]] = labelend[bv] = p
+            bestedge[bv] = -1
+            j += jstep
+            while blossomchilds[b][j] != entrychild:
+                bv = blossomchilds[b][j]
+                if label[bv] == 1:
+                    j += jstep
+                    continue
+                for leaf in blossom_leaves(bv):
+                    if label[leaf] != 0:
+                        break
+                if label[leaf] != 0:
+                    assert label[leaf] == 2
+                    assert inblossom[leaf] == bv
+                    label[leaf] = 0
+                    label[endpoint[mate[blossombase[bv]]]] = 0
+                    assign_label(leaf, 2, labelend[leaf])
+                j += jstep
+        label[b] = labelend[b] = -1
+        blossomchilds[b] = blossomendps[b] = None
+        blossombase[b] = -1
+        blossombestedges[b] = None
+        bestedge[b] = -1
+        unusedblossoms.append(b)
+
+    def augment_blossom(b, v):
+        # blossom b 内のマッチングを、頂点vが新しいベースになるように入れ替える
+        t = v
+        while blossomparent[t] != b:
+            t = blossomparent[t]
+        if t >= num_vertices:
+            augment_blossom(t, v)
+        i = j = blossomchilds[b].index(t)
+        if i & 1:
+            j -= len(blossomchilds[b])
+            jstep = 1
+            endptrick = 0
+        else:
+            jstep = -1
+            endptrick = 1
+        while j != 0:
+            j += jstep
+            t = blossomchilds[b][j]
+            p = blossomendps[b][j - endptrick] ^ endptrick
+            if t >= num_vertices:
+                augment_blossom(t, endpoint[p])
+            j += jstep
+            t = blossomchilds[b][j]
+            if t >= num_vertices:
+                augment_blossom(t, endpoint[p ^ 1])
+            mate[endpoint[p]] = p ^ 1
+            mate[endpoint[p ^ 1]] = p
+        blossomchilds[b] = blossomchilds[b][i:] + blossomchilds[b][:i]
+        blossomendps[b] = blossomendps[b][i:] + blossomendps[b][:i]
+        blossombase[b] = blossombase[blossomchilds[b][0]]
+        assert blossombase[b] == v
+
+    def augment_matching(k):
+        # 辺kを通る増加路に沿ってマッチングを反転する
+        (v, w, _) = edges[k]
+        for (s, p) in ((v, 2 * k + 1), (w, 2 * k)):
+            while True:
+                bs = inblossom[s]
+                assert label[bs] == 1
+                assert labelend[bs] == mate[blossombase[bs]]
+                if bs >= num_vertices:
+                    augment_blossom(bs, s)
+                mate[s] = p
+                if labelend[bs] == -1:
+                    break
+                t = endpoint[labelend[bs]]
+                bt = inblossom[t]
+                assert label[bt] == 2
+                assert labelend[bt] >= 0
+                s = endpoint[labelend[bt]]
+                j = endpoint[labelend[bt] ^ 1]
+                assert blossombase[bt] == t
+                if bt >= num_vertices:
+                    augment_blossom(bt, j)
+                mate[j] = labelend[bt]
+                p = labelend[bt] ^ 1
+
+    # 各ステージで増加路を1本見つける（最大 num_vertices ステージ）
+    for _ in range(num_vertices):
+        label[:] = (2 * num_vertices) * [0]
+        bestedge[:] = (2 * num_vertices) * [-1]
+        blossombestedges[num_vertices:] = num_vertices * [None]
+        allowedge[:] = num_edges * [False]
+        queue[:] = []
+
+        # 自由頂点にSラベルを付ける
+        for v in range(num_vertices):
+            if mate[v] == -1 and label[inblossom[v]] == 0:
+                assign_label(v, 1, -1)
+
+        augmented = False
+        while True:
+            # Sラベル頂点から交互木を成長させる
+            while queue and not augmented:
+                v = queue.pop()
+                assert label[inblossom[v]] == 1
+                for p in neighbend[v]:
+                    k = p // 2
+                    w = endpoint[p]
+                    if inblossom[v] == inblossom[w]:
+                        continue
+                    if not allowedge[k]:
+                        kslack = slack(k)
+                        if kslack <= 0:
+                            allowedge[k] = True
+                    if allowedge[k]:
+                        if label[inblossom[w]] == 0:
+                            assign_label(w, 2, p ^ 1)
+                        elif label[inblossom[w]] == 1:
+                            base = scan_blossom(v, w)
+                            if base >= 0:
+                                add_blossom(base, k)
+                            else:
+                                augment_matching(k)
+                                augmented = True
+                                break
+                        elif label[w] == 0:
+                            assert label[inblossom[w]] == 2
+                            label[w] = 2
+                            labelend[w] = p ^ 1
+                    elif label[inblossom[w]] == 1:
+                        b = inblossom[v]
+                        if bestedge[b] == -1 or kslack < slack(bestedge[b]):
+                            bestedge[b] = k
+                    elif label[w] == 0:
+                        if bestedge[w] == -1 or kslack < slack(bestedge[w]):
+                            bestedge[w] = k
+
+            if augmented:
+                break
+
+            # 双対変数の更新量deltaを決める
+            deltatype = -1
+            delta = deltaedge = deltablossom = None
+            if not maxcardinality:
+                deltatype = 1
+                delta = min(dualvar[:num_vertices])
+            for v in range(num_vertices):
+                if label[inblossom[v]] == 0 and bestedge[v] != -1:
+                    d = slack(bestedge[v])
+                    if deltatype == -1 or d < delta:
+                        delta = d
+                        deltatype = 2
+                        deltaedge = bestedge[v]
+            for b in range(2 * num_vertices):
+                if blossomparent[b] == -1 and label[b] == 1 and bestedge[b] != -1:
+                    kslack = slack(bestedge[b])
+                    d = kslack // 2 if isinstance(kslack, int) else kslack / 2
+                    if deltatype == -1 or d < delta:
+                        delta = d
+                        deltatype = 3
+                        deltaedge = bestedge[b]
+            for b in range(num_vertices, 2 * num_vertices):
+                if (blossombase[b] >= 0 and blossomparent[b] == -1 and label[b] == 2
+                        and (deltatype == -1 or dualvar[b] < delta)):
+                    delta = dualvar[b]
+                    deltatype = 4
+                    deltablossom = b
+            if deltatype == -1:
+                assert maxcardinality
+                deltatype = 1
+                delta = max(0, min(dualvar[:num_vertices]))
+
+            for v in range(num_vertices):
+                if label[inblossom[v]] == 1:
+                    dualvar[v] -= delta
+                elif label[inblossom[v]] == 2:
+                    dualvar[v] += delta
+            for b in range(num_vertices, 2 * num_vertices):
+                if blossombase[b] >= 0 and blossomparent[b] == -1:
+                    if label[b] == 1:
+                        dualvar[b] += delta
+                    elif label[b] == 2:
+                        dualvar[b] -= delta
+
+            if deltatype == 1:
+                # これ以上改善する増加路はない
+                break
+            elif deltatype == 2:
+                allowedge[deltaedge] = True
+                (i, j, _) = edges[deltaedge]
+                if label[inblossom[i]] == 0:
+                    i, j = j, i
+                assert label[inblossom[i]] == 1
+                queue.append(i)
+            elif deltatype == 3:
+                allowedge[deltaedge] = True
+                (i, j, _) = edges[deltaedge]
+                assert label[inblossom[i]] == 1
+                queue.append(i)
+            elif deltatype == 4:
+                expand_blossom(deltablossom, False)
+
+        if not augmented:
+            break
+
+        # 双対変数が0になったSブロッサムを展開する
+        for b in range(num_vertices, 2 * num_vertices):
+            if blossomparent[b] == -1 and blossombase[b] >= 0 and label[b] == 1 and dualvar[b] == 0:
+                expand_blossom(b, True)
+
+    # 端点番号を頂点番号に変換
+    for v in range(num_vertices):
+        if mate[v] >= 0:
+            mate[v] = endpoint[mate[v]]
+    return mate
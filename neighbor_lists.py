@@ -0,0 +1,44 @@
+"""
+OR-Toolsの探索を候補アークに制限するための、各ノードの後続候補リスト
+
+- ノード i の後続候補は、時間窓の上で i の直後に訪問できるノード j（ready_i + service_i + dist(i, j) <= due_j）。
+  満たさないアークはどの実行可能解にも現れないため、候補から外しても解は失われない
+- 候補は距離では絞らない（k 近傍への制限は solve_vrp_flexible が OR-Tools の探索パラメータ
+  （初期解の構築と局所探索の近傍の数）で行う。アーク自体を k 近傍に限ると、大規模なLSPで初期解を構築できなくなる）
+- デポは候補に含めない（顧客ノードから終点デポへのアークと、始点デポからのアークは solve_vrp_flexible が常に許可する）
+- 距離は InstanceStore と同じく切り捨てた整数距離。行をブロックに分けて計算するため、全体の距離行列（N×N）は作らない
+"""
+import numpy as np
+
+from node_arrays import as_node_arrays
+
+# 一度に距離を計算する行数（メモリ使用量は BLOCK_SIZE × ノード数）
+BLOCK_SIZE = 512
+
+
+def candidate_neighbors(customers, depot_indices=(), block_size=BLOCK_SIZE):
+    """
+    各ノードの後続候補（時間窓の上で直後に訪問できるノード）をローカルインデックス（customers の行番号）の
+    昇順の配列のリストで返す
+    - depot_indices: デポの行番号（候補から除き、デポ自身の要素は None = 制限なし とする）
+    """
+    nodes = as_node_arrays(customers)
+    size = len(nodes)
+    depots = np.zeros(size, dtype=bool)
+    depots[list(depot_indices)] = True
+    x, y = nodes.x, nodes.y
+    ready = nodes.ready.astype(np.int64)
+    due = nodes.due.astype(np.int64)
+    service = nodes.service.astype(np.int64)
+
+    neighbors = [None] * size
+    for block_start in range(0, size, block_size):
+        rows = np.arange(block_start, min(block_start + block_size, size))
+        dist = np.sqrt((x[rows, None] - x[None, :]) ** 2 + (y[rows, None] - y[None, :]) ** 2).astype(np.int64)
+        # 候補にならないアーク（自分自身・デポ・時間窓の上で続けて訪問できないノード）
+        blocked = depots[None, :] | (rows[:, None] == np.arange(size)[None, :])
+        blocked |= (ready[rows, None] + service[rows, None] + dist) > due[None, :]
+        for r, row in enumerate(rows.tolist()):
+            if not depots[row]:
+                neighbors[row] = np.nonzero(~blocked[r])[0]
+    return neighbors
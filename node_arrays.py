@@ -0,0 +1,158 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+
+# ノードの列と型（id・座標以外は32bit整数で保持する）
+NODE_FIELDS = ('id', 'x', 'y', 'demand', 'ready', 'due', 'service', 'pickup_index', 'delivery_index')
+NODE_DTYPES = {
+    'id': np.int64,
+    'x': np.float64,
+    'y': np.float64,
+    'demand': np.int32,
+    'ready': np.int32,
+    'due': np.int32,
+    'service': np.int32,
+    'pickup_index': np.int32,
+    'delivery_index': np.int32,
+}
+
+
+class NodeView(Mapping):
+    """NodeArraysの1行を、従来の顧客辞書（c['id'], c['x'], ...）と同じように読み取るためのビュー"""
+
+    __slots__ = ('_nodes', '_row')
+
+    def __init__(self, nodes, row):
+        self._nodes = nodes
+        self._row = row
+
+    def __getitem__(self, key):
+        if key not in NODE_DTYPES:
+            raise KeyError(key)
+        return getattr(self._nodes, key)[self._row].item()
+
+    def __iter__(self):
+        return iter(NODE_FIELDS)
+
+    def __len__(self):
+        return len(NODE_FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class NodeArrays:
+    """
+    ノード（デポ・顧客）データの列指向（struct-of-arrays）表現
+    - 列: id, x, y, demand, ready, due, service, pickup_index, delivery_index（NODE_FIELDSの各属性がNumPy配列）
+    - nodes[k] / for c in nodes は NodeView を返すため、従来の顧客辞書のリストと同じように扱える
+    - subset(node_ids) は走査ではなくID→行の参照表によるfancy-indexで部分問題のノードを取り出す
+    """
+
+    def __init__(self, **columns):
+        missing = [field for field in NODE_FIELDS if field not in columns]
+        if missing:
+            raise ValueError(f"Missing node columns: {missing}")
+        length = len(columns['id'])
+        for field in NODE_FIELDS:
+            column = np.ascontiguousarray(columns[field], dtype=NODE_DTYPES[field])
+            if len(column) != length:
+                raise ValueError(f"Column '{field}' has length {len(column)}, expected {length}")
+            setattr(self, field, column)
+        self._row_of_id = None
+
+    @classmethod
+    def from_records(cls, records):
+        """顧客辞書のリストから作る"""
+        return cls(**{field: [record[field] for record in records] for field in NODE_FIELDS})
+
+    @classmethod
+    def concatenate(cls, parts):
+        """複数のNodeArrays（各LSPのノード）を1つの配列ブロックに結合する"""
+        return cls(**{field: np.concatenate([getattr(part, field) for part in parts]) for field in NODE_FIELDS})
+
+    def to_records(self):
+        """顧客辞書のリストに変換する"""
+        columns = [getattr(self, field).tolist() for field in NODE_FIELDS]
+        return [dict(zip(NODE_FIELDS, values)) for values in zip(*columns)]
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(np.arange(len(self))[key])
+        return NodeView(self, key)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield NodeView(self, row)
+
+    def __getstate__(self):
+        # ID→行の参照表は転送せず、必要になったプロセスで作り直す
+        state = self.__dict__.copy()
+        state['_row_of_id'] = None
+        return state
+
+    @property
+    def coords(self):
+        """座標配列 (N, 2)"""
+        return np.column_stack([self.x, self.y])
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, field).nbytes for field in NODE_FIELDS)
+
+    def _lookup_table(self):
+        # IDは非負の整数なので、ID→行を密な配列で引く（未使用のIDは-1）
+        if self._row_of_id is None:
+            size = int(self.id.max()) + 1 if len(self) else 0
+            row_of_id = np.full(size, -1, dtype=np.int64)
+            row_of_id[self.id] = np.arange(len(self), dtype=np.int64)
+            self._row_of_id = row_of_id
+        return self._row_of_id
+
+    def rows(self, node_ids):
+        """顧客IDの並びを行インデックス配列に変換する（存在しないIDはKeyError）"""
+        node_ids = np.fromiter(node_ids, dtype=np.int64, count=len(node_ids))
+        row_of_id = self._lookup_table()
+        valid = (node_ids >= 0) & (node_ids < len(row_of_id))
+        rows = np.full(len(node_ids), -1, dtype=np.int64)
+        rows[valid] = row_of_id[node_ids[valid]]
+        if (rows < 0).any():
+            raise KeyError(f"Unknown node ids: {node_ids[rows < 0].tolist()}")
+        return rows
+
+    def take(self, rows):
+        """行インデックス配列で取り出した新しいNodeArraysを返す"""
+        return NodeArrays(**{field: getattr(self, field)[rows] for field in NODE_FIELDS})
+
+    def subset(self, node_ids):
+        """
+        指定IDのノードを、元の並び順（IDの指定順ではない）で取り出す
+        従来の [c for c in customers if c['id'] in node_ids] と同じ結果を、走査なしで得る
+        """
+        return self.take(np.sort(self.rows(list(node_ids))))
+
+
+def as_node_arrays(customers):
+    """顧客辞書のリストをNodeArraysに変換する（NodeArraysならそのまま返す）"""
+    if isinstance(customers, NodeArrays):
+        return customers
+    return NodeArrays.from_records(customers)
+
+
+def select_nodes(customers, node_ids):
+    """customers（NodeArraysまたは顧客辞書のリスト）から指定IDのノードを元の並び順で取り出す"""
+    if isinstance(customers, NodeArrays):
+        return customers.subset(node_ids)
+    node_ids = set(node_ids)
+    return [c for c in customers if c['id'] in node_ids]
+
+
+def node_column(customers, field):
+    """customers（NodeArraysまたは顧客辞書のリスト）の1列をPythonのリストとして返す"""
+    if isinstance(customers, NodeArrays):
+        return getattr(customers, field).tolist()
+    return [c[field] for c in customers]
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from node_arrays import node_column
+
+
+# 求解ロジックを変更して過去の結果が使えなくなった場合はこの値を上げる（キーに含まれる）
+CACHE_FORMAT_VERSION = 1
+
+
+class PairSolveCache:
+    """
+    2車両VRPの求解結果をディスクに保存する内容アドレス方式のキャッシュ（SQLite）
+    - キー: 部分問題（ノードデータ、PDペア、デポ、初期ルート、制約フラグ、探索パラメータ）のSHA-256
+    - max_entries を超えたら最終アクセスが古いものから削除する（LRU）
+    - WALモード + ロック待ちタイムアウトで、複数プロセスからの同時アクセスに対応する
+    - プロセスプールへ渡す場合、接続は各プロセスで開き直す
+    """
+
+    def __init__(self, path, max_entries=200000, timeout=30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._connection = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        return state
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS pair_cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS pair_cache_last_access ON pair_cache (last_access)')
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def make_key(customers, initial_routes, PD_pairs, num_vehicles, vehicle_capacity, start_depots, end_depots,
+                 use_capacity, use_time, use_pickup_delivery, isInitPhase, solver_options):
+        """solve_vrp_flexible の引数から部分問題のハッシュキーを作る"""
+        payload = {
+            'version': CACHE_FORMAT_VERSION,
+            'nodes': [list(node) for node in zip(*(node_column(customers, field) for field in
+                                                    ('id', 'x', 'y', 'demand', 'ready', 'due', 'service')))],
+            'initial_routes': initial_routes,
+            'PD_pairs': [list(pair) for pair in PD_pairs],
+            'num_vehicles': num_vehicles,
+            'vehicle_capacity': vehicle_capacity,
+            'start_depots': list(start_depots),
+            'end_depots': list(end_depots),
+            'flags': [use_capacity, use_time, use_pickup_delivery, isInitPhase],
+            'solver_options': sorted((solver_options or {}).items()),
+        }
+        encoded = json.dumps(payload, separators=(',', ':'), default=float).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key):
+        """キャッシュ済みの経路を返す（なければNone）"""
+        connection = self._connect()
+        row = connection.execute('SELECT value FROM pair_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        connection.execute('UPDATE pair_cache SET last_access = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, routes):
+        """求解結果の経路を保存し、必要に応じて古いエントリを削除する"""
+        connection = self._connect()
+        connection.execute('INSERT OR REPLACE INTO pair_cache (key, value, last_access) VALUES (?, ?, ?)',
+                           (key, json.dumps(routes, separators=(',', ':')), time.time()))
+        self._puts_since_evict += 1
+        # 件数の数え上げは重いので、一定回数の書き込みごとにまとめて上限を確認する
+        if self._puts_since_evict >= 64:
+            self.evict()
+
+    def evict(self):
+        """max_entries を超えた分を、最終アクセスが古い順に削除する"""
+        connection = self._connect()
+        self._puts_since_evict = 0
+        (count,) = connection.execute('SELECT COUNT(*) FROM pair_cache').fetchone()
+        if count > self.max_entries:
+            connection.execute(
+                'DELETE FROM pair_cache WHERE key IN '
+                '(SELECT key FROM pair_cache ORDER BY last_access ASC LIMIT ?)',
+                (count - self.max_entries,))
+
+    def stats(self):
+        """このプロセスでのヒット/ミス数と、キャッシュ全体のエントリ数を返す"""
+        (count,) = self._connect().execute('SELECT COUNT(*) FROM pair_cache').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': count}
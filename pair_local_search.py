@@ -0,0 +1,264 @@
+import time
+
+import numpy as np
+
+from node_arrays import NodeArrays, node_column
+
+
+# OR-Tools版と同じく、1車両あたりの総距離の上限（Distanceディメンションの容量）
+MAX_ROUTE_DISTANCE = 10000
+
+
+class PairProblem:
+    """
+    2車両（少数車両）PDPTW部分問題の前計算済み配列
+    - ノードはcustomersの並び順のローカルインデックスで扱う
+    - int_dist: 時間・距離制約の判定用（OR-Toolsと同じ切り捨て整数距離）
+    - cost: 目的関数用（route_costと同じユークリッド距離）
+    """
+
+    def __init__(self, customers, PD_pairs, vehicle_capacity, store=None,
+                 use_capacity=True, use_time=True, use_pickup_delivery=True):
+        self.ids = node_column(customers, 'id')
+        self.id_to_index = {node_id: k for k, node_id in enumerate(self.ids)}
+        if store is not None:
+            rows = store.rows(self.ids)
+            coords = store.coords[rows]
+        elif isinstance(customers, NodeArrays):
+            coords = customers.coords
+        else:
+            coords = np.array([(c['x'], c['y']) for c in customers], dtype=float)
+        diff = coords[:, None, :] - coords[None, :, :]
+        euclid = np.sqrt((diff ** 2).sum(axis=2))
+        self.cost = euclid.tolist()
+        self.int_dist = euclid.astype(np.int64).tolist()
+        self.demand = node_column(customers, 'demand')
+        self.ready = node_column(customers, 'ready')
+        self.due = node_column(customers, 'due')
+        self.service = node_column(customers, 'service')
+        self.vehicle_capacity = vehicle_capacity
+        self.use_capacity = use_capacity
+        self.use_time = use_time
+        self.use_pickup_delivery = use_pickup_delivery
+        self.pairs = []
+        if use_pickup_delivery:
+            for pickup_id, delivery_id in PD_pairs:
+                if pickup_id in self.id_to_index and delivery_id in self.id_to_index:
+                    self.pairs.append((self.id_to_index[pickup_id], self.id_to_index[delivery_id]))
+
+    def route_cost(self, route):
+        cost = self.cost
+        return sum(cost[route[k]][route[k + 1]] for k in range(len(route) - 1))
+
+    def is_feasible(self, route, start=1, time_at=None, load_at=None):
+        """
+        ルート（デポ込みのローカルインデックス列）の容量・時間窓・距離制約を判定する
+        - start, time_at, load_at: 位置start-1までの到着時刻・積載量が既知の場合、そこから先だけを判定する
+        """
+        int_dist = self.int_dist
+        if start <= 1 or time_at is None:
+            start = 1
+            t = self.ready[route[0]]
+            load = 0
+        else:
+            t = time_at[start - 1]
+            load = load_at[start - 1]
+        demand, ready, due, service = self.demand, self.ready, self.due, self.service
+        capacity = self.vehicle_capacity
+        for k in range(start, len(route)):
+            prev, node = route[k - 1], route[k]
+            if self.use_time:
+                t = max(t + int_dist[prev][node] + service[prev], ready[node])
+                if t > due[node]:
+                    return False
+            if self.use_capacity:
+                load += demand[node]
+                if load > capacity or load < 0:
+                    return False
+        if self.use_pickup_delivery:
+            if sum(int_dist[route[k]][route[k + 1]] for k in range(len(route) - 1)) > MAX_ROUTE_DISTANCE:
+                return False
+        return True
+
+    def profile(self, route):
+        """ルートの各位置での到着時刻・積載量（前方累積）を返す"""
+        int_dist = self.int_dist
+        time_at = [self.ready[route[0]]]
+        load_at = [0]
+        for k in range(1, len(route)):
+            prev, node = route[k - 1], route[k]
+            time_at.append(max(time_at[-1] + int_dist[prev][node] + self.service[prev], self.ready[node]))
+            load_at.append(load_at[-1] + self.demand[node])
+        return time_at, load_at
+
+
+def _requests_of(problem, nodes):
+    """ノード列を、PDペア（2ノード）または単独ノード（1ノード）のリクエスト単位にまとめる"""
+    in_pair = {}
+    for pickup, delivery in problem.pairs:
+        in_pair[pickup] = (pickup, delivery)
+        in_pair[delivery] = (pickup, delivery)
+    requests = []
+    seen = set()
+    for node in nodes:
+        request = in_pair.get(node, (node,))
+        if request not in seen:
+            seen.add(request)
+            requests.append(request)
+    return requests
+
+
+def _remove_request(route, request):
+    return [node for node in route if node not in request]
+
+
+def _best_insertion(problem, route, request):
+    """
+    リクエストをルートに最小コスト増で挿入し、(コスト増分, 新ルート) を返す（挿入不可なら (None, None)）
+    コスト増分の小さい順に候補を並べ、最初に実行可能だったものを採用する
+    """
+    cost = problem.cost
+    length = len(route)
+    candidates = []
+    if len(request) == 1:
+        node = request[0]
+        for i in range(1, length):
+            a, b = route[i - 1], route[i]
+            candidates.append((cost[a][node] + cost[node][b] - cost[a][b], i, i))
+    else:
+        pickup, delivery = request
+        for i in range(1, length):
+            a, b = route[i - 1], route[i]
+            # pickupとdeliveryを連続して挿入する場合
+            candidates.append((cost[a][pickup] + cost[pickup][delivery] + cost[delivery][b] - cost[a][b], i, i))
+            pickup_delta = cost[a][pickup] + cost[pickup][b] - cost[a][b]
+            for j in range(i + 1, length):
+                c, d = route[j - 1], route[j]
+                candidates.append((pickup_delta + cost[c][delivery] + cost[delivery][d] - cost[c][d], i, j))
+    if not candidates:
+        return None, None
+    candidates.sort()
+    time_at, load_at = problem.profile(route)
+    for delta, i, j in candidates:
+        if len(request) == 1:
+            new_route = route[:i] + [request[0]] + route[i:]
+        elif i == j:
+            new_route = route[:i] + [request[0], request[1]] + route[i:]
+        else:
+            new_route = route[:i] + [request[0]] + route[i:j] + [request[1]] + route[j:]
+        # 挿入位置より手前の到着時刻・積載量は変わらないので、挿入位置から先だけを判定する
+        if problem.is_feasible(new_route, i, time_at, load_at):
+            return delta, new_route
+    return None, None
+
+
+def _request_owner(routes, request):
+    for v, route in enumerate(routes):
+        if request[0] in route:
+            return v
+    return None
+
+
+def _try_relocate(problem, routes, costs, requests):
+    """リクエストを1つ取り出して最良の位置（同じルートを含む）へ移す改善を探す"""
+    best = None
+    for request in requests:
+        owner = _request_owner(routes, request)
+        removed = _remove_request(routes[owner], request)
+        if not problem.is_feasible(removed):
+            continue
+        removed_cost = problem.route_cost(removed)
+        for target in range(len(routes)):
+            base = removed if target == owner else routes[target]
+            base_cost = removed_cost if target == owner else costs[target]
+            delta, new_route = _best_insertion(problem, base, request)
+            if new_route is None:
+                continue
+            if target == owner:
+                gain = costs[owner] - (base_cost + delta)
+                changes = {owner: new_route}
+            else:
+                gain = costs[owner] + costs[target] - (removed_cost + base_cost + delta)
+                changes = {owner: removed, target: new_route}
+            if gain > 1e-9 and (best is None or gain > best[0]):
+                best = (gain, changes)
+    return best
+
+
+def _try_exchange(problem, routes, costs, requests):
+    """異なるルートのリクエスト同士を入れ替える改善を探す"""
+    best = None
+    owners = {request: _request_owner(routes, request) for request in requests}
+    for a in range(len(requests)):
+        for b in range(a + 1, len(requests)):
+            request_a, request_b = requests[a], requests[b]
+            owner_a, owner_b = owners[request_a], owners[request_b]
+            if owner_a == owner_b:
+                continue
+            removed_a = _remove_request(routes[owner_a], request_a)
+            removed_b = _remove_request(routes[owner_b], request_b)
+            delta_a, new_a = _best_insertion(problem, removed_a, request_b)
+            if new_a is None:
+                continue
+            delta_b, new_b = _best_insertion(problem, removed_b, request_a)
+            if new_b is None:
+                continue
+            gain = (costs[owner_a] + costs[owner_b]) - (problem.route_cost(new_a) + problem.route_cost(new_b))
+            if gain > 1e-9 and (best is None or gain > best[0]):
+                best = (gain, {owner_a: new_a, owner_b: new_b})
+    return best
+
+
+def solve_pair_local_search(customers, initial_routes, PD_pairs, num_vehicles, vehicle_capacity, start_depots, end_depots,
+                            use_capacity: bool, use_time: bool, use_pickup_delivery: bool, isInitPhase: bool, store=None,
+                            time_limit=None, solution_limit=None, callback_mode=None):
+    """
+    PDリクエスト単位のrelocate/exchange局所探索で(部分)VRPを改善する軽量ソルバー
+    - 引数・戻り値は solve_vrp_flexible と同じ（各車両のデポ込みルート、解が得られなければNone）
+    - initial_routes（デポ抜きのID列）から出発し、容量・時間窓・pickup→deliveryの順序を保ったまま改善する
+    - initial_routesがNoneの場合は空ルートへの最良挿入で初期解を作る
+    - solution_limit: 採用する改善手の数の上限
+    - callback_mode: solve_vrp_flexible との互換のために受け付けるだけで使用しない
+    """
+    start_time = time.perf_counter()
+    problem = PairProblem(customers, PD_pairs, vehicle_capacity, store,
+                          use_capacity=use_capacity, use_time=use_time, use_pickup_delivery=use_pickup_delivery)
+    to_index = problem.id_to_index
+    starts = [to_index[depot_id] for depot_id in start_depots]
+    ends = [to_index[depot_id] for depot_id in end_depots]
+
+    if initial_routes is not None:
+        routes = [[starts[v]] + [to_index[n] for n in initial_routes[v]] + [ends[v]] for v in range(num_vehicles)]
+    else:
+        # 初期解：全リクエストを順に最良挿入
+        routes = [[starts[v], ends[v]] for v in range(num_vehicles)]
+        depots = set(starts) | set(ends)
+        for request in _requests_of(problem, [k for k in range(len(problem.ids)) if k not in depots]):
+            best = None
+            for v in range(num_vehicles):
+                delta, new_route = _best_insertion(problem, routes[v], request)
+                if new_route is not None and (best is None or delta < best[0]):
+                    best = (delta, v, new_route)
+            if best is None:
+                return None
+            routes[best[1]] = best[2]
+
+    costs = [problem.route_cost(route) for route in routes]
+    requests = _requests_of(problem, [node for route in routes for node in route[1:-1]])
+    num_improvements = 0
+    while True:
+        if time_limit is not None and time.perf_counter() - start_time >= time_limit:
+            break
+        if solution_limit is not None and num_improvements >= solution_limit:
+            break
+        move = _try_relocate(problem, routes, costs, requests)
+        if move is None:
+            move = _try_exchange(problem, routes, costs, requests)
+        if move is None:
+            break
+        for v, new_route in move[1].items():
+            routes[v] = new_route
+            costs[v] = problem.route_cost(new_route)
+        num_improvements += 1
+
+    return [[problem.ids[k] for k in route] for route in routes]
@@ -0,0 +1,98 @@
+"""
+2車両ペアの部分問題を、プロセス・マシンをまたいで受け渡せる自己完結したタスク（JSON）として表すプロトコル
+
+タスク（make_pair_task）:
+    {'version', 'task_id', 'pair': [i, j], 'nodes': {列名: 値のリスト}（部分問題のノードのみ）,
+     'PD_pairs': [[pickup, delivery], ...], 'num_vehicles': 2, 'vehicle_capacity',
+     'start_depots', 'end_depots', 'initial_routes'（デポを除く経路）, 'solver_options'（'engine' を含む）}
+結果（solve_pair_task）:
+    {'version', 'task_id', 'routes'（デポ込みの新しい経路、解なしならNone）, 'comparison', 'solve_time', 'worker'}
+    求解中に例外が起きた場合は 'routes' の代わりに 'error'（トレースバック）を返す
+
+- 全体のノード配列・距離行列はタスクに含めず、ワーカー側で部分問題のノードだけから距離行列を作る
+  （InstanceStore と同じ整数化した距離なので、求解結果は同じプロセス内で解いた場合と一致する）
+- アクションの構築（コスト比較・経路の丸ごと交換）はタスクを投げた側で gat.pair_actions により行う
+"""
+import json
+import os
+import socket
+import time
+import traceback
+
+import numpy as np
+
+from gat import solve_pair_subproblem
+from instance_store import InstanceStore
+from node_arrays import as_node_arrays, NodeArrays, NODE_FIELDS
+
+# タスク・結果の形式を変更した場合はこの値を上げる（異なる版のワーカーのタスクは解かない）
+TASK_FORMAT_VERSION = 1
+
+
+def make_pair_task(task_id, pair, solve_args, solver_options=None):
+    """
+    gat.pair_subproblem() で作ったペア(i, j)の2車両VRPの引数をタスクの辞書にする
+    - solver_options: 'engine' と探索制限（'time_limit' は締め切りで切り詰めた値を渡す）
+    """
+    sub_customers, initial_routes, PD_pairs, num_vehicles, capacity, start_depots, end_depots = solve_args
+    nodes = as_node_arrays(sub_customers)
+    return {
+        'version': TASK_FORMAT_VERSION,
+        'task_id': task_id,
+        'pair': [int(pair[0]), int(pair[1])],
+        'nodes': {field: getattr(nodes, field).tolist() for field in NODE_FIELDS},
+        'PD_pairs': [[int(p), int(d)] for p, d in PD_pairs],
+        'num_vehicles': num_vehicles,
+        'vehicle_capacity': capacity,
+        'start_depots': [int(depot) for depot in start_depots],
+        'end_depots': [int(depot) for depot in end_depots],
+        'initial_routes': [[int(node) for node in route] for route in initial_routes],
+        'solver_options': dict(solver_options or {}),
+    }
+
+
+def solve_pair_task(task, worker=None):
+    """タスクを解いて結果の辞書を返す（ワーカー側で呼ぶ。例外は 'error' として結果に載せる）"""
+    result = {'version': TASK_FORMAT_VERSION, 'task_id': task['task_id'], 'worker': worker or default_worker_id()}
+    start_time = time.perf_counter()
+    try:
+        if task.get('version') != TASK_FORMAT_VERSION:
+            raise ValueError(f"Unsupported task format version: {task.get('version')}")
+        nodes = NodeArrays(**task['nodes'])
+        solve_args = (nodes, task['initial_routes'], [tuple(pair) for pair in task['PD_pairs']], task['num_vehicles'],
+                      task['vehicle_capacity'], task['start_depots'], task['end_depots'])
+        solver_options = dict(task['solver_options'])
+        engine = solver_options.pop('engine', 'ortools')
+        routes, comparison = solve_pair_subproblem(solve_args, engine, InstanceStore(nodes), **solver_options)
+        result['routes'] = _plain_routes(routes)
+        result['comparison'] = comparison
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['solve_time'] = time.perf_counter() - start_time
+    return result
+
+
+def _plain_routes(routes):
+    # NumPyの整数などをJSONで書けるPythonの値にそろえる
+    if routes is None:
+        return None
+    return [[int(node) for node in route] for route in routes]
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def encode(message):
+    """タスク・結果の辞書をJSONのバイト列にする"""
+    return json.dumps(message, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def decode(data):
+    return json.loads(data)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
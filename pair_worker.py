@@ -0,0 +1,429 @@
+"""
+共有ディレクトリ（スプール）を介して2車両ペアのタスク（pair_tasks）を解くワーカーと、GATの1ラウンドを配るコーディネーター
+
+使い方:
+    # 各マシンでワーカーを起動する（スプールは全マシンから見える共有ディレクトリ、例: NFS）
+    python pair_worker.py /shared/gat_spool
+    python pair_worker.py /shared/gat_spool --idle-exit 600
+
+    # main.py の PAIR_SPOOL_DIR にスプールを指定すると、ペア求解をスプール経由で配る
+    # （PAIR_SPOOL_LOCAL_WORKERS 個のワーカーは同じマシンで起動する。0ならリモートのワーカーだけを使う）
+
+スプールの構成:
+    tasks/<task_id>.json             : 未着手のタスク（コーディネーターが一時ファイルから名前を変更して置く）
+    leased/<ファイル名>@<ワーカー>    : ワーカーが名前の変更（アトミック）で取得したタスク。更新時刻をハートビートとして定期的に更新する
+    results/<task_id>.json           : 結果（ワーカーが一時ファイルから名前を変更して置く）
+
+- リトライ: 求解中の例外・リース切れ（ワーカーの停止）のタスクは tasks/ に戻し、max_attempts 回まで解き直す
+- ストラグラー: 未着手のタスクがなくなった後、完了済みタスクの求解時間の中央値の straggler_factor 倍を超えて
+  終わらないタスクは複製して別のワーカーにも解かせ、先に届いた結果を使う。求解を始めてからの時間は、
+  コーディネーターがリースを最初に見つけた時刻から測る（ハートビートで更新時刻が変わるため、更新時刻からは測れない）
+- 解けなかったペアは締め切りでスキップしたペアと同じく 'skipped' とし、次のラウンドで再計算する
+- リース切れの判定はファイルの更新時刻（最後のハートビート）で行うため、複数マシンで使う場合は時刻を同期（NTPなど）しておく
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from gat import pair_subproblem, pair_actions, PAIR_SOLVE_FLAGS
+from pair_tasks import make_pair_task, solve_pair_task, default_worker_id, encode, decode
+from profiler import profiler
+
+
+class Spool:
+    """タスク・リース・結果を置く共有ディレクトリ"""
+
+    def __init__(self, root):
+        self.root = root
+        self.tasks_dir = os.path.join(root, 'tasks')
+        self.leased_dir = os.path.join(root, 'leased')
+        self.results_dir = os.path.join(root, 'results')
+        for directory in (self.tasks_dir, self.leased_dir, self.results_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def _write(self, directory, name, message):
+        # 一時ファイルに書いてから名前を変更し、書きかけのファイルを他のプロセスに見せない
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(encode(message))
+            os.replace(tmp_path, os.path.join(directory, name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _read(path):
+        with open(path, 'rb') as f:
+            return decode(f.read())
+
+    @staticmethod
+    def _listdir(directory):
+        return sorted(name for name in os.listdir(directory) if not name.startswith('.tmp-'))
+
+    def put_task(self, name, task):
+        self._write(self.tasks_dir, name, task)
+
+    def claim(self, worker_token):
+        """未着手のタスクを1つ取得し、(リースのパス, タスク) を返す（なければNone）"""
+        for name in self._listdir(self.tasks_dir):
+            lease_path = os.path.join(self.leased_dir, f"{name}@{worker_token}")
+            try:
+                os.rename(os.path.join(self.tasks_dir, name), lease_path)
+            except FileNotFoundError:
+                continue  # 別のワーカーが先に取得した
+            # 名前の変更では更新時刻が変わらないため、取得時刻をリースの開始時刻として記録する
+            os.utime(lease_path)
+            try:
+                return lease_path, self._read(lease_path)
+            except (OSError, ValueError):
+                # コーディネーターに回収された、または壊れたタスクは飛ばす
+                _remove(lease_path)
+        return None
+
+    def complete(self, lease_path, result):
+        self._write(self.results_dir, f"{result['task_id']}.json", result)
+        _remove(lease_path)
+
+    def leases(self):
+        """取得済みタスクの (リースのファイル名, タスクのファイル名, 最後のハートビートからの経過時間[秒]) のリスト"""
+        now = time.time()
+        leases = []
+        for name in self._listdir(self.leased_dir):
+            try:
+                age = now - os.stat(os.path.join(self.leased_dir, name)).st_mtime
+            except FileNotFoundError:
+                continue
+            leases.append((name, name.rsplit('@', 1)[0], age))
+        return leases
+
+    def requeue(self, lease_name):
+        """リース切れのタスクを未着手に戻す（ワーカーが先に終えていればFalse）"""
+        try:
+            os.rename(os.path.join(self.leased_dir, lease_name), os.path.join(self.tasks_dir, lease_name.rsplit('@', 1)[0]))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _Heartbeat:
+    """求解中にリースの更新時刻を定期的に更新するスレッド"""
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                return  # コーディネーターに回収された
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_worker(spool_dir, worker_id=None, poll_interval=0.05, heartbeat_interval=2.0, idle_exit=None, max_tasks=None):
+    """
+    スプールからタスクを取得して解き、結果を書き戻すループ
+    - idle_exit: タスクのない状態がこの秒数続いたら終了する（Noneなら終了しない）
+    - max_tasks: 解くタスク数の上限（Noneなら無制限）
+    戻り値: 解いたタスク数
+    """
+    spool = Spool(spool_dir)
+    worker_id = worker_id or default_worker_id()
+    worker_token = ''.join(ch if ch.isalnum() or ch in '-_.' else '-' for ch in worker_id)
+    solved = 0
+    idle_since = time.time()
+    while max_tasks is None or solved < max_tasks:
+        claimed = spool.claim(worker_token)
+        if claimed is None:
+            if idle_exit is not None and time.time() - idle_since >= idle_exit:
+                break
+            time.sleep(poll_interval)
+            continue
+        lease_path, task = claimed
+        with _Heartbeat(lease_path, heartbeat_interval):
+            result = solve_pair_task(task, worker_id)
+        spool.complete(lease_path, result)
+        solved += 1
+        idle_since = time.time()
+    return solved
+
+
+class SpoolPairPool:
+    """
+    GATの1ラウンドのペア求解をスプール経由でワーカーに配るコーディネーター
+    - GATEngine / perform_gat_exchange の pool に渡すと、evaluate_pair_tasks がこちらを使う
+    - local_workers: 同じマシンで起動するワーカープロセス数（リモートのワーカーの代わりにもなる）
+    - lease_timeout: ハートビートが途絶えてからワーカーの停止とみなすまでの時間[秒]
+                     （ワーカーの heartbeat_interval より十分長くする）
+    - max_attempts: 1ペアを解く試行回数の上限（例外・ワーカーの停止のたびに1回数える）
+    - straggler_factor / min_straggler_time: ストラグラーとみなす求解時間（中央値の倍率 / 下限[秒]）
+    - result_timeout: 締め切りがないラウンドで、結果を待つ時間の上限[秒]（Noneなら無制限）
+    """
+
+    def __init__(self, spool_dir, local_workers=0, lease_timeout=30.0, max_attempts=3, straggler_factor=4.0,
+                 min_straggler_time=1.0, poll_interval=0.02, result_timeout=None):
+        self.spool = Spool(spool_dir)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.straggler_factor = straggler_factor
+        self.min_straggler_time = min_straggler_time
+        self.poll_interval = poll_interval
+        self.result_timeout = result_timeout
+        self.workers = []
+        # 同じスプールを複数のコーディネーターで共有できるよう、タスクIDにコーディネーターごとの接頭辞を付ける
+        self.coordinator_id = uuid.uuid4().hex[:8]
+        self._batches = 0
+        self.stats = {'tasks': 0, 'retries': 0, 'lost_leases': 0, 'stragglers': 0, 'failed': 0}
+        if local_workers:
+            self.start_local_workers(local_workers)
+
+    def start_local_workers(self, count):
+        """同じマシンでワーカープロセスを起動する"""
+        script = os.path.abspath(__file__)
+        for _ in range(count):
+            worker_id = f"local-{os.getpid()}-{len(self.workers)}"
+            self.workers.append(subprocess.Popen([sys.executable, script, self.spool.root, '--worker-id', worker_id]))
+
+    def shutdown(self, wait=True):
+        for worker in self.workers:
+            worker.terminate()
+        if wait:
+            for worker in self.workers:
+                worker.wait()
+        self.workers = []
+        # 停止したワーカーのリースなど、このコーディネーターのファイルを片付ける
+        for directory in (self.spool.tasks_dir, self.spool.leased_dir, self.spool.results_dir):
+            for name in self.spool._listdir(directory):
+                if name.startswith(self.coordinator_id):
+                    _remove(os.path.join(directory, name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        return False
+
+    def evaluate_pair_tasks(self, pair_tasks, customers, vehicle_capacity, store=None, solver_options=None, deadline=None,
+                            cache=None, stop=None):
+        """
+        ペアタスク (i, j, route_i, route_j, PD_pairs_of_2vehicle) を配って解き、タスク順にペア評価結果のリストを返す
+        - stop: 打ち切りの合図（is_set() を持つEvent）。セットされると未配布のペアは配らず、結果待ちのペアもスキップとして返す
+        """
+        solver_options = dict(solver_options or {})
+        engine = solver_options.get('engine', 'ortools')
+        self._batches += 1
+        batch = f"{self.coordinator_id}-{self._batches:05d}"
+        self._discard_stale(batch)
+        results = [None] * len(pair_tasks)
+        pending = {}  # タスクのファイル名 → 配布中のタスクの情報
+        for k, (i, j, route_i, route_j, PD_pairs_of_2vehicle) in enumerate(pair_tasks):
+            solve_args = pair_subproblem(route_i, route_j, PD_pairs_of_2vehicle, customers, vehicle_capacity)
+            cache_key = None
+            cache_hit = None
+            if cache is not None and engine != 'compare':
+                options = {key: value for key, value in solver_options.items() if key != 'engine'}
+                cache_key = cache.make_key(*solve_args, **PAIR_SOLVE_FLAGS, solver_options=dict(options, engine=engine))
+                cached_routes = cache.get(cache_key)
+                cache_hit = cached_routes is not None
+                profiler.count('pair_cache.hits' if cache_hit else 'pair_cache.misses')
+                if cache_hit:
+                    results[k] = {'actions': pair_actions(i, j, route_i, route_j, cached_routes, customers, store),
+                                  'solve_time': 0.0, 'comparison': None, 'cache_hit': True}
+                    continue
+            task_options = dict(solver_options)
+            truncated = False
+            if stop is not None and stop.is_set():
+                results[k] = {'actions': [], 'solve_time': 0.0, 'skipped': True, 'cache_hit': cache_hit}
+                continue
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    results[k] = {'actions': [], 'solve_time': 0.0, 'skipped': True, 'cache_hit': cache_hit}
+                    continue
+                if task_options.get('time_limit') is None or task_options['time_limit'] > remaining:
+                    task_options['time_limit'] = remaining
+                    truncated = True
+            task_id = f"{batch}-{k:06d}"
+            task = make_pair_task(task_id, (i, j), solve_args, task_options)
+            name = f"{task_id}.json"
+            self.spool.put_task(name, task)
+            pending[name] = {'index': k, 'task': task, 'attempts': 1, 'duplicated': False,
+                             'cache_key': None if truncated else cache_key, 'cache_hit': cache_hit}
+        self.stats['tasks'] += len(pending)
+
+        self._collect(pending, results, pair_tasks, customers, store, cache, deadline, stop)
+        self._discard_batch(batch)
+        return results
+
+    def _collect(self, pending, results, pair_tasks, customers, store, cache, deadline, stop=None):
+        solve_times = []
+        # リースのファイル名 → コーディネーターが最初に見つけた時刻（求解を始めてからの時間の基準）
+        lease_started = {}
+        by_task_id = {info['task']['task_id']: name for name, info in pending.items()}
+        wait_until = None
+        if deadline is not None:
+            wait_until = deadline + self.lease_timeout
+        elif self.result_timeout is not None:
+            wait_until = time.time() + self.result_timeout
+        while pending:
+            progressed = False
+            for result_name in self.spool._listdir(self.spool.results_dir):
+                task_id = result_name[:-len('.json')]
+                name = by_task_id.get(task_id)
+                if name is None or name not in pending:
+                    continue
+                result_path = os.path.join(self.spool.results_dir, result_name)
+                try:
+                    result = self.spool._read(result_path)
+                except (OSError, ValueError):
+                    continue
+                _remove(result_path)
+                progressed = True
+                info = pending[name]
+                if 'error' in result:
+                    self._retry(name, info, pending, results, result['error'].strip().splitlines()[-1])
+                    continue
+                del pending[name]
+                _remove(os.path.join(self.spool.tasks_dir, f"{task_id}~dup.json"))
+                solve_times.append(result['solve_time'])
+                results[info['index']] = self._pair_result(info, result, pair_tasks, customers, store, cache)
+            if not pending:
+                break
+
+            if stop is not None and stop.is_set():
+                # 打ち切り時は結果を待たずにスキップとする（キューに残ったタスクはこの後片付け、遅れて届いた結果は次のバッチの開始時に捨てる）
+                for name, info in list(pending.items()):
+                    self._fail(name, info, pending, results, 'stopped', skipped_only=True)
+                break
+            self._check_leases(pending, results, solve_times, lease_started)
+            if wait_until is not None and time.time() >= wait_until:
+                # 締め切り（と猶予）を過ぎても返らないペアはスキップとし、次のラウンドで再計算する
+                for name, info in list(pending.items()):
+                    self._fail(name, info, pending, results, 'timeout', skipped_only=True)
+                break
+            if not progressed:
+                time.sleep(self.poll_interval)
+
+    def _check_leases(self, pending, results, solve_times, lease_started):
+        leases = self.spool.leases()
+        now = time.time()
+        # 消えたリース（完了・回収済み）の記録は捨てる（同じワーカーが同じタスクを取り直した場合に測り直すため）
+        current = {lease_name for lease_name, _, _ in leases}
+        for lease_name in list(lease_started):
+            if lease_name not in current:
+                del lease_started[lease_name]
+        pending_in_queue = any(name in pending for name in self.spool._listdir(self.spool.tasks_dir))
+        straggler_time = None
+        if solve_times and not pending_in_queue:
+            straggler_time = max(self.min_straggler_time, self.straggler_factor * statistics.median(solve_times))
+        for lease_name, task_name, heartbeat_age in leases:
+            base_name = task_name.split('~', 1)[0] + '.json' if '~' in task_name else task_name
+            info = pending.get(base_name)
+            if info is None:
+                continue
+            running_time = now - lease_started.setdefault(lease_name, now)
+            if heartbeat_age > self.lease_timeout:
+                # ハートビートが途絶えた：ワーカーが停止したとみなして解き直す
+                lease_started.pop(lease_name, None)
+                if self.spool.requeue(lease_name):
+                    self.stats['lost_leases'] += 1
+                    profiler.count('spool.lost_leases')
+                    info['attempts'] += 1
+                    if info['attempts'] > self.max_attempts:
+                        _remove(os.path.join(self.spool.tasks_dir, task_name))
+                        self._fail(base_name, info, pending, results, 'worker lost')
+            elif straggler_time is not None and running_time > straggler_time and not info['duplicated']:
+                # 他のワーカーが空いているので、同じタスクを複製して先に終わった方の結果を使う
+                info['duplicated'] = True
+                self.stats['stragglers'] += 1
+                profiler.count('spool.stragglers')
+                self.spool.put_task(f"{base_name[:-len('.json')]}~dup.json", info['task'])
+
+    def _retry(self, name, info, pending, results, error):
+        info['attempts'] += 1
+        if info['attempts'] > self.max_attempts:
+            self._fail(name, info, pending, results, error)
+            return
+        self.stats['retries'] += 1
+        profiler.count('spool.retries')
+        self.spool.put_task(name, info['task'])
+
+    def _fail(self, name, info, pending, results, error, skipped_only=False):
+        del pending[name]
+        if not skipped_only:
+            self.stats['failed'] += 1
+            i, j = info['task']['pair']
+            print(f"ペア ({i}, {j}) を {info['attempts'] - 1} 回試行しても解けませんでした（{error}）。次のラウンドで再計算します")
+        results[info['index']] = {'actions': [], 'solve_time': 0.0, 'skipped': True, 'cache_hit': info['cache_hit'],
+                                  'error': error}
+
+    @staticmethod
+    def _pair_result(info, result, pair_tasks, customers, store, cache):
+        i, j, route_i, route_j, _ = pair_tasks[info['index']]
+        routes = result['routes']
+        actions = []
+        if routes is not None:
+            actions = pair_actions(i, j, route_i, route_j, routes, customers, store)
+            # 解なし（None）と締め切りで制限時間を切り詰めた結果はキャッシュしない（evaluate_vehicle_pair と同じ）
+            if info['cache_key'] is not None:
+                cache.put(info['cache_key'], routes)
+        return {'actions': actions, 'solve_time': result['solve_time'], 'comparison': result.get('comparison'),
+                'cache_hit': info['cache_hit'], 'worker': result.get('worker')}
+
+    def _discard_stale(self, batch):
+        # 前のラウンドで複製したタスクなど、遅れて届いた結果と残ったリースを捨てる
+        for directory in (self.spool.results_dir, self.spool.leased_dir):
+            for name in self.spool._listdir(directory):
+                if name.startswith(self.coordinator_id) and not name.startswith(batch):
+                    _remove(os.path.join(directory, name))
+
+    def _discard_batch(self, batch):
+        # 解かれずに残った複製タスクを片付ける（取得済みの複製はワーカーが解き終えた時点で結果が捨てられる）
+        for name in self.spool._listdir(self.spool.tasks_dir):
+            if name.startswith(batch):
+                _remove(os.path.join(self.spool.tasks_dir, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('spool_dir', help='スプール（共有ディレクトリ）')
+    parser.add_argument('--worker-id', default=None, help='ワーカー名（既定: ホスト名:PID）')
+    parser.add_argument('--poll-interval', type=float, default=0.05, help='タスクがないときの確認間隔[秒]')
+    parser.add_argument('--heartbeat-interval', type=float, default=2.0, help='リースの更新間隔[秒]')
+    parser.add_argument('--idle-exit', type=float, default=None, help='タスクのない状態がこの秒数続いたら終了する')
+    args = parser.parse_args()
+    try:
+        run_worker(args.spool_dir, args.worker_id, args.poll_interval, args.heartbeat_interval, args.idle_exit)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
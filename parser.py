@@ -1,59 +1,117 @@
+from node_arrays import NodeArrays, NODE_FIELDS
+from profiler import profiler
+import numpy as np
+
+
+def read_lilim200(filepath):
+    """
+    Li & Lim形式のデータファイルを読み込み、オフセットなしのノード配列とヘッダ情報を返す
+    - 戻り値: (NodeArrays, 車両数, 車両容量)
+    """
+    with profiler.span('parse.read_file', file=filepath):
+        with open(filepath, 'r') as f:
+            lines = f.readlines()
+
+        # 1行目から車両数・容量を読み取る
+        header_parts = lines[0].strip().split()
+        num_vehicles = int(header_parts[0])
+        vehicle_capacity = int(header_parts[1])
+
+        # 2行目以降のノード情報を1つの表にまとめる
+        rows = [parts[:9] for parts in (line.split() for line in lines[1:]) if len(parts) >= 9]
+        table = np.array(rows, dtype=np.float64).reshape(-1, 9)
+        nodes = NodeArrays(**{field: table[:, k] for k, field in enumerate(NODE_FIELDS)})
+    return nodes, num_vehicles, vehicle_capacity
+
+
+def offset_nodes(nodes, x_offset=0, y_offset=0, id_offset=0, time_offset=0):
+    """ノード配列のID・座標・時間窓を列ごとにずらした新しいNodeArraysを返す（pickup/deliveryの0は「なし」のまま）"""
+    return NodeArrays(
+        id=nodes.id + id_offset,
+        x=nodes.x + x_offset,
+        y=nodes.y + y_offset,
+        demand=nodes.demand,
+        ready=nodes.ready + time_offset,
+        due=nodes.due + time_offset,
+        service=nodes.service,
+        pickup_index=np.where(nodes.pickup_index > 0, nodes.pickup_index + id_offset, nodes.pickup_index),
+        delivery_index=np.where(nodes.delivery_index > 0, nodes.delivery_index + id_offset, nodes.delivery_index),
+    )
+
+
+def pickup_delivery_pairs(nodes):
+    """ノード配列から pickup → delivery の辞書を作る"""
+    is_pickup = (nodes.demand > 0) & (nodes.delivery_index > 0)
+    return dict(zip(nodes.id[is_pickup].tolist(), nodes.delivery_index[is_pickup].tolist()))
+
+
 def parse_lilim200(filepath, x_offset=0, y_offset=0, id_offset=0, time_offset=0):
-    customers = []
-    P_to_D = {}
-
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-
-    # 1行目から車両数・容量を読み取る
-    header_parts = lines[0].strip().split()
-    num_vehicles = int(header_parts[0])
-    vehicle_capacity = int(header_parts[1])
-
-    # 2行目以降のノード情報を処理
-    for line in lines[1:]:
-        parts = line.strip().split()
-        if len(parts) < 9:
-            continue
-
-        cust_id = int(parts[0]) + id_offset
-        x = float(parts[1]) + x_offset
-        y = float(parts[2]) + y_offset
-        demand = int(parts[3])
-        ready = int(parts[4]) + time_offset
-        due = int(parts[5]) + time_offset
-        service = int(parts[6])
-        if int(parts[7]) > 0:
-            pickup_index = int(parts[7]) + id_offset
-        else:
-            pickup_index = int(parts[7])
-        if int(parts[8]) > 0:
-            delivery_index = int(parts[8]) + id_offset
-        else:
-            delivery_index = int(parts[8])
-
-        node = {
-            'id': cust_id,
-            'x': x,
-            'y': y,
-            'demand': demand,
-            'ready': ready,
-            'due': due,
-            'service': service,
-            'pickup_index': pickup_index,
-            'delivery_index': delivery_index
-        }
-
-        customers.append(node)
-
-        if demand > 0 and delivery_index > 0:
-            P_to_D[cust_id] = delivery_index
+    """
+    Li & Lim形式のデータファイルをパースする
+    - customers: ノード（デポ・顧客）の列指向配列 NodeArrays
+    - PD_pairs: pickup → delivery の辞書
+    """
+    nodes, num_vehicles, vehicle_capacity = read_lilim200(filepath)
+    return build_lsp_data(nodes, num_vehicles, vehicle_capacity, x_offset, y_offset, id_offset, time_offset)
+
 
+def build_lsp_data(nodes, num_vehicles, vehicle_capacity, x_offset=0, y_offset=0, id_offset=0, time_offset=0):
+    """オフセットなしのノード配列にオフセットを加え、parse_lilim200と同じ形式の辞書を作る"""
+    customers = offset_nodes(nodes, x_offset, y_offset, id_offset, time_offset)
     return {
         'customers': customers,
-        'PD_pairs': P_to_D,
+        'PD_pairs': pickup_delivery_pairs(customers),
+        'num_vehicles': num_vehicles,
+        'vehicle_capacity': vehicle_capacity,
+        'depot_id': int(customers.id[0]),
+        'depot_coord': (float(customers.x[0]), float(customers.y[0]))
+    }
+
+
+def load_instances(file_paths, offsets, parse=parse_lilim200):
+    """
+    複数LSPのデータファイルをパースし、IDが重ならないようにずらして1つのインスタンスに結合する
+    - file_paths: 各LSPのデータファイル
+    - offsets: 各LSPの座標オフセット (x, y)
+    - parse: 1ファイル分のパース関数（parse_lilim200と同じ引数・戻り値。instance_cacheが前処理済みの配列を使う場合に差し替える）
+    各LSPのノードは1つの NodeArrays に結合される
+    """
+    customer_blocks = []
+    all_PD_pairs = {}
+    depot_id_list = []
+    depot_coords = []
+    vehicle_num_list = []
+    num_vehicles = 0
+    vehicle_capacity = None
+
+    id_offset = 0  # 初期IDオフセット
+    with profiler.span('parse.load_instances', files=len(file_paths)):
+        for path, offset in zip(file_paths, offsets):
+            data = parse(path, x_offset=offset[0], y_offset=offset[1], id_offset=id_offset)
+
+            # データ蓄積
+            customer_blocks.append(data['customers'])
+            all_PD_pairs.update(data['PD_pairs'])
+            depot_id_list.append(data['depot_id'])
+            depot_coords.append(data['depot_coord'])
+            vehicle_num_list.append(data['num_vehicles'])
+            num_vehicles += data['num_vehicles']
+
+            # IDオフセットを次に備えて更新
+            max_id = int(data['customers'].id.max())
+            id_offset = max_id + 1
+
+            # 車両容量の情報を保存（全ファイルで同じ前提）
+            if vehicle_capacity is None:
+                vehicle_capacity = data['vehicle_capacity']
+
+    return {
+        'customers': NodeArrays.concatenate(customer_blocks),
+        'PD_pairs': all_PD_pairs,
+        'num_lsps': len(file_paths),
+        'depot_id_list': depot_id_list,
+        'depot_coords': depot_coords,
+        'vehicle_num_list': vehicle_num_list,
         'num_vehicles': num_vehicles,
         'vehicle_capacity': vehicle_capacity,
-        'depot_id': customers[0]['id'],
-        'depot_coord': (customers[0]['x'], customers[0]['y'])
     }
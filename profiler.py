@@ -0,0 +1,234 @@
+"""
+GATパイプラインの計測（タイマー・カウンタ・ラウンド/ペアごとの記録）
+
+使い方:
+    from profiler import profiler
+    with profiler.span('pair.evaluate', i=i, j=j) as span:
+        ...
+        span.annotate(outcome='improved')
+    profiler.count('pairs.cache_hit')
+    profiler.record('pair', i=i, j=j, solve_time=...)
+
+- 無効時（既定）は span() が共有のダミーを返すだけなので、計測箇所のオーバーヘッドは属性の参照1回程度
+- 有効時は区間ごとに 名前別の集計（回数・合計・最大）/ 入れ子の呼び出し経路別の自己時間 / Chromeトレース形式のイベント を記録する
+- ワーカープロセスの計測結果は drain() で取り出して親プロセスへ返し、merge() で統合する
+- 出力: export_json()（集計と記録）/ export_chrome_trace()（chrome://tracing, Perfetto, speedscope）
+        / export_folded()（flamegraph.pl 用の折りたたみスタック形式）
+"""
+import json
+import os
+import threading
+import time
+
+
+class _NullSpan:
+    """計測無効時に span() が返す何もしない区間"""
+
+    __slots__ = ()
+    args = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def annotate(self, **kwargs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'args', 'start', 'child_time', 'path')
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.child_time = 0.0
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.path = f"{stack[-1].path};{self.name}" if stack else self.name
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        stack = self.profiler._stack()
+        stack.pop()
+        duration = end - self.start
+        if stack:
+            stack[-1].child_time += duration
+        if exc_info[0] is not None:
+            self.args['error'] = exc_info[0].__name__
+        self.profiler._finish_span(self, duration, duration - self.child_time)
+        return False
+
+    def annotate(self, **kwargs):
+        """区間に付加情報（求解ステータスなど）を追加する"""
+        self.args.update(kwargs)
+
+
+class Profiler:
+    """
+    区間の時間・カウンタ・任意の記録をまとめて保持する計測器（通常はモジュールの profiler を使う）
+    - timers: 区間名 → {'count', 'total', 'max'}（秒）
+    - stacks: 入れ子の呼び出し経路（'a;b;c'）→ 自己時間（秒）
+    - counters: カウンタ名 → 値
+    - records: 種類（'round', 'pair' など）→ 辞書のリスト
+    - events: Chromeトレース形式の完了イベント（'ph': 'X'）
+    """
+
+    def __init__(self, enabled=False):
+        self._local = threading.local()
+        self.reset(enabled)
+
+    def reset(self, enabled=None):
+        """記録を消去する（enabledを指定すると有効/無効も切り替える）"""
+        if enabled is not None:
+            self.enabled = enabled
+        self.timers = {}
+        self.stacks = {}
+        self.counters = {}
+        self.records = {}
+        self.events = []
+        self.origin = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **args):
+        """計測区間（with文で使う）。無効時は何もしない共有のダミーを返す"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def _finish_span(self, span, duration, self_time):
+        timer = self.timers.get(span.name)
+        if timer is None:
+            timer = self.timers[span.name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+        timer['count'] += 1
+        timer['total'] += duration
+        timer['max'] = max(timer['max'], duration)
+        self.stacks[span.path] = self.stacks.get(span.path, 0.0) + self_time
+        # perf_counter はLinuxではシステム共通の単調時計なので、ワーカープロセスのイベントとも時刻がそろう
+        self.events.append({
+            'name': span.name, 'ph': 'X', 'ts': span.start * 1e6, 'dur': duration * 1e6,
+            'pid': os.getpid(), 'tid': threading.get_ident(), 'args': span.args,
+        })
+
+    def annotate(self, **kwargs):
+        """現在開いている最も内側の区間に付加情報を追加する（区間の外や無効時は何もしない）"""
+        if self.enabled:
+            stack = self._stack()
+            if stack:
+                stack[-1].annotate(**kwargs)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, kind, **fields):
+        """ラウンド・ペアなどの単位で任意の値を記録する"""
+        if self.enabled:
+            self.records.setdefault(kind, []).append(fields)
+
+    def drain(self):
+        """これまでの記録を取り出して消去する（ワーカープロセスから親プロセスへ返すために使う）"""
+        data = {'timers': self.timers, 'stacks': self.stacks, 'counters': self.counters,
+                'records': self.records, 'events': self.events}
+        self.reset()
+        return data
+
+    def merge(self, data):
+        """
+        drain() で取り出した別プロセスの記録を統合する
+        別プロセスの呼び出し経路は、統合時に開いている区間（ワーカーへ処理を投げた区間）の下にぶら下げる
+        """
+        if not data:
+            return
+        stack = self._stack()
+        prefix = f"{stack[-1].path};" if stack else ''
+        for path, self_time in data['stacks'].items():
+            path = prefix + path
+            self.stacks[path] = self.stacks.get(path, 0.0) + self_time
+        for name, timer in data['timers'].items():
+            mine = self.timers.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            mine['count'] += timer['count']
+            mine['total'] += timer['total']
+            mine['max'] = max(mine['max'], timer['max'])
+        for name, value in data['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        for kind, records in data['records'].items():
+            self.records.setdefault(kind, []).extend(records)
+        self.events.extend(data['events'])
+
+    def to_dict(self):
+        return {
+            'timers': {name: dict(timer, mean=timer['total'] / timer['count'])
+                       for name, timer in sorted(self.timers.items(), key=lambda item: -item[1]['total'])},
+            'counters': dict(sorted(self.counters.items())),
+            'records': self.records,
+        }
+
+    def report(self, top=20):
+        """合計時間の大きい区間から順に、集計表の文字列を返す"""
+        lines = [f"{'区間':<32}{'回数':>8}{'合計[秒]':>12}{'平均[ms]':>12}{'最大[ms]':>12}"]
+        for name, timer in list(self.to_dict()['timers'].items())[:top]:
+            lines.append(f"{name:<32}{timer['count']:>8}{timer['total']:>12.3f}{timer['mean'] * 1e3:>12.3f}{timer['max'] * 1e3:>12.3f}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name}: {value}")
+        return '\n'.join(lines)
+
+    def export_json(self, path):
+        _ensure_parent(path)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1, default=_json_default)
+
+    def export_chrome_trace(self, path):
+        """Chromeトレース形式（Trace Event Format）で書き出す。時刻は計測開始からの相対値[μs]"""
+        _ensure_parent(path)
+        origin = self.origin * 1e6
+        events = [dict(event, ts=event['ts'] - origin) for event in sorted(self.events, key=lambda e: e['ts'])]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=_json_default)
+
+    def export_folded(self, path):
+        """折りたたみスタック形式（'a;b;c 自己時間[μs]'）で書き出す（flamegraph.pl / speedscope で読める）"""
+        _ensure_parent(path)
+        with open(path, 'w') as f:
+            for stack_path, self_time in sorted(self.stacks.items()):
+                f.write(f"{stack_path} {int(round(self_time * 1e6))}\n")
+
+
+def _ensure_parent(path):
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+
+
+def _json_default(value):
+    # NumPyのスカラーなどはPythonの値に変換して書き出す
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def start_worker_profiling(enabled):
+    """
+    ワーカープロセスの初期化時に呼ぶ
+    fork で生成されたワーカーは親プロセスの記録と開いている区間を引き継ぐため、それらを消去して有効/無効を親に合わせる
+    """
+    profiler._local = threading.local()
+    profiler.reset(enabled)
+
+
+# プロセス内で共有する計測器
+profiler = Profiler()
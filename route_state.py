@@ -0,0 +1,81 @@
+"""
+GATの経路状態を保持し、交換で変化した車両の分だけ更新する索引
+
+- PD_pairs_of_vehicle[v]: 車両vが担当するPDペア（build_vehicle_PD_pairs と同じ内容・順序）
+- costs[v]: 車両vの経路コスト（total_cost は全車両の合計）
+
+update(routes) は前回の経路と異なる車両だけを作り直すため、1ラウンドの更新は
+車両数 × PDペア数 ではなく、変化した車両の経路長に比例する。
+"""
+import numpy as np
+
+from flexible_vrp_solver import route_cost
+
+
+def index_PD_pairs(PD_pairs):
+    """PDペアを辞書の順に番号付けし、(ペアのリスト, ノードID → そのノードを含むペア番号のタプル) を返す"""
+    pairs = list(PD_pairs.items())
+    pair_indices_of_node = {}
+    for k, (pickup, delivery) in enumerate(pairs):
+        pair_indices_of_node[pickup] = pair_indices_of_node.get(pickup, ()) + (k,)
+        if delivery != pickup:
+            pair_indices_of_node[delivery] = pair_indices_of_node.get(delivery, ()) + (k,)
+    return pairs, pair_indices_of_node
+
+
+def vehicle_PD_pairs(route, pairs, pair_indices_of_node):
+    """経路が訪問するノードを含むPDペアを、PD_pairs の辞書の順に返す"""
+    indices = set()
+    for node in route:
+        indices.update(pair_indices_of_node.get(node, ()))
+    return [pairs[k] for k in sorted(indices)]
+
+
+class RouteState:
+    """
+    全車両の経路と、そこから導かれる索引・コストを保持する
+    - routes は車両ごとの経路（デポ込み）のリスト。update() に渡された経路オブジェクトをそのまま保持する
+    - store: InstanceStore（指定時はコストの一括計算に使う）
+    """
+
+    def __init__(self, routes, customers, PD_pairs, store=None):
+        self.customers = customers
+        self.store = store
+        self.pairs, self.pair_indices_of_node = index_PD_pairs(PD_pairs)
+        self.routes = []
+        self.PD_pairs_of_vehicle = []
+        self.costs = np.zeros(0)
+        self.update(routes)
+
+    def __len__(self):
+        return len(self.routes)
+
+    @property
+    def total_cost(self):
+        return float(self.costs.sum())
+
+    def changed_vehicles(self, routes):
+        """保持している経路と異なる車両のインデックスのリスト（同じリストオブジェクトは比較しない）"""
+        if len(routes) != len(self.routes):
+            return list(range(len(routes)))
+        return [v for v, (old, new) in enumerate(zip(self.routes, routes)) if old is not new and old != new]
+
+    def update(self, routes):
+        """経路を更新し、変化した車両のPDペア・コストだけを作り直す。変化した車両のインデックスのリストを返す"""
+        changed = self.changed_vehicles(routes)
+        if len(routes) != len(self.routes):
+            self.routes = [[] for _ in routes]
+            self.PD_pairs_of_vehicle = [[] for _ in routes]
+            self.costs = np.zeros(len(routes))
+        if not changed:
+            return changed
+
+        for v in changed:
+            self.routes[v] = routes[v]
+            self.PD_pairs_of_vehicle[v] = vehicle_PD_pairs(routes[v], self.pairs, self.pair_indices_of_node)
+        changed_routes = [routes[v] for v in changed]
+        if self.store is not None:
+            self.costs[changed] = self.store.route_costs(changed_routes)
+        else:
+            self.costs[changed] = [route_cost(route, self.customers) for route in changed_routes]
+        return changed
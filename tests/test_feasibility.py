@@ -0,0 +1,130 @@
+import pytest
+
+from feasibility import FeasibilityChecker, VIOLATION_TYPES, audit_routes
+
+# デポ 0 と2つのリクエスト（1 → 2, 3 → 4）。地点はすべて x 軸上に置き、距離を読みやすくする
+CUSTOMERS = [
+    {'id': 0, 'x': 0, 'y': 0, 'demand': 0, 'ready': 0, 'due': 1000, 'service': 0, 'pickup_index': 0, 'delivery_index': 0},
+    {'id': 1, 'x': 10, 'y': 0, 'demand': 10, 'ready': 0, 'due': 100, 'service': 5, 'pickup_index': 0, 'delivery_index': 2},
+    {'id': 2, 'x': 20, 'y': 0, 'demand': -10, 'ready': 50, 'due': 200, 'service': 5, 'pickup_index': 1, 'delivery_index': 0},
+    {'id': 3, 'x': 30, 'y': 0, 'demand': 15, 'ready': 0, 'due': 300, 'service': 5, 'pickup_index': 0, 'delivery_index': 4},
+    {'id': 4, 'x': 40, 'y': 0, 'demand': -15, 'ready': 0, 'due': 400, 'service': 5, 'pickup_index': 3, 'delivery_index': 0},
+]
+PD_PAIRS = {1: 2, 3: 4}
+CAPACITY = 20
+
+
+@pytest.fixture
+def checker():
+    return FeasibilityChecker(CUSTOMERS, PD_PAIRS, CAPACITY)
+
+
+def only_violation(report, route_index=0):
+    violations = [v for v in report['violations'] if v['route'] == route_index]
+    assert len(violations) == 1, violations
+    return violations[0]
+
+
+def test_feasible_routes(checker):
+    report = checker.check([[0, 1, 2, 0], [0, 3, 4, 0], [0, 1, 2, 3, 4, 0], [0, 0], []])
+    assert report['feasible'].tolist() == [True] * 5
+    assert report['violations'] == []
+    assert set(report['counts']) == set(VIOLATION_TYPES)
+
+
+def test_capacity(checker):
+    # 1 と 3 を両方積むと 10 + 15 = 25 > 20
+    report = checker.check([[0, 1, 3, 2, 4, 0]])
+    violation = only_violation(report)
+    assert violation['type'] == 'capacity'
+    assert (violation['node'], violation['position'], violation['value'], violation['limit']) == (3, 2, 25.0, 20.0)
+    assert not report['feasible'][0]
+
+
+def test_negative_load_is_a_capacity_violation():
+    # PDペアとして登録されていない配達だけを訪問すると積載量が負になる
+    checker = FeasibilityChecker(CUSTOMERS, {}, CAPACITY)
+    violation = only_violation(checker.check([[0, 2, 0]]))
+    assert violation['type'] == 'capacity'
+    assert (violation['value'], violation['limit']) == (-10.0, 0.0)
+
+
+def test_time_window(checker):
+    # 0 → 3 → 4 → 1 → 2: 1 への到着は 30 + 5 + 10 + 5 + 30 = 80（due 100 以内）
+    assert checker.check([[0, 3, 4, 1, 2, 0]])['feasible'][0]
+    tight = [dict(c, due=60) if c['id'] == 1 else c for c in CUSTOMERS]
+    report = FeasibilityChecker(tight, PD_PAIRS, CAPACITY).check([[0, 3, 4, 1, 2, 0]])
+    violation = only_violation(report)
+    assert violation['type'] == 'time_window'
+    assert (violation['node'], violation['value'], violation['limit']) == (1, 80.0, 60.0)
+
+
+def test_waiting_until_ready_is_allowed(checker):
+    # 2 の ready は 50：1 の後 15 で着くが 50 まで待つ。帰着はその後で間に合う
+    report = checker.check([[0, 1, 2, 0]])
+    assert report['feasible'][0]
+
+
+def test_precedence(checker):
+    # 3 を積んでいるので 2 を先に降ろしても積載量は負にならない
+    violation = only_violation(checker.check([[0, 3, 2, 1, 4, 0]]))
+    assert violation['type'] == 'precedence'
+    assert violation['node'] == 1
+
+
+def test_missing_partner(checker):
+    report = checker.check([[0, 1, 0], [0, 2, 0]])
+    assert only_violation(report, 0)['type'] == 'pickup_delivery'
+    # 配達だけの経路は積載量も負になる（容量の違反として先に数える）
+    assert {v['type'] for v in report['violations'] if v['route'] == 1} == {'capacity', 'pickup_delivery'}
+    assert report['counts']['pickup_delivery'] == 2
+
+
+def test_duplicate(checker):
+    report = checker.check([[0, 3, 3, 4, 0]])
+    types = [v['type'] for v in report['violations']]
+    assert 'duplicate' in types
+    duplicate = next(v for v in report['violations'] if v['type'] == 'duplicate')
+    assert (duplicate['node'], duplicate['position']) == (3, 2)
+
+
+def test_unknown_node(checker):
+    report = checker.check([[0, 99, 0], [0, -1, 0]])
+    assert [v['type'] for v in report['violations']] == ['unknown_node', 'unknown_node']
+    assert report['feasible'].tolist() == [False, False]
+
+
+def test_distance():
+    checker = FeasibilityChecker(CUSTOMERS, PD_PAIRS, CAPACITY, max_distance=50)
+    report = checker.check([[0, 1, 2, 0], [0, 3, 4, 0]])
+    assert report['feasible'].tolist() == [True, False]
+    violation = only_violation(report, 1)
+    assert violation['type'] == 'distance'
+    assert (violation['value'], violation['limit']) == (80.0, 50.0)
+
+
+def test_details_off_keeps_counts(checker):
+    report = checker.check([[0, 2, 1, 0], [0, 1, 2, 0]], details=False)
+    assert report['violations'] == []
+    assert report['counts']['precedence'] == 1
+    assert report['feasible'].tolist() == [False, True]
+
+
+def test_filter_actions(checker):
+    actions = [
+        {'new_routes': [[0, 1, 2, 0], [0, 3, 4, 0]]},
+        {'new_routes': [[0, 1, 3, 2, 4, 0], [0, 0]]},
+        {'new_routes': [[0, 0], [0, 4, 3, 0]]},
+    ]
+    assert checker.action_mask(actions).tolist() == [True, False, False]
+    kept, rejected = checker.filter_actions(actions)
+    assert kept == [actions[0]] and rejected == 2
+    assert checker.action_mask([]).tolist() == []
+
+
+def test_audit_missing_and_visited_twice():
+    audit = audit_routes([[0, 1, 2, 0], [0, 1, 2, 0]], CUSTOMERS, PD_PAIRS, CAPACITY)
+    assert audit['missing'] == [3, 4]
+    assert audit['visited_twice'] == [1, 2]
+    assert audit['num_violations'] == 4
+    assert audit_routes([[0, 1, 2, 0], [0, 3, 4, 0]], CUSTOMERS, PD_PAIRS, CAPACITY)['num_violations'] == 0
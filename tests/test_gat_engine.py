@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import gat
+from gat import GATEngine, perform_gat_exchange
+from instance_store import InstanceStore
+from parser import load_instances
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'LC1_2_2.txt')
+SOLVER_OPTIONS = {'engine': 'local_search'}
+ROUNDS = 4
+
+
+@pytest.fixture(scope='module')
+def instance():
+    instance = load_instances([DATA_FILE], [(0, 0)])
+    instance['store'] = InstanceStore(instance['customers'])
+    return instance
+
+
+def initial_routes(instance, num_vehicles):
+    """リクエストを順に num_vehicles 台へ2件ずつ載せた経路"""
+    depot = instance['depot_id_list'][0]
+    requests = list(instance['PD_pairs'].items())
+    routes = []
+    for v in range(num_vehicles):
+        (p1, d1), (p2, d2) = requests[2 * v], requests[2 * v + 1]
+        routes.append([depot, p1, d1, p2, d2, depot])
+    return routes
+
+
+@pytest.fixture
+def recorded_actions(monkeypatch):
+    """select_actions に渡されたアクション集合をラウンドごとに記録する"""
+    calls = []
+    select_actions = gat.select_actions
+
+    def record(original_routes, feasible_actions, method='matching'):
+        calls.append([(a['vehicle_pair'], a['new_routes'], a['cost_improvement']) for a in feasible_actions])
+        return select_actions(original_routes, feasible_actions, method)
+
+    monkeypatch.setattr(gat, 'select_actions', record)
+    return calls
+
+
+def test_engine_matches_fresh_exchange_and_resolves_only_changed_pairs(instance, recorded_actions):
+    customers, PD_pairs, capacity, store = (instance['customers'], instance['PD_pairs'], instance['vehicle_capacity'],
+                                            instance['store'])
+    num_vehicles = 10
+    num_pairs = num_vehicles * (num_vehicles - 1) // 2
+    engine = GATEngine(customers, PD_pairs, capacity, store=store, solver_options=SOLVER_OPTIONS)
+    engine_routes = fresh_routes = initial_routes(instance, num_vehicles)
+    changed = set(range(num_vehicles))
+    reused = 0
+    for _ in range(ROUNDS):
+        previous = engine_routes
+        engine_routes = engine.perform_round(engine_routes)
+        engine_actions = recorded_actions.pop()
+        fresh_routes = perform_gat_exchange(fresh_routes, customers, PD_pairs, capacity, store=store,
+                                            solver_options=SOLVER_OPTIONS)
+        fresh_actions = recorded_actions.pop()
+
+        assert engine_actions == fresh_actions
+        assert engine_routes == fresh_routes
+        # 前のラウンドで経路が変わった車両を含むペアだけを解き直し、残りは再利用する
+        expected_solved = sum(1 for i in range(num_vehicles) for j in range(i + 1, num_vehicles)
+                              if i in changed or j in changed)
+        assert engine.last_round_stats['solved_pairs'] == expected_solved
+        assert engine.last_round_stats['reused_pairs'] == num_pairs - expected_solved
+        changed = {v for v in range(num_vehicles) if engine_routes[v] != previous[v]}
+        reused += engine.last_round_stats['reused_pairs']
+    # 交換が一部の車両だけに適用され、前回の結果を再利用したラウンドがあること
+    assert reused > 0
+
+
+def test_external_route_change_marks_vehicles_dirty(instance):
+    customers, PD_pairs, capacity, store = (instance['customers'], instance['PD_pairs'], instance['vehicle_capacity'],
+                                            instance['store'])
+    engine = GATEngine(customers, PD_pairs, capacity, store=store, solver_options=SOLVER_OPTIONS)
+    routes = engine.perform_round(initial_routes(instance, 6))
+    # 呼び出し側が2台の経路を入れ替えると、その2台が dirty になる
+    routes = list(routes)
+    routes[1], routes[4] = routes[4], routes[1]
+    assert engine.dirty_vehicles(routes) >= {1, 4}
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from gat_service import CLIENT_CONFIG_KEYS, GATService, TERMINAL_EVENTS, instance_key, request
+from instance_generator import generate_instances, write_instances
+from main import default_run_config
+
+# 小さい生成インスタンスを短い探索制限で解く（1ジョブ1秒未満）
+SERVICE_CONFIG = {
+    'init_solver_options': {'time_limit': 1, 'solution_limit': None, 'neighbors': None},
+    'pair_solver_options': {'engine': 'ortools', 'time_limit': 0.2},
+    'gat_time_budget': 3,
+}
+
+
+@pytest.fixture(scope='module')
+def case(tmp_path_factory):
+    files, offsets = write_instances(str(tmp_path_factory.mktemp('instances')), generate_instances(2, 6, seed=1))
+    return {'files': files, 'offsets': [list(offset) for offset in offsets]}
+
+
+def run_service(tmp_path, body, **options):
+    """一時的なUnixソケットでサービスを起動し、body(service, socket_path) を実行して終了する"""
+    async def main():
+        service = GATService(workers=1, config=SERVICE_CONFIG, **options)
+        socket_path = str(tmp_path / 'gat.sock')
+        await service.start(socket_path=socket_path)
+        try:
+            return await asyncio.wait_for(body(service, socket_path), timeout=60)
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+async def send(message, socket_path, until=None):
+    return [event async for event in request(message, socket_path=socket_path, until=until)]
+
+
+def submit_message(case, config=None, watch=True):
+    return {'op': 'submit', 'files': case['files'], 'offsets': case['offsets'], 'config': config or {}, 'watch': watch}
+
+
+def kinds(events):
+    return [event['event'] for event in events]
+
+
+def test_submit_and_watch_until_finished_then_warm_hit(tmp_path, case):
+    async def body(service, socket_path):
+        first = await send(submit_message(case), socket_path, until=TERMINAL_EVENTS)
+        second = await send(submit_message(case, {'gat_time_budget': 1}), socket_path, until=TERMINAL_EVENTS)
+        return first, second
+
+    first, second = run_service(tmp_path, body)
+    assert kinds(first)[:3] == ['accepted', 'queued', 'started']
+    assert kinds(first)[-1] == 'finished'
+    assert 'initial' in kinds(first)
+    assert first[-1]['result']['audit_violations'] == 0
+    started = [event for event in first + second if event['event'] == 'started']
+    # 2回目のジョブは同じワーカーが読み込み済みのインスタンスを使う
+    assert [event['warm'] for event in started] == [False, True]
+    assert started[0]['worker'] == started[1]['worker']
+    assert kinds(second)[-1] == 'finished'
+
+
+def test_cancel_queued_and_running_jobs(tmp_path, case):
+    async def body(service, socket_path):
+        replies = {}
+        running_events = []
+        async for event in request(submit_message(case), socket_path=socket_path, until=TERMINAL_EVENTS):
+            running_events.append(event)
+            if event['event'] == 'accepted':
+                # 1台のワーカーが実行中なので、次のジョブは待ち行列に入る
+                queued = (await send(submit_message(case, watch=False), socket_path))[0]['job_id']
+                assert service.jobs[queued].status == 'queued'
+                replies['queued'] = await send({'op': 'cancel', 'job_id': queued}, socket_path)
+            elif event['event'] == 'started':
+                # 初期経路の生成後（on_init）に取り消しが反映される
+                replies['running'] = await send({'op': 'cancel', 'job_id': event['job_id']}, socket_path)
+        queued_events = await send({'op': 'watch', 'job_id': queued}, socket_path, until=TERMINAL_EVENTS)
+        return replies, running_events, queued_events, [w.process.pid for w in service.workers]
+
+    replies, running_events, queued_events, pids = run_service(tmp_path, body)
+    assert replies['queued'][0]['status'] == 'cancelled'
+    assert kinds(queued_events) == ['queued', 'cancelled']
+    assert replies['running'][0]['status'] == 'cancelling'
+    assert kinds(running_events)[-1] == 'cancelled'
+    assert 'finished' not in kinds(running_events)
+    # 猶予内に止まるので、ワーカーは作り直されない
+    started = next(event for event in running_events if event['event'] == 'started')
+    assert pids == [started['worker']]
+
+
+def test_rejects_config_keys_outside_the_whitelist(tmp_path, case):
+    async def body(service, socket_path):
+        replies = []
+        for config in ({'checkpoint_dir': str(tmp_path / 'evil')}, {'pair_cache_path': str(tmp_path / 'x.sqlite')},
+                       {'profile_dir': str(tmp_path)}, {'render_mode': 'png'}, {'pair_solver_options': [1]}):
+            replies.append(await send(submit_message(case, config), socket_path))
+        return replies, dict(service.jobs)
+
+    replies, jobs = run_service(tmp_path, body)
+    assert all(kinds(reply) == ['error'] for reply in replies)
+    assert 'checkpoint_dir' in replies[0][0]['error']
+    assert jobs == {}
+    assert 'render_mode' not in CLIENT_CONFIG_KEYS and 'checkpoint_dir' not in CLIENT_CONFIG_KEYS
+
+
+def test_finished_jobs_beyond_retention_are_dropped(tmp_path, case):
+    async def body(service, socket_path):
+        job_ids = []
+        for _ in range(3):
+            events = await send(submit_message(case, {'gat_time_budget': 1}), socket_path, until=TERMINAL_EVENTS)
+            job_ids.append(events[0]['job_id'])
+        listed = (await send({'op': 'jobs'}, socket_path))[0]['jobs']
+        dropped = await send({'op': 'watch', 'job_id': job_ids[0]}, socket_path, until=TERMINAL_EVENTS)
+        return job_ids, listed, dropped
+
+    job_ids, listed, dropped = run_service(tmp_path, body, retained_jobs=2)
+    assert [job['job_id'] for job in listed] == job_ids[1:]
+    assert kinds(dropped) == ['error']
+
+
+def test_instance_key_separates_dense_and_sparse_stores(case):
+    dense = default_run_config()
+    sparse = dict(dense, init_solver_options=dict(dense['init_solver_options'], neighbors=10))
+    assert instance_key(case['files'], case['offsets'], dense) != instance_key(case['files'], case['offsets'], sparse)
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import shutil
+
+import numpy as np
+
+from instance_cache import InstanceCache
+from parser import load_instances
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+FILES = [os.path.join(DATA_DIR, 'LC1_2_2.txt'), os.path.join(DATA_DIR, 'LC1_2_6.txt')]
+OFFSETS = [(0, 0), (42, -42)]
+
+
+def copy_files(tmp_path):
+    paths = []
+    for path in FILES:
+        target = tmp_path / os.path.basename(path)
+        shutil.copy(path, target)
+        paths.append(str(target))
+    return paths
+
+
+def _fill(cache_dir, paths, rounds, errors):
+    try:
+        for _ in range(rounds):
+            instance = InstanceCache(cache_dir).load_instances(paths, OFFSETS)
+            assert len(instance['customers']) > 0
+    except Exception as e:
+        errors.put(repr(e))
+
+
+def test_matches_parser_and_hits_second_time(tmp_path):
+    paths = copy_files(tmp_path)
+    cache = InstanceCache(str(tmp_path / 'cache'))
+    expected = load_instances(paths, OFFSETS)
+    for _ in range(2):
+        instance = cache.load_instances(paths, OFFSETS)
+        assert np.array_equal(np.asarray(instance['customers'].id), np.asarray(expected['customers'].id))
+        assert np.array_equal(np.asarray(instance['customers'].x), np.asarray(expected['customers'].x))
+        assert sorted(instance['PD_pairs']) == sorted(expected['PD_pairs'])
+        assert instance['vehicle_num_list'] == expected['vehicle_num_list']
+    assert cache.hits >= 1
+
+
+def test_concurrent_fill_of_the_same_entry(tmp_path):
+    paths = copy_files(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    errors = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_fill, args=(cache_dir, paths, 5, errors)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert errors.empty(), errors.get()
+    assert all(worker.exitcode == 0 for worker in workers)
+    # 一時ディレクトリを残さず、結合済みエントリは1つだけ
+    merged = os.listdir(os.path.join(cache_dir, 'merged'))
+    assert len(merged) == 1 and not merged[0].startswith('.')
+
+
+def test_changed_source_replaces_file_entry_and_prunes_merged(tmp_path):
+    paths = copy_files(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    InstanceCache(cache_dir).load_instances(paths, OFFSETS)
+    old_merged = os.listdir(os.path.join(cache_dir, 'merged'))
+
+    # 車両数の行を書き換える（内容のハッシュが変わる）
+    with open(paths[0]) as f:
+        lines = f.readlines()
+    fields = lines[0].split()
+    fields[0] = str(int(fields[0]) + 1)
+    lines[0] = '\t'.join(fields) + '\n'
+    with open(paths[0], 'w') as f:
+        f.writelines(lines)
+
+    cache = InstanceCache(cache_dir)
+    instance = cache.load_instances(paths, OFFSETS)
+    assert instance['vehicle_num_list'] == load_instances(paths, OFFSETS)['vehicle_num_list']
+    assert cache.misses >= 1
+    merged = os.listdir(os.path.join(cache_dir, 'merged'))
+    assert len(merged) == 1 and merged != old_merged
+    assert InstanceCache(cache_dir).prune() == 0
@@ -0,0 +1,35 @@
+import numpy as np
+
+from feasibility import FeasibilityChecker
+from instance_generator import generate_instances, write_instances
+from parser import load_instances
+
+
+def test_generated_files_parse_and_every_request_is_servable_alone(tmp_path):
+    instances = generate_instances(3, 20, clustering=0.7, tightness=0.9, seed=3)
+    file_paths, offsets = write_instances(str(tmp_path), instances)
+    instance = load_instances(file_paths, offsets)
+
+    assert instance['num_lsps'] == 3
+    assert instance['vehicle_num_list'] == [10, 10, 10]
+    assert len(instance['customers']) == 3 * (2 * 20 + 1)
+    assert len(instance['PD_pairs']) == 3 * 20
+
+    # 各リクエストは、自社のデポから出発する単独の車両で実行可能（生成方法の保証）
+    customers = instance['customers']
+    depot_of = {}
+    lsp = np.repeat(np.arange(3), 2 * 20 + 1)
+    for node_id, k in zip(customers.id.tolist(), lsp.tolist()):
+        depot_of[node_id] = instance['depot_id_list'][k]
+    routes = [[depot_of[p], p, d, depot_of[p]] for p, d in instance['PD_pairs'].items()]
+    checker = FeasibilityChecker(customers, instance['PD_pairs'], instance['vehicle_capacity'])
+    report = checker.check(routes)
+    assert report['feasible'].all(), report['violations'][:3]
+
+
+def test_same_seed_same_instance():
+    first = generate_instances(2, 10, seed=7)
+    second = generate_instances(2, 10, seed=7)
+    for (a, _, _), (b, _, _) in zip(first, second):
+        for field in ('x', 'y', 'demand', 'ready', 'due'):
+            assert np.array_equal(getattr(a, field), getattr(b, field))
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from matching import max_weight_matching
+
+
+def brute_force(num_vertices, edges, maxcardinality=False):
+    """全マッチングを列挙し、(辺数, 重み) が最大のもの（maxcardinality=False なら重みだけ）の値を返す"""
+    best = None
+
+    def search(k, used, count, weight):
+        nonlocal best
+        if k == len(edges):
+            value = (count, weight) if maxcardinality else weight
+            if best is None or value > best:
+                best = value
+            return
+        search(k + 1, used, count, weight)
+        i, j, w = edges[k]
+        if not used & ((1 << i) | (1 << j)):
+            search(k + 1, used | (1 << i) | (1 << j), count + 1, weight + w)
+
+    search(0, 0, 0, 0)
+    return best
+
+
+def matched_value(edges, mate, maxcardinality=False):
+    weights = {}
+    for i, j, w in edges:
+        weights[(i, j)] = weights[(j, i)] = max(w, weights.get((i, j), w))
+    count = weight = 0
+    for v, u in enumerate(mate):
+        if u < 0:
+            continue
+        assert mate[u] == v
+        assert (v, u) in weights
+        if v < u:
+            count += 1
+            weight += weights[(v, u)]
+    return (count, weight) if maxcardinality else weight
+
+
+def random_graph(rng, num_vertices, density, weights):
+    edges = []
+    for i in range(num_vertices):
+        for j in range(i + 1, num_vertices):
+            if rng.random() < density:
+                edges.append((i, j, weights(rng)))
+    rng.shuffle(edges)
+    return edges
+
+
+def test_empty():
+    assert max_weight_matching([]) == []
+
+
+def test_small_examples():
+    # 中央の重い辺1本より、両側の2本の方が重い
+    assert max_weight_matching([(0, 1, 5), (1, 2, 11), (2, 3, 5)]) == [-1, 2, 1, -1]
+    assert max_weight_matching([(0, 1, 6), (1, 2, 11), (2, 3, 6)]) == [1, 0, 3, 2]
+    # 負の重みの辺は使わない（maxcardinality なら辺数を優先する）
+    assert max_weight_matching([(0, 1, -1)]) == [-1, -1]
+    assert max_weight_matching([(0, 1, -1)], maxcardinality=True) == [1, 0]
+
+
+@pytest.mark.parametrize('maxcardinality', [False, True])
+@pytest.mark.parametrize('seed', range(40))
+def test_matches_brute_force_integer_weights(seed, maxcardinality):
+    rng = random.Random(seed)
+    num_vertices = rng.randint(2, 9)
+    edges = random_graph(rng, num_vertices, rng.choice([0.3, 0.6, 1.0]), lambda r: r.randint(-5, 30))
+    if not edges:
+        return
+    mate = max_weight_matching(edges, maxcardinality)
+    assert matched_value(edges, mate, maxcardinality) == brute_force(num_vertices, edges, maxcardinality)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_brute_force_float_weights(seed):
+    # GATのアクションの改善量（実数）と同じく、実数の重みでも最適になる
+    rng = random.Random(1000 + seed)
+    num_vertices = rng.randint(2, 9)
+    edges = random_graph(rng, num_vertices, 0.7, lambda r: round(r.uniform(0.0, 50.0), 3))
+    if not edges:
+        return
+    mate = max_weight_matching(edges)
+    assert matched_value(edges, mate) == pytest.approx(brute_force(num_vertices, edges))
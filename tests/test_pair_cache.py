@@ -0,0 +1,81 @@
+import itertools
+import pickle
+
+import pair_cache
+from pair_cache import PairSolveCache
+
+CUSTOMERS = [
+    {'id': 0, 'x': 0, 'y': 0, 'demand': 0, 'ready': 0, 'due': 1000, 'service': 0},
+    {'id': 1, 'x': 3, 'y': 4, 'demand': 10, 'ready': 0, 'due': 100, 'service': 10},
+    {'id': 2, 'x': 6, 'y': 8, 'demand': -10, 'ready': 0, 'due': 200, 'service': 10},
+]
+
+
+def make_key(**overrides):
+    args = dict(customers=CUSTOMERS, initial_routes=[[0, 1, 2, 0], [0, 0]], PD_pairs=[(1, 2)], num_vehicles=2,
+                vehicle_capacity=100, start_depots=[0, 0], end_depots=[0, 0], use_capacity=True, use_time=True,
+                use_pickup_delivery=True, isInitPhase=False, solver_options={'time_limit': None})
+    args.update(overrides)
+    return PairSolveCache.make_key(**args)
+
+
+def fixed_clock(monkeypatch):
+    """last_access が書き込み順に必ず増えるよう、time.time を1秒ずつ進む時計に置き換える"""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(pair_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def test_key_depends_on_subproblem():
+    assert make_key() == make_key()
+    assert make_key() != make_key(initial_routes=[[0, 0], [0, 1, 2, 0]])
+    assert make_key() != make_key(vehicle_capacity=50)
+    assert make_key() != make_key(solver_options={'time_limit': 5.0})
+
+
+def test_put_get_roundtrip(tmp_path):
+    cache = PairSolveCache(str(tmp_path / 'cache.sqlite'))
+    assert cache.get('missing') is None
+    cache.put('k', [[0, 1, 2, 0], [0, 0]])
+    assert cache.get('k') == [[0, 1, 2, 0], [0, 0]]
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+    cache.close()
+
+
+def test_evict_removes_least_recently_used(tmp_path, monkeypatch):
+    fixed_clock(monkeypatch)
+    cache = PairSolveCache(str(tmp_path / 'cache.sqlite'), max_entries=2)
+    cache.put('a', [[1]])
+    cache.put('b', [[2]])
+    cache.put('c', [[3]])
+    # a は最も古いが、読み出すと最終アクセスが更新されて b が最古になる
+    assert cache.get('a') == [[1]]
+    cache.evict()
+    assert cache.stats()['entries'] == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == [[1]]
+    assert cache.get('c') == [[3]]
+    cache.close()
+
+
+def test_put_evicts_periodically(tmp_path, monkeypatch):
+    fixed_clock(monkeypatch)
+    cache = PairSolveCache(str(tmp_path / 'cache.sqlite'), max_entries=10)
+    for i in range(63):
+        cache.put(f'k{i}', [[i]])
+    # 64回目の書き込みまでは件数を確認しない
+    assert cache.stats()['entries'] == 63
+    cache.put('k63', [[63]])
+    assert cache.stats()['entries'] == 10
+    assert cache.get('k53') is None
+    assert cache.get('k63') == [[63]]
+    cache.close()
+
+
+def test_pickle_reopens_connection(tmp_path):
+    cache = PairSolveCache(str(tmp_path / 'cache.sqlite'))
+    cache.put('k', [[0, 0]])
+    clone = pickle.loads(pickle.dumps(cache))
+    assert clone._connection is None
+    assert clone.get('k') == [[0, 0]]
+    cache.close()
+    clone.close()
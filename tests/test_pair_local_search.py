@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from feasibility import FeasibilityChecker
+from flexible_vrp_solver import route_cost
+from gat import PAIR_SOLVE_FLAGS, build_vehicle_PD_pairs, pair_subproblem
+from instance_store import InstanceStore
+from pair_local_search import PairProblem, solve_pair_local_search
+from parser import load_instances
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'LC1_2_2.txt')
+NUM_PAIRS = 6
+
+
+@pytest.fixture(scope='module')
+def instance():
+    instance = load_instances([DATA_FILE], [(0, 0)])
+    instance['store'] = InstanceStore(instance['customers'])
+    instance['checker'] = FeasibilityChecker(instance['customers'], instance['PD_pairs'], instance['vehicle_capacity'])
+    return instance
+
+
+@pytest.fixture(scope='module')
+def warm_routes(instance):
+    """2リクエストずつ載せた実行可能な経路（並べ方は連続・入れ子のうち実行可能な方）"""
+    depot = instance['depot_id_list'][0]
+    requests = list(instance['PD_pairs'].items())
+    routes = []
+    for (p1, d1), (p2, d2) in zip(requests[0::2], requests[1::2]):
+        for body in ([p1, d1, p2, d2], [p1, p2, d1, d2], [p2, d2, p1, d1]):
+            route = [depot] + body + [depot]
+            if instance['checker'].check([route])['feasible'].all():
+                routes.append(route)
+                break
+        if len(routes) == 2 * NUM_PAIRS:
+            break
+    assert len(routes) == 2 * NUM_PAIRS
+    return routes
+
+
+def solve(instance, route_i, route_j, initial=True):
+    PD_pairs_of_vehicle = build_vehicle_PD_pairs([route_i, route_j], instance['PD_pairs'])
+    sub_customers, initial_routes, PD_pairs, num_vehicles, capacity, starts, ends = pair_subproblem(
+        route_i, route_j, PD_pairs_of_vehicle[0] + PD_pairs_of_vehicle[1], instance['customers'],
+        instance['vehicle_capacity'])
+    return solve_pair_local_search(sub_customers, initial_routes if initial else None, PD_pairs, num_vehicles, capacity,
+                                   starts, ends, **PAIR_SOLVE_FLAGS, store=instance['store'])
+
+
+def customers_of(routes):
+    return sorted(node for route in routes for node in route[1:-1])
+
+
+def test_local_search_keeps_routes_feasible_and_never_worsens_the_warm_start(instance, warm_routes):
+    improved = 0
+    for k in range(NUM_PAIRS):
+        route_i, route_j = warm_routes[2 * k], warm_routes[2 * k + 1]
+        new_routes = solve(instance, route_i, route_j)
+        assert new_routes is not None
+        report = instance['checker'].check(new_routes)
+        assert report['feasible'].all(), report['violations']
+        assert customers_of(new_routes) == customers_of([route_i, route_j])
+        # 各車両は自分のデポから出発して戻る
+        assert [route[0] for route in new_routes] == [route_i[0], route_j[0]]
+        old_cost = route_cost(route_i, instance['customers']) + route_cost(route_j, instance['customers'])
+        new_cost = sum(route_cost(route, instance['customers']) for route in new_routes)
+        assert new_cost <= old_cost + 1e-9
+        improved += new_cost < old_cost - 1e-9
+    # 交換・移動で改善できるペアが含まれていること（改善手が実際に適用される経路を通る）
+    assert improved > 0
+
+
+def test_construction_without_warm_start_is_feasible(instance, warm_routes):
+    for k in range(NUM_PAIRS):
+        route_i, route_j = warm_routes[2 * k], warm_routes[2 * k + 1]
+        new_routes = solve(instance, route_i, route_j, initial=False)
+        assert new_routes is not None
+        assert instance['checker'].check(new_routes)['feasible'].all()
+        assert customers_of(new_routes) == customers_of([route_i, route_j])
+
+
+def test_incremental_feasibility_matches_full_check(instance, warm_routes):
+    # _best_insertion と同じく、実行可能なルートへリクエストを挿入した新ルートを挿入位置から先だけ判定した結果は、
+    # ルート全体を判定した結果と一致する
+    checked = {True: 0, False: 0}
+    for k in range(NUM_PAIRS):
+        route_i, route_j = warm_routes[2 * k], warm_routes[2 * k + 1]
+        PD_pairs_of_vehicle = build_vehicle_PD_pairs([route_i, route_j], instance['PD_pairs'])
+        PD_pairs = PD_pairs_of_vehicle[0] + PD_pairs_of_vehicle[1]
+        sub_customers = pair_subproblem(route_i, route_j, PD_pairs, instance['customers'], instance['vehicle_capacity'])[0]
+        problem = PairProblem(sub_customers, PD_pairs, instance['vehicle_capacity'], instance['store'])
+        to_index = problem.id_to_index
+        route = [to_index[node] for node in route_i]
+        time_at, load_at = problem.profile(route)
+        for pickup, delivery in PD_pairs_of_vehicle[1]:
+            request = [to_index[pickup], to_index[delivery]]
+            for i in range(1, len(route)):
+                for j in range(i, len(route)):
+                    new_route = route[:i] + [request[0]] + route[i:j] + [request[1]] + route[j:]
+                    full = problem.is_feasible(new_route)
+                    assert problem.is_feasible(new_route, i, time_at, load_at) == full
+                    checked[full] += 1
+    # 実行可能・不可能の両方の挿入を比べていること
+    assert checked[True] > 0 and checked[False] > 0
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+
+import pytest
+
+import pair_worker
+from pair_tasks import TASK_FORMAT_VERSION
+from pair_worker import Spool, SpoolPairPool, run_worker
+from parser import load_instances
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'LC1_2_2.txt')
+
+
+@pytest.fixture(scope='module')
+def instance():
+    return load_instances([DATA_FILE], [(0, 0)])
+
+
+def make_pair_tasks(instance, num_pairs):
+    """1リクエストずつ載せた車両のペアを num_pairs 組作る"""
+    depot = instance['depot_id_list'][0]
+    requests = list(instance['PD_pairs'].items())
+    tasks = []
+    for k in range(num_pairs):
+        (p1, d1), (p2, d2) = requests[2 * k], requests[2 * k + 1]
+        tasks.append((2 * k, 2 * k + 1, [depot, p1, d1, depot], [depot, p2, d2, depot], [(p1, d1), (p2, d2)]))
+    return tasks
+
+
+def fake_solver(delay, fail_first=False):
+    """
+    solve_pair_task の代わり（経路は変えずに返す）
+    - delay(worker): 求解にかける時間[秒]
+    - fail_first: 各タスクの1回目の試行は例外の結果を返す
+    """
+    attempts = {}
+    lock = threading.Lock()
+
+    def solve(task, worker=None):
+        with lock:
+            attempts[task['task_id']] = attempts.get(task['task_id'], 0) + 1
+            attempt = attempts[task['task_id']]
+        time.sleep(delay(worker))
+        result = {'version': TASK_FORMAT_VERSION, 'task_id': task['task_id'], 'worker': worker, 'solve_time': delay(worker)}
+        if fail_first and attempt == 1:
+            result['error'] = "Traceback (most recent call last):\nRuntimeError: boom\n"
+            return result
+        result['routes'] = [[start] + route + [end] for route, start, end in
+                            zip(task['initial_routes'], task['start_depots'], task['end_depots'])]
+        result['comparison'] = None
+        return result
+    return solve
+
+
+def start_workers(spool_dir, worker_ids, heartbeat_interval=0.1, idle_exit=0.5):
+    threads = [threading.Thread(target=run_worker, args=(spool_dir, worker_id),
+                                kwargs={'poll_interval': 0.01, 'heartbeat_interval': heartbeat_interval,
+                                        'idle_exit': idle_exit})
+               for worker_id in worker_ids]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def join(threads):
+    for thread in threads:
+        thread.join(timeout=30)
+        assert not thread.is_alive()
+
+
+def test_slow_worker_task_is_duplicated(tmp_path, monkeypatch, instance):
+    # 1台だけ遅いワーカー。ハートビートはストラグラーの判定時間より短い間隔で更新される
+    monkeypatch.setattr(pair_worker, 'solve_pair_task', fake_solver(lambda worker: 2.5 if worker == 'slow' else 0.05))
+    spool_dir = str(tmp_path / 'spool')
+    pool = SpoolPairPool(spool_dir, straggler_factor=4.0, min_straggler_time=0.5)
+    pair_tasks = make_pair_tasks(instance, 6)
+    threads = start_workers(spool_dir, ['slow', 'fast'], heartbeat_interval=0.05)
+    start = time.time()
+    results = pool.evaluate_pair_tasks(pair_tasks, instance['customers'], instance['vehicle_capacity'])
+    elapsed = time.time() - start
+    join(threads)
+    pool.shutdown()
+
+    assert pool.stats['stragglers'] == 1
+    assert all(not result.get('skipped') for result in results)
+    assert all(result['worker'] == 'fast' for result in results)
+    # 遅いワーカーの終了（2.5秒）を待たずに、複製した結果でラウンドが終わる
+    assert elapsed < 2.0
+
+
+def test_uniform_tasks_are_not_duplicated(tmp_path, monkeypatch, instance):
+    monkeypatch.setattr(pair_worker, 'solve_pair_task', fake_solver(lambda worker: 0.1))
+    spool_dir = str(tmp_path / 'spool')
+    pool = SpoolPairPool(spool_dir, straggler_factor=4.0, min_straggler_time=0.2)
+    threads = start_workers(spool_dir, ['a', 'b'], heartbeat_interval=2.0)
+    results = pool.evaluate_pair_tasks(make_pair_tasks(instance, 8), instance['customers'], instance['vehicle_capacity'])
+    join(threads)
+    pool.shutdown()
+    assert pool.stats['stragglers'] == 0
+    assert all(not result.get('skipped') for result in results)
+
+
+def test_lost_lease_is_requeued(tmp_path, monkeypatch, instance):
+    monkeypatch.setattr(pair_worker, 'solve_pair_task', fake_solver(lambda worker: 0.05))
+    spool_dir = str(tmp_path / 'spool')
+    pool = SpoolPairPool(spool_dir, lease_timeout=0.5)
+    threads = []
+
+    def dead_worker():
+        # タスクを1つ取得したまま（ハートビートなしで）止まったワーカー。取得後に正常なワーカーを起動する
+        spool = Spool(spool_dir)
+        while spool.claim('dead') is None:
+            time.sleep(0.01)
+        threads.extend(start_workers(spool_dir, ['alive']))
+
+    claimer = threading.Thread(target=dead_worker)
+    claimer.start()
+    results = pool.evaluate_pair_tasks(make_pair_tasks(instance, 3), instance['customers'], instance['vehicle_capacity'])
+    claimer.join()
+    join(threads)
+    pool.shutdown()
+    assert pool.stats['lost_leases'] == 1
+    assert all(not result.get('skipped') for result in results)
+    assert os.listdir(os.path.join(spool_dir, 'leased')) == []
+
+
+def test_failed_attempts_are_retried(tmp_path, monkeypatch, instance):
+    monkeypatch.setattr(pair_worker, 'solve_pair_task', fake_solver(lambda worker: 0.01, fail_first=True))
+    spool_dir = str(tmp_path / 'spool')
+    pool = SpoolPairPool(spool_dir, max_attempts=2)
+    threads = start_workers(spool_dir, ['a'])
+    results = pool.evaluate_pair_tasks(make_pair_tasks(instance, 3), instance['customers'], instance['vehicle_capacity'])
+    join(threads)
+    pool.shutdown()
+    assert pool.stats['retries'] == 3
+    assert pool.stats['failed'] == 0
+    assert all(not result.get('skipped') for result in results)
+
+
+def test_pair_is_skipped_after_max_attempts(tmp_path, monkeypatch, instance):
+    monkeypatch.setattr(pair_worker, 'solve_pair_task', fake_solver(lambda worker: 0.01, fail_first=True))
+    spool_dir = str(tmp_path / 'spool')
+    pool = SpoolPairPool(spool_dir, max_attempts=1)
+    threads = start_workers(spool_dir, ['a'])
+    results = pool.evaluate_pair_tasks(make_pair_tasks(instance, 2), instance['customers'], instance['vehicle_capacity'])
+    join(threads)
+    pool.shutdown()
+    assert pool.stats['failed'] == 2
+    assert all(result['skipped'] and 'boom' in result['error'] for result in results)
+
+
+def test_stop_skips_pending_pairs(tmp_path, monkeypatch, instance):
+    # 1ペア 1 秒かかるワーカー1台。少し後に打ち切りの合図を出すと、残りのペアの結果を待たずに返る
+    monkeypatch.setattr(pair_worker, 'solve_pair_task', fake_solver(lambda worker: 1.0))
+    spool_dir = str(tmp_path / 'spool')
+    pool = SpoolPairPool(spool_dir)
+    threads = start_workers(spool_dir, ['a'])
+    stop = threading.Event()
+    threading.Timer(0.3, stop.set).start()
+    start = time.time()
+    results = pool.evaluate_pair_tasks(make_pair_tasks(instance, 4), instance['customers'], instance['vehicle_capacity'],
+                                       stop=stop)
+    elapsed = time.time() - start
+    assert elapsed < 1.0
+    assert all(result['skipped'] for result in results)
+    assert os.listdir(os.path.join(spool_dir, 'tasks')) == []
+
+    # 合図が出ていれば配布もしない
+    assert all(result['skipped'] for result in pool.evaluate_pair_tasks(
+        make_pair_tasks(instance, 2), instance['customers'], instance['vehicle_capacity'], stop=stop))
+    assert os.listdir(os.path.join(spool_dir, 'tasks')) == []
+    join(threads)
+    pool.shutdown()
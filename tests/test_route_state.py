@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+
+from gat import build_vehicle_PD_pairs
+from instance_store import InstanceStore
+from parser import load_instances
+from route_state import RouteState
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'LC1_2_2.txt')
+
+
+@pytest.fixture(scope='module')
+def instance():
+    instance = load_instances([DATA_FILE], [(0, 0)])
+    instance['store'] = InstanceStore(instance['customers'])
+    return instance
+
+
+def initial_routes(instance, num_vehicles, per_vehicle=2):
+    depot = instance['depot_id_list'][0]
+    requests = list(instance['PD_pairs'].items())
+    routes = []
+    for v in range(num_vehicles):
+        route = [depot]
+        for p, d in requests[per_vehicle * v:per_vehicle * (v + 1)]:
+            route += [p, d]
+        routes.append(route + [depot])
+    return routes
+
+
+def move_request(routes, source, target):
+    """source 車両の最初のリクエスト（集荷・配達）を target 車両の末尾へ移す"""
+    routes = [list(route) for route in routes]
+    pickup, delivery = routes[source][1], routes[source][2]
+    routes[source] = [n for n in routes[source] if n not in (pickup, delivery)]
+    routes[target] = routes[target][:-1] + [pickup, delivery, routes[target][-1]]
+    return routes
+
+
+def assert_matches_fresh_state(state, routes, instance, store):
+    fresh = RouteState(routes, instance['customers'], instance['PD_pairs'], store)
+    assert state.routes == fresh.routes == routes
+    assert state.PD_pairs_of_vehicle == fresh.PD_pairs_of_vehicle == build_vehicle_PD_pairs(routes, instance['PD_pairs'])
+    np.testing.assert_allclose(state.costs, fresh.costs)
+    assert state.total_cost == pytest.approx(fresh.total_cost)
+
+
+@pytest.mark.parametrize('use_store', [True, False])
+def test_update_after_moving_requests_between_vehicles(instance, use_store):
+    store = instance['store'] if use_store else None
+    routes = initial_routes(instance, 6)
+    state = RouteState(routes, instance['customers'], instance['PD_pairs'], store)
+    assert_matches_fresh_state(state, routes, instance, store)
+
+    for source, target in [(0, 3), (3, 0), (2, 5), (5, 4), (4, 2)]:
+        new_routes = move_request(routes, source, target)
+        # 経路が変わっていない車両は同じリストオブジェクトのまま渡す（GATEngine と同じ使い方）
+        new_routes = [old if old == new else new for old, new in zip(routes, new_routes)]
+        assert state.update(new_routes) == sorted({source, target})
+        assert_matches_fresh_state(state, new_routes, instance, store)
+        routes = new_routes
+
+
+def test_update_to_empty_vehicle_and_unchanged_routes(instance):
+    store = instance['store']
+    routes = initial_routes(instance, 3, per_vehicle=1)
+    state = RouteState(routes, instance['customers'], instance['PD_pairs'], store)
+    emptied = move_request(routes, 1, 2)
+    assert emptied[1] == [emptied[1][0], emptied[1][-1]]
+    assert state.update(emptied) == [1, 2]
+    assert state.PD_pairs_of_vehicle[1] == []
+    assert state.costs[1] == 0
+    assert_matches_fresh_state(state, emptied, instance, store)
+    # 同じ内容の経路（別のリストオブジェクト）では何も作り直さない
+    assert state.update([list(route) for route in emptied]) == []
+
+
+def test_update_with_different_number_of_vehicles_rebuilds_everything(instance):
+    store = instance['store']
+    state = RouteState(initial_routes(instance, 3), instance['customers'], instance['PD_pairs'], store)
+    routes = initial_routes(instance, 5, per_vehicle=1)
+    assert state.update(routes) == list(range(5))
+    assert_matches_fresh_state(state, routes, instance, store)
@@ -0,0 +1,66 @@
+import itertools
+import os
+
+import pytest
+
+from gat import pair_cost_lower_bound, screen_vehicle_pair, summarize_routes, _screening_config
+from instance_store import InstanceStore
+from parser import load_instances
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+@pytest.fixture(scope='module')
+def instance():
+    instance = load_instances([os.path.join(DATA_DIR, 'LC1_2_2.txt'), os.path.join(DATA_DIR, 'LC1_2_6.txt')],
+                              [(0, 0), (42, -42)])
+    instance['store'] = InstanceStore(instance['customers'])
+    return instance
+
+
+def single_request_routes(instance, count):
+    depots = instance['depot_id_list']
+    requests = list(instance['PD_pairs'].items())
+    return [[depots[k % 2], p, d, depots[k % 2]] for k, (p, d) in enumerate(requests[:count])]
+
+
+def min_cost_over_all_splits(route_i, route_j, store):
+    """2ルートの顧客を2台に振り分けて並べる全通り（制約は無視）の最小コスト"""
+    depot_i, depot_j = route_i[0], route_j[0]
+    customers = route_i[1:-1] + route_j[1:-1]
+    best = None
+    for assignment in itertools.product((0, 1), repeat=len(customers)):
+        first = [c for c, a in zip(customers, assignment) if a == 0]
+        second = [c for c, a in zip(customers, assignment) if a == 1]
+        for order_i in itertools.permutations(first):
+            for order_j in itertools.permutations(second):
+                cost = sum(store.route_costs([[depot_i, *order_i, depot_i], [depot_j, *order_j, depot_j]]))
+                best = cost if best is None else min(best, cost)
+    return best
+
+
+def test_lower_bound_never_exceeds_any_split(instance):
+    # 制約を無視した全通りの最小コスト（どの実行可能な2車両解のコストよりも小さい）を下界が超えない
+    routes = single_request_routes(instance, 8)
+    summaries = summarize_routes(routes, instance['customers'], instance['store'])
+    for i, j in itertools.combinations(range(len(routes)), 2):
+        bound = pair_cost_lower_bound(summaries[i], summaries[j])
+        assert bound <= min_cost_over_all_splits(routes[i], routes[j], instance['store']) + 1e-9
+
+
+def test_conservative_mode_keeps_pairs_below_the_bound(instance):
+    routes = single_request_routes(instance, 40)
+    summaries = summarize_routes(routes, instance['customers'], instance['store'])
+    screening = _screening_config({'mode': 'conservative'})
+    for i, j in itertools.combinations(range(len(routes)), 2):
+        bound = pair_cost_lower_bound(summaries[i], summaries[j])
+        # 現在の2ルートも解の1つなので、下界は現在のコストを超えない
+        assert bound <= summaries[i]['cost'] + summaries[j]['cost'] + 1e-9
+        reason = screen_vehicle_pair(summaries[i], summaries[j], screening)
+        assert (reason == 'lower_bound') == (bound >= summaries[i]['cost'] + summaries[j]['cost'] - 1e-6)
+
+
+def test_empty_routes_have_zero_bound(instance):
+    depot = instance['depot_id_list'][0]
+    summaries = summarize_routes([[depot, depot], [depot, depot]], instance['customers'], instance['store'])
+    assert pair_cost_lower_bound(summaries[0], summaries[1]) == 0.0
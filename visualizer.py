@@ -1,6 +1,118 @@
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from node_arrays import node_column
+from profiler import profiler, start_worker_profiling
+import multiprocessing
 import numpy as np
 import os
+import queue
+import traceback
+
+# 各LSPに異なる色を設定
+COLORS = ["tab:blue", "tab:green", "tab:red", "tab:orange", "tab:purple", "tab:brown"]
+
+
+def compute_static_layer(customers, depot_id_list):
+    """
+    インスタンス内で変化しない描画要素（座標、デポ、描画範囲、デポ間の等距離線）を一度だけ計算する
+    - 等距離線は従来通り 300×300 のグリッド上の距離差の0等高線として求め、線分のリストとして保持する
+    """
+    with profiler.span('render.static_layer', depots=len(depot_id_list)):
+        return _compute_static_layer(customers, depot_id_list)
+
+
+def _compute_static_layer(customers, depot_id_list):
+    xs, ys = node_column(customers, "x"), node_column(customers, "y")
+    id_to_coord = dict(zip(node_column(customers, "id"), zip(xs, ys)))
+    depot_coords = np.array([id_to_coord[d] for d in depot_id_list], dtype=float)
+    x_min, x_max = min(xs) - 10, max(xs) + 10
+    y_min, y_max = min(ys) - 10, max(ys) + 10
+
+    bisector_segments = []
+    if len(depot_id_list) > 1:
+        X, Y = np.meshgrid(np.linspace(x_min, x_max, 300), np.linspace(y_min, y_max, 300))
+
+        # 各グリッド点から各デポまでの距離を計算
+        distances = np.zeros((len(depot_coords), *X.shape))
+        for i, (dx, dy) in enumerate(depot_coords):
+            distances[i] = np.sqrt((X - dx)**2 + (Y - dy)**2)
+
+        # デポ間の等距離線（描画はせず線分だけを取り出す）
+        contour_axes = Figure().add_subplot()
+        for i in range(len(depot_coords)):
+            for j in range(i + 1, len(depot_coords)):
+                contour = contour_axes.contour(X, Y, distances[i] - distances[j], levels=[0])
+                bisector_segments.extend(contour.allsegs[0])
+
+    return {
+        'id_to_coord': id_to_coord,
+        'depot_coords': depot_coords,
+        'extent': (x_min, x_max, y_min, y_max),
+        'bisector_segments': bisector_segments,
+    }
+
+
+class _RouteFigure:
+    """静的レイヤー（デポ・等距離線・凡例・軸）を描いたFigureを保持し、経路だけを描き替えて保存する"""
+
+    def __init__(self, static_layer, vehicle_num_list):
+        self.static_layer = static_layer
+        self.vehicle_num_list = vehicle_num_list
+        self.figure = Figure(figsize=(8, 8))
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.dynamic_artists = []
+
+        axes = self.axes
+        for lsp_index, (depot_x, depot_y) in enumerate(static_layer['depot_coords']):
+            color = COLORS[lsp_index % len(COLORS)]
+            axes.scatter(depot_x, depot_y, marker="s", c=color, s=120, edgecolor="black", label=f"LSP {lsp_index+1} depot")
+        if static_layer['bisector_segments']:
+            axes.add_collection(LineCollection(static_layer['bisector_segments'], colors="gray", linestyles="--", linewidths=1))
+        x_min, x_max, y_min, y_max = static_layer['extent']
+        axes.set_xlim(x_min, x_max)
+        axes.set_ylim(y_min, y_max)
+        axes.set_xlabel("X Coordinate")
+        axes.set_ylabel("Y Coordinate")
+        axes.legend()
+        axes.grid(True)
+        # タイトルの高さを含めてレイアウトを決めるため、仮のタイトルを入れておく
+        self.title = axes.set_title("Vehicle Routes (Iteration 0)")
+        self.figure.tight_layout()
+
+    def save(self, routes, iteration, save_path):
+        for artist in self.dynamic_artists:
+            artist.remove()
+        self.dynamic_artists = []
+        id_to_coord = self.static_layer['id_to_coord']
+        self.title.set_text(f"Vehicle Routes (Iteration {iteration})")
+
+        # --- 経路描画 ---
+        vehicle_index = 0
+        for lsp_index, num_vehicles in enumerate(self.vehicle_num_list):
+            color = COLORS[lsp_index % len(COLORS)]
+            for _ in range(num_vehicles):
+                route = routes[vehicle_index]
+                vehicle_index += 1
+                if len(route) <= 2:
+                    continue  # デポのみの車両をスキップ
+                xs = [id_to_coord[i][0] for i in route]
+                ys = [id_to_coord[i][1] for i in route]
+                self.dynamic_artists.extend(self.axes.plot(xs, ys, color=color, alpha=0.8))
+                self.dynamic_artists.append(self.axes.scatter(xs, ys, c=color, s=15))
+
+        with profiler.span('render.savefig'):
+            self.figure.savefig(save_path)
+        print(f"図を保存しました: {save_path}")
+
+
+def _figure_path(output_dir, instance_name, iteration):
+    # 各実験ごとにフォルダを作成
+    instance_folder = os.path.join(output_dir, instance_name)
+    os.makedirs(instance_folder, exist_ok=True)
+    return os.path.join(instance_folder, f"routes_iter_{iteration:02d}.png")
+
 
 def plot_routes(customers, routes, depot_id_list, vehicle_num_list, iteration, instance_name="", output_dir="figures"):
     """
@@ -11,69 +123,118 @@ def plot_routes(customers, routes, depot_id_list, vehicle_num_list, iteration, i
     - vehicle_num_list: 各社の車両数
     - iteration: 現在の反復番号（ファイル名に使用）
     - instance_name: 実験インスタンス名（フォルダ作成用）
+    同じインスタンスを繰り返し描画する場合は、静的レイヤーを使い回す RouteRenderer を使う
     """
+    figure = _RouteFigure(compute_static_layer(customers, depot_id_list), vehicle_num_list)
+    figure.save(routes, iteration, _figure_path(output_dir, instance_name, iteration))
 
-    # 各実験ごとにフォルダを作成
-    instance_folder = os.path.join(output_dir, instance_name)
-    os.makedirs(instance_folder, exist_ok=True)
 
-    # ID -> 座標辞書を作成
-    id_to_coord = {c["id"]: (c["x"], c["y"]) for c in customers}
-
-    # 各LSPに異なる色を設定
-    colors = ["tab:blue", "tab:green", "tab:red", "tab:orange", "tab:purple", "tab:brown"]
-
-    # 描画準備
-    plt.figure(figsize=(8, 8))
-    plt.title(f"Vehicle Routes (Iteration {iteration})")
-
-    # --- 経路描画 ---
-    vehicle_index = 0
-    for lsp_index, num_vehicles in enumerate(vehicle_num_list):
-        color = colors[lsp_index % len(colors)]
-        depot_id = depot_id_list[lsp_index]
-        depot_x, depot_y = id_to_coord[depot_id]
-
-        # デポを描画
-        plt.scatter(depot_x, depot_y, marker="s", c=color, s=120, edgecolor="black", label=f"LSP {lsp_index+1} depot")
-
-        # 各車両経路を描画
-        for _ in range(num_vehicles):
-            route = routes[vehicle_index]
-            vehicle_index += 1
-            if len(route) <= 2:
-                continue  # デポのみの車両をスキップ
-            xs = [id_to_coord[i][0] for i in route]
-            ys = [id_to_coord[i][1] for i in route]
-            plt.plot(xs, ys, color=color, alpha=0.8)
-            plt.scatter(xs, ys, c=color, s=15)
-
-    # --- 等距離線の描画 ---
-    if len(depot_id_list) > 1:
-        depot_coords = np.array([id_to_coord[d] for d in depot_id_list])
-        x_vals = np.linspace(min(c["x"] for c in customers) - 10, max(c["x"] for c in customers) + 10, 300)
-        y_vals = np.linspace(min(c["y"] for c in customers) - 10, max(c["y"] for c in customers) + 10, 300)
-        X, Y = np.meshgrid(x_vals, y_vals)
+def _render_worker(static_layer, vehicle_num_list, output_dir, instance_name, render_queue, error_queue):
+    # 描画プロセスの計測結果は親プロセスへ返さない（親側では submit のキュー投入時間だけを計測する）
+    start_worker_profiling(False)
+    # 描画の失敗は (iteration, トレースバック) として親プロセスへ返し、finish() で報告する
+    try:
+        figure = _RouteFigure(static_layer, vehicle_num_list)
+    except Exception:
+        error_queue.put((None, traceback.format_exc()))
+        figure = None
+    while True:
+        item = render_queue.get()
+        if item is None:
+            break
+        routes, iteration = item
+        if figure is None:
+            error_queue.put((iteration, "figure initialization failed"))
+            continue
+        try:
+            figure.save(routes, iteration, _figure_path(output_dir, instance_name, iteration))
+        except Exception:
+            error_queue.put((iteration, traceback.format_exc()))
 
-        # 各グリッド点から各デポまでの距離を計算
-        distances = np.zeros((len(depot_coords), *X.shape))
-        for i, (dx, dy) in enumerate(depot_coords):
-            distances[i] = np.sqrt((X - dx)**2 + (Y - dy)**2)
 
-        # デポ間の等距離線を描画
-        for i in range(len(depot_coords)):
-            for j in range(i + 1, len(depot_coords)):
-                plt.contour(X, Y, distances[i] - distances[j], levels=[0], colors="gray", linestyles="--", linewidths=1)
+# 描画の間引き方
+# - 'all': 毎ラウンド描画 / 'every': every ラウンドごと（と最終ラウンド）/ 'final': 最終ラウンドのみ / 'off': 描画しない
+RENDER_MODES = ('all', 'every', 'final', 'off')
+
+
+class RouteRenderer:
+    """
+    1インスタンス分の経路図を描画するレンダラー
+    - デポ・等距離線などの静的レイヤーは生成時に一度だけ計算し、以降は経路だけを描き替える
+    - background=True の場合は描画専用プロセスにキュー経由で経路を渡すため、呼び出し側は描画・保存を待たない
+    - submit() で各ラウンドの経路を渡し、最後に finish() で最終経路を渡して描画の完了を待つ
+      （バックグラウンドで失敗した描画があれば finish() が RuntimeError を送出する）
+    - 途中で打ち切る場合は close(wait=False) で描画プロセスを止める
+    """
+
+    def __init__(self, customers, depot_id_list, vehicle_num_list, instance_name="", output_dir="figures",
+                 mode='all', every=1, background=True):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {mode}")
+        self.mode = mode
+        self.every = max(1, every)
+        self.instance_name = instance_name
+        self.output_dir = output_dir
+        self.last_rendered = None
+        self.process = None
+        self.errors = []
+        self.figure = None
+        if mode == 'off':
+            return
+        static_layer = compute_static_layer(customers, depot_id_list)
+        if background:
+            self.queue = multiprocessing.Queue()
+            self.error_queue = multiprocessing.Queue()
+            self.process = multiprocessing.Process(
+                target=_render_worker,
+                args=(static_layer, vehicle_num_list, output_dir, instance_name, self.queue, self.error_queue),
+                daemon=True)
+            self.process.start()
+        else:
+            self.figure = _RouteFigure(static_layer, vehicle_num_list)
+
+    def _render(self, routes, iteration):
+        self.last_rendered = iteration
+        with profiler.span('render.submit', iteration=iteration, background=self.process is not None):
+            if self.process is not None:
+                self.queue.put(([list(route) for route in routes], iteration))
+            else:
+                self.figure.save(routes, iteration, _figure_path(self.output_dir, self.instance_name, iteration))
 
-    plt.xlabel("X Coordinate")
-    plt.ylabel("Y Coordinate")
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
+    def submit(self, routes, iteration):
+        """iteration回目の経路を渡す（間引き設定に従って描画するかを決める）"""
+        if self.mode == 'all' or (self.mode == 'every' and iteration % self.every == 0):
+            self._render(routes, iteration)
 
-    # ファイル保存
-    save_path = os.path.join(instance_folder, f"routes_iter_{iteration:02d}.png")
-    plt.savefig(save_path)
-    plt.close()
-    print(f"図を保存しました: {save_path}")
+    def finish(self, routes, iteration):
+        """最終経路を描画し（未描画の場合）、バックグラウンドの描画がすべて終わるまで待つ"""
+        if self.mode != 'off' and self.last_rendered != iteration:
+            self._render(routes, iteration)
+        self.close()
+        if self.errors:
+            failed = ', '.join('init' if failed_iteration is None else str(failed_iteration)
+                               for failed_iteration, _ in self.errors)
+            raise RuntimeError(f"Failed to render route figures (iterations: {failed}):\n{self.errors[0][1]}")
 
+    def close(self, wait=True):
+        """
+        描画プロセスを終了させる（描画の失敗は self.errors に集める）
+        - wait=True なら投入済みの描画が終わるまで待ち、False なら残りを描画せずに停止する
+        """
+        if self.process is None:
+            return
+        if wait:
+            self.queue.put(None)
+            with profiler.span('render.wait'):
+                self.process.join()
+        else:
+            self.process.terminate()
+            self.process.join()
+        while True:
+            try:
+                self.errors.append(self.error_queue.get_nowait())
+            except queue.Empty:
+                break
+        if wait and self.process.exitcode != 0:
+            self.errors.append((None, f"render process exited with code {self.process.exitcode}"))
+        self.process = None